@@ -0,0 +1,268 @@
+import asyncio
+import queue
+import time
+
+from outbound import OutboundQueue, QueueClosedError
+from protocol import FRAME_MAGIC
+from session import PlayerSession
+from server import RussianRouletteServer, LISTEN_BACKLOG, RECV_SIZE, enable_tcp_keepalive
+
+
+# --- Обертка над потоками asyncio ---
+
+class StreamClient:
+    """Объект с интерфейсом сокета поверх StreamReader/StreamWriter.
+
+    Игровая логика RussianRouletteServer вызывает у клиента send(), getpeername(),
+    fileno(), shutdown() и close(). send() кладет данные в ограниченную очередь
+    клиента, а задача drain_forever() переносит их в транспорт с учетом
+    обратного давления, поэтому логика выполняется в цикле событий без изменений.
+    """
+
+    def __init__(self, reader, writer, limit, policy, timeout):
+        self.reader = reader
+        self.writer = writer
+        self.ready = asyncio.Event()
+        self.queue = OutboundQueue(limit=limit, policy=policy, timeout=timeout, can_block=False,
+                                   on_ready=self.ready.set, on_overflow=self.abort)
+
+    def send(self, data, key=None):
+        if self.writer.is_closing():
+            raise QueueClosedError("Соединение уже закрывается")
+        self.queue.put(data, key)
+        return len(data)
+
+    async def drain_forever(self):
+        while not self.queue.closed:
+            await self.ready.wait()
+            self.ready.clear()
+            data = self.queue.take()
+            if data and not self.writer.is_closing():
+                self.writer.write(data)
+                await self.writer.drain()  # Ждем, пока медленный клиент разберет буфер транспорта
+
+    def _flush_now(self):
+        data = self.queue.take()
+        if data and not self.writer.is_closing():
+            self.writer.write(data)
+
+    def abort(self):
+        # Только из потока цикла событий; из других потоков - через server.abort_connection()
+        self.writer.transport.abort()
+
+    def getpeername(self):
+        return self.writer.get_extra_info('peername')
+
+    def fileno(self):
+        sock = self.writer.get_extra_info('socket')
+        return sock.fileno() if sock is not None else -1
+
+    def shutdown(self, how):
+        self._flush_now()
+        if self.writer.can_write_eof() and not self.writer.is_closing():
+            self.writer.write_eof()
+
+    def close(self):
+        self._flush_now()
+        self.queue.close()
+        self.ready.set()
+        self.writer.close()
+
+
+# --- Движок на asyncio ---
+
+class AsyncRussianRouletteServer(RussianRouletteServer):
+    """Тот же протокол и те же правила, но все соединения обслуживает один цикл событий.
+
+    Вместо потока на клиента каждое подключение - это корутина, поэтому тысячи
+    ожидающих в лобби соединений не требуют тысяч потоков ОС и их стеков.
+    """
+
+    def __init__(self, host='localhost', port=12345, gui_queue=None, **kwargs):
+        super().__init__(host=host, port=port, gui_queue=gui_queue, **kwargs)
+        self.loop = None
+        self.stop_event = None
+        self.connection_tasks = set()  # Задачи обработки клиентов
+
+    def start(self):
+        try:
+            asyncio.run(self._serve())
+        except OSError as e:
+            self.logger.error("Ошибка запуска сервера (возможно, порт %s занят): %s", self.port, e)
+        finally:
+            self.running = False
+            self._stop_metrics()
+            self.timings.close()
+            self.logger.info("Сервер остановлен.")
+            if self.gui_queue:
+                try:
+                    self.gui_queue.put(("server_stopped", None), block=False)
+                except queue.Full:
+                    pass
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        if self.listen_socket is not None:
+            self.listen_socket.setblocking(False)
+            self.server_socket = await asyncio.start_server(self._accept_client, sock=self.listen_socket,
+                                                            backlog=LISTEN_BACKLOG)
+        else:
+            self.server_socket = await asyncio.start_server(self._accept_client, self.host, self.port,
+                                                            reuse_address=True, reuse_port=self.reuse_port or None,
+                                                            backlog=LISTEN_BACKLOG)
+        self.running = True
+        self.timers.start()
+        self._start_metrics()
+        if self.timings_on_start:
+            self.timings.set_enabled(True)
+        self.logger.info("Сервер (asyncio) запущен на %s:%s. Ожидание игроков...", self.host, self.port)
+        try:
+            await self.stop_event.wait()
+        finally:
+            self.logger.info("Сервер останавливается...")
+            self.running = False
+            self.server_socket.close()
+            self._cleanup_clients()
+            self.timers.stop()
+            for task in list(self.connection_tasks):
+                task.cancel()
+            if self.connection_tasks:
+                await asyncio.gather(*self.connection_tasks, return_exceptions=True)
+            await self.server_socket.wait_closed()
+            self.server_socket = None
+
+    def stop(self):
+        if not self.running:
+            return
+        self.logger.info("Получен сигнал остановки...")
+        self.running = False
+        if self.loop and self.stop_event:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    def abort_connection(self, client):
+        # Транспорт asyncio трогаем только из потока цикла событий
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(client.abort)
+        else:
+            client.abort()
+
+    def schedule_room(self, room):
+        # Игровая логика и так выполняется в единственном потоке цикла событий
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(room.drain)
+        else:
+            room.drain()
+
+    async def _accept_client(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        if not self.running:
+            writer.close()
+            return
+
+        if not self.has_free_seat():
+            self.metrics.rejected.inc()
+            self.logger.warning("Отклонено подключение от %s: Сервер переполнен.", addr)
+            try:
+                writer.write(self.catalog.encode("server_full"))
+                await writer.drain()
+            except Exception:
+                pass  # Клиент мог уже отключиться
+            writer.close()
+            return
+
+        self.metrics.accepted.inc()
+        if self.keepalive > 0:
+            sock = writer.get_extra_info('socket')
+            if sock is not None:
+                enable_tcp_keepalive(sock, self.keepalive)
+        player_num_temp = len(self.sessions) + 1  # Временный номер для лога
+        self.logger.info("Новое подключение от %s. Попытка регистрации игрока %s.", addr, player_num_temp)
+        task = asyncio.current_task()
+        self.connection_tasks.add(task)
+        client = StreamClient(reader, writer, limit=self.send_queue_limit, policy=self.overflow_policy,
+                              timeout=self.overflow_timeout)
+        drain_task = asyncio.create_task(client.drain_forever())
+        try:
+            await self.handle_client_async(client, player_num_temp)
+        finally:
+            drain_task.cancel()
+            self.connection_tasks.discard(task)
+
+    async def handle_client_async(self, client, player_num_temp):
+        name = None
+        peer_address = None
+        session = PlayerSession(client, self.text_codec)
+        handshake_timer = None
+        try:
+            peer_address = client.getpeername()
+            self.logger.debug("Запрос имени у клиента", peer=peer_address)
+            handshake_timer = self._start_handshake_timer(client, peer_address)
+            client.send(self.welcome_bytes)
+
+            name_bytes = await client.reader.read(1024)
+            pending_frames = []
+            token = None
+            decoder = self._open_frames(session, name_bytes)
+            if decoder is not None:
+                frames = decoder.feed(name_bytes[len(FRAME_MAGIC):])
+                while not frames:
+                    chunk = await client.reader.read(RECV_SIZE)
+                    if not chunk:
+                        raise ConnectionResetError("Клиент отключился при запросе имени")
+                    frames = decoder.feed(chunk)
+                name_bytes, token, pending_frames = self._hello_from_frames(frames)
+            resumed = self._resume_client(session, token, peer_address) if token else None
+            if resumed is not None:
+                session, snapshot = resumed
+                await asyncio.wrap_future(snapshot)
+                name = session.name
+            else:
+                name = await asyncio.wrap_future(self._register_client(session, name_bytes, peer_address,
+                                                                       player_num_temp))
+            if handshake_timer is not None:
+                handshake_timer.cancel()
+            self._watch_connection(session)
+            for data in self._commands_from_frames(pending_frames):
+                self._handle_command(session, data)
+
+            while self.running:
+                try:
+                    data_bytes = await client.reader.read(RECV_SIZE if decoder is not None else 1024)
+                    started = time.perf_counter() if self.timings.enabled else None
+                    if not data_bytes:
+                        self.logger.info("%s отключился (пустые данные).", name)
+                        break
+                    session.last_seen = time.monotonic()
+                    if decoder is not None:
+                        commands = self._commands_from_frames(decoder.feed(data_bytes))
+                    else:
+                        commands = [data_bytes.decode().strip().lower()]
+                except ConnectionResetError:
+                    self.logger.info("Соединение с %s сброшено (ConnectionResetError).", name)
+                    break
+                except Exception as e:
+                    self.logger.error("Ошибка при получении данных от %s: %s", name, e)
+                    break
+
+                for data in commands:
+                    self._handle_command(session, data)
+                if started is not None:
+                    self._record_recv(session, started)
+
+        except asyncio.CancelledError:
+            pass  # Остановка сервера
+        except ConnectionResetError:
+            log_name_cr = name if name else f"клиент ({peer_address})" if peer_address else "неименованный клиент"
+            self.logger.info("Соединение с %s было сброшено.", log_name_cr)
+        except Exception as e:
+            log_name_ex = name if name else f"клиент ({peer_address})" if peer_address else "неименованный клиент"
+            if self.running:
+                self.logger.error("Непредвиденная ошибка в handle_client_async (%s): %s", log_name_ex, e)
+        finally:
+            if handshake_timer is not None:
+                handshake_timer.cancel()
+            log_name_final = name if name else f"клиент (адрес: {peer_address if peer_address else 'N/A'})"
+            self.logger.info("Завершение обработки клиента %s.", log_name_final)
+            self._remove_client(session, notify_others=True)
+            client.close()
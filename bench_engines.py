@@ -0,0 +1,115 @@
+"""Сравнение движков сервера: скорость приема подключений и память на соединение.
+
+Сервер запускается в отдельном процессе, чтобы его память можно было снять из
+/proc/<pid>/status отдельно от памяти клиентских сокетов (только Linux).
+Клиенты подключаются, читают приветствие и остаются в лобби без имени.
+
+    python bench_engines.py --connections 2000
+"""
+import argparse
+import multiprocessing
+import socket
+import time
+
+try:
+    import resource  # Только Unix
+except ImportError:
+    resource = None
+
+from server import create_server, ENGINES
+
+
+def _run_server(engine, host, port, **options):
+    create_server(engine, host=host, port=port, **options).start()
+
+
+def _free_port(host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _proc_status(pid):
+    # VmRSS - реально занятая память, VmSize - виртуальная (сюда попадают стеки потоков)
+    fields = {}
+    with open(f"/proc/{pid}/status") as status_file:
+        for line in status_file:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmSize", "Threads"):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def _wait_for_server(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5) as sock:
+                sock.recv(1024)
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Сервер на {host}:{port} не поднялся за {timeout} с")
+
+
+def bench_engine(engine, connections, host):
+    port = _free_port(host)
+    process = multiprocessing.Process(target=_run_server, args=(engine, host, port), daemon=True)
+    process.start()
+    sockets = []
+    try:
+        _wait_for_server(host, port)
+        time.sleep(0.2)  # Даем серверу закрыть пробное соединение
+        before = _proc_status(process.pid)
+
+        started = time.perf_counter()
+        for _ in range(connections):
+            sock = socket.create_connection((host, port), timeout=10)
+            sock.recv(1024)  # Приветствие: соединение принято и обслуживается
+            sockets.append(sock)
+        elapsed = time.perf_counter() - started
+
+        time.sleep(0.2)
+        after = _proc_status(process.pid)
+        return {
+            "engine": engine,
+            "connections": connections,
+            "conn_per_sec": connections / elapsed if elapsed else float("inf"),
+            "rss_per_conn_kb": (after["VmRSS"] - before["VmRSS"]) / connections,
+            "vm_per_conn_kb": (after["VmSize"] - before["VmSize"]) / connections,
+            "threads": after["Threads"],
+        }
+    finally:
+        for sock in sockets:
+            sock.close()
+        process.terminate()
+        process.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=1000, help="число одновременных соединений")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--engine", choices=ENGINES, action="append",
+                        help="движок для замера (по умолчанию все)")
+    args = parser.parse_args()
+
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = args.connections * 2 + 64
+        if soft < wanted:
+            limit = wanted if hard == resource.RLIM_INFINITY else hard  # RLIM_INFINITY (macOS) setrlimit не примет
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+            except (ValueError, OSError) as e:
+                print(f"Не удалось поднять предел открытых файлов до {limit} (сейчас {soft}): {e}")
+
+    print(f"{'движок':<10} {'соедин.':>8} {'соедин./с':>10} {'RSS КБ/соед.':>13} {'VM КБ/соед.':>12} {'потоков':>8}")
+    for engine in args.engine or ENGINES:
+        result = bench_engine(engine, args.connections, args.host)
+        print(f"{result['engine']:<10} {result['connections']:>8} {result['conn_per_sec']:>10.0f} "
+              f"{result['rss_per_conn_kb']:>13.1f} {result['vm_per_conn_kb']:>12.1f} {result['threads']:>8}")
+
+
+if __name__ == "__main__":
+    main()
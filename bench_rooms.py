@@ -0,0 +1,197 @@
+"""Микробенчмарки игровых переходов комнаты на поддельных сокетах.
+
+Сервер не запускается: комната собирается в процессе, игроки сидят на
+FakeSocket, который только считает отправки. Каждый переход выполняется
+много раз, подготовка к нему (перезапуск партии, возврат выбывшего игрока)
+в замер не входит. Для каждого перехода и числа мест печатаются:
+  оп./с, мкс/оп.  - по времени самих переходов;
+  отпр./оп.       - вызовов send() на всех клиентах за переход;
+  пик КБ/оп.      - пик памяти, выделенной внутри перехода (tracemalloc);
+  прирост Б/оп.   - сколько памяти осталось занятым после перехода.
+
+    python bench_rooms.py
+    python bench_rooms.py --seats 6 --seats 1024 --transition process_shot --min-time 2
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from server import RussianRouletteServer
+from session import PlayerSession
+
+SEATS = (2, 6, 64, 1024)
+MIN_TIME = 0.5  # Секунд чистого времени переходов на один замер
+MAX_OPS = 100000
+ALLOC_OPS = 200  # Переходов под tracemalloc - он сильно замедляет выполнение
+
+
+class FakeSocket:
+    sends = 0  # Всего вызовов send() на всех поддельных сокетах
+
+    def send(self, data, key=None):
+        FakeSocket.sends += 1
+        return len(data)
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+    def fileno(self):
+        return -1
+
+    def getpeername(self):
+        return ("127.0.0.1", 0)
+
+
+def make_room(seats, framed=False):
+    server = RussianRouletteServer(room_size=seats)
+    codec = server.frame_codec if framed else server.text_codec
+    room = None
+    for index in range(seats):
+        session = PlayerSession(FakeSocket(), codec)
+        room = server._assign_room(session)
+        room.add_player(session, f"p{index}")
+    restart(room)
+    return server, room
+
+
+def restart(room):
+    # Новая партия со всеми игроками (кто подсел во время партии, в ней не участвует)
+    room.reset_game_state()
+    room.start_game()
+
+
+def ensure_alive(room, count):
+    if not room.game.started or len(room.game.alive) < count:
+        restart(room)
+
+
+def _in_batch(room, method, *args, **kwargs):
+    # Как в игре: эти методы вызываются изнутри обработчика команды, и отправки собираются в один буфер
+    with room.batch():
+        method(*args, **kwargs)
+
+
+# Каждый переход: prepare(server, room, state) -> действие без аргументов; prepare в замер не входит.
+# state - словарь одного замера, в нем подготовка хранит то, что нужно вернуть перед следующим шагом
+
+def prepare_start_game(server, room, state):
+    room.reset_game_state()
+    return room.start_game
+
+
+def prepare_shot_blank(server, room, state):
+    # Холостой в себя: дополнительный ход, без выбывания
+    ensure_alive(room, 2)
+    game = room.game
+    game.chamber = [False, False]
+    game.live_bullets, game.blank_bullets = 0, 2
+    shooter = game.current
+    return lambda: _in_batch(room, room.process_shot, shooter, shooter)
+
+
+def prepare_shot_live(server, room, state):
+    # Боевой в соседа: выбывание и передача хода
+    ensure_alive(room, 3)
+    game = room.game
+    game.chamber = [True, False]
+    game.live_bullets, game.blank_bullets = 1, 1
+    shooter = game.current
+    target = game.alive.after(shooter)
+    return lambda: _in_batch(room, room.process_shot, shooter, target)
+
+
+def prepare_pass_turn(server, room, state):
+    ensure_alive(room, 2)
+    return lambda: _in_batch(room, room.pass_turn, notify=True)
+
+
+def prepare_remove_client(server, room, state):
+    # Отключается ходящий игрок; перед следующим замером он возвращается за стол
+    session = state.pop("removed", None)
+    if session is not None:
+        server._assign_room(session)
+        room.add_player(session, session.name)
+    ensure_alive(room, 3)
+    session = state["removed"] = room.game.current
+    return lambda: server._remove_client(session)
+
+
+def prepare_broadcast(server, room, state):
+    return lambda: _in_batch(room, room.broadcast, "player_joined", name="p0", count=len(room.players))
+
+
+TRANSITIONS = {
+    "start_game": prepare_start_game,
+    "process_shot": prepare_shot_blank,
+    "process_shot_live": prepare_shot_live,
+    "pass_turn": prepare_pass_turn,
+    "_remove_client": prepare_remove_client,
+    "broadcast": prepare_broadcast,
+}
+
+
+def bench(prepare, seats, min_time=MIN_TIME, max_ops=MAX_OPS, alloc_ops=ALLOC_OPS, framed=False):
+    server, room = make_room(seats, framed)
+    state = {}
+    elapsed = 0.0
+    ops = 0
+    sends = 0
+    while elapsed < min_time and ops < max_ops:
+        step = prepare(server, room, state)
+        sends_before = FakeSocket.sends
+        started = time.perf_counter()
+        step()
+        elapsed += time.perf_counter() - started
+        sends += FakeSocket.sends - sends_before
+        ops += 1
+
+    peak = retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_ops):
+            step = prepare(server, room, state)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step()
+            current, high = tracemalloc.get_traced_memory()
+            peak += high - before
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_sec": ops / elapsed if elapsed else float("inf"),
+        "us_per_op": elapsed / ops * 1e6,
+        "sends_per_op": sends / ops,
+        "peak_kb_per_op": peak / alloc_ops / 1024 if alloc_ops else 0.0,
+        "retained_b_per_op": retained / alloc_ops if alloc_ops else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seats", type=int, action="append", help="мест за столом (по умолчанию 2, 6, 64, 1024)")
+    parser.add_argument("--transition", choices=TRANSITIONS, action="append", help="переход (по умолчанию все)")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="секунд чистого времени на замер")
+    parser.add_argument("--alloc-ops", type=int, default=ALLOC_OPS, help="переходов под tracemalloc")
+    parser.add_argument("--frames", action="store_true", help="клиенты на кадровом протоколе вместо текстового")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(f"{'переход':<18} {'мест':>5} {'оп./с':>10} {'мкс/оп.':>9} {'отпр./оп.':>10} {'пик КБ/оп.':>11} "
+          f"{'прирост Б/оп.':>14}")
+    for name in args.transition or TRANSITIONS:
+        for seats in args.seats or SEATS:
+            result = bench(TRANSITIONS[name], seats, min_time=args.min_time, alloc_ops=args.alloc_ops,
+                           framed=args.frames)
+            print(f"{name:<18} {seats:>5} {result['ops_per_sec']:>10.0f} {result['us_per_op']:>9.1f} "
+                  f"{result['sends_per_op']:>10.1f} {result['peak_kb_per_op']:>11.1f} "
+                  f"{result['retained_b_per_op']:>14.0f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
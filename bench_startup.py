@@ -0,0 +1,76 @@
+"""Холодный старт сервера: время импорта и время до первого принятого подключения.
+
+Каждый замер - новый процесс интерпретатора, как при запуске на узле:
+  import server      - модуль сервера без GUI;
+  import server_gui  - то, что раньше платил любой запуск (Tk + customtkinter);
+  serve              - от запуска "python server.py serve" до приветствия клиенту.
+
+    python bench_startup.py --runs 10
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port(host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def time_import(module):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+    return elapsed if result.returncode == 0 else None
+
+
+def time_serve(host, timeout=10.0):
+    port = _free_port(host)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "server.py", "serve", "--host", host, "--port", str(port)],
+                               cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                with socket.create_connection((host, port), timeout=0.5) as sock:
+                    if sock.recv(1024):
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        return None
+    finally:
+        process.terminate()
+        process.wait(timeout=5)
+
+
+def _report(label, samples):
+    samples = [sample for sample in samples if sample is not None]
+    if not samples:
+        print(f"{label:<22} {'недоступно':>10}")
+        return
+    print(f"{label:<22} {statistics.median(samples) * 1000:>10.1f} {min(samples) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="повторов каждого замера")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    print(f"{'замер':<22} {'медиана мс':>10} {'мин. мс':>10}")
+    _report("import server", [time_import("server") for _ in range(args.runs)])
+    _report("import server_gui", [time_import("server_gui") for _ in range(args.runs)])
+    _report("serve до приветствия", [time_serve(args.host) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Нагрузочный клиент: тысячи ботов-игроков из одного процесса, без окна.
+
+Каждый бот - корутина asyncio, которая говорит с сервером как обычный
+клиент: читает приветствие, отправляет имя и в свой ход выбирает команду.
+В кадровом режиме (RRF/1, по умолчанию) бот иногда запрашивает "игроки" и
+стреляет в случайную цель из присланного списка. В текстовом режиме список
+целей не разобрать, поэтому бот стреляет в себя, иногда перед этим
+спрашивая "инфо" или "игроки". Раскладку по комнатам делает сам сервер.
+
+Раз в --interval секунд печатается сводка: боты на связи, партий и команд
+в секунду, p50/p99 задержки хода и ошибки. Задержка хода - от отправки
+выстрела до события выстрела (в текстовом режиме - до первого ответа).
+Партию засчитывает бот-победитель, так что каждая считается один раз.
+
+    python bot.py --port 12345 --bots 2000 --duration 60
+    python bot.py --serve asyncio --bots 1000 --text-share 0.2
+"""
+import argparse
+import asyncio
+import collections
+import multiprocessing
+import random
+import re
+import statistics
+import time
+
+try:
+    import resource  # Только Unix
+except ImportError:
+    resource = None
+
+from bench_engines import _free_port, _run_server, _wait_for_server
+from messages import get_catalog, LOCALES, DEFAULT_LOCALE
+from protocol import (FRAME_TOKEN, EVENTS_TOKEN, OP_TEXT, OP_SHOT, OP_YOUR_TURN, OP_PLAYERS, OP_GAME_OVER,
+                      OP_PING, FrameDecoder, LineDecoder, ProtocolError, encode_hello, encode_command, encode_pong, decode_shot,
+                      decode_players, unpack_str)
+from server import ENGINES
+
+REPORT_INTERVAL = 5.0  # Как часто печатать сводку, секунд
+CONNECT_RATE = 500  # Новых ботов в секунду при разгоне
+RECV_SIZE = 65536
+
+
+def _winner_pattern(catalog):
+    # Строка с именем победителя из шаблона game_over, например "(.+) побеждает!"
+    line = next(line for line in catalog.texts["game_over"].split("\n") if "{winner}" in line)
+    before, after = line.split("{winner}")
+    return re.compile(re.escape(before) + "(.+)" + re.escape(after))
+
+
+class LoadStats:
+    def __init__(self):
+        self.connected = 0
+        self.games = 0
+        self.commands = 0
+        self.latencies = []  # Секунды, с прошлой сводки
+        self.errors = collections.Counter()  # {вид ошибки: сколько}
+
+    def take_latencies(self):
+        latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+class Bot:
+    def __init__(self, index, host, port, stats, catalog, framed=True, think=0.0):
+        self.name = f"bot{index}"
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.framed = framed
+        self.think = think  # Максимальная пауза перед ходом, секунд
+        self.your_turn_bytes = catalog.text("your_turn").encode("utf-8")
+        self.winner_pattern = _winner_pattern(catalog)
+        self.writer = None
+        self.shot_sent_at = None  # Когда отправлен выстрел, ответа на который еще нет
+        self.shoot_after_reply = False  # Текстовый режим: выстрелить, когда придет ответ на запрос
+
+    async def run(self, stop_event):
+        try:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        except OSError:
+            self.stats.errors["connect"] += 1
+            return
+        self.stats.connected += 1
+        try:
+            welcome = (await reader.read(1024)).decode(errors="replace")
+            if not welcome:
+                self.stats.errors["closed_on_welcome"] += 1
+                return
+            if self.framed and FRAME_TOKEN in welcome:
+                self.writer.write(encode_hello(self.name, events=EVENTS_TOKEN in welcome))
+                session = self._framed_session(reader, stop_event)
+            else:
+                self.writer.write(self.name.encode())
+                session = self._text_session(reader, stop_event)
+            await session
+        except ProtocolError:
+            self.stats.errors["protocol"] += 1
+        except (ConnectionError, OSError):
+            if not stop_event.is_set():
+                self.stats.errors["disconnect"] += 1
+        finally:
+            self.stats.connected -= 1
+            self.writer.close()
+
+    async def _read(self, reader, stop_event):
+        data = await reader.read(RECV_SIZE)
+        if not data and not stop_event.is_set():
+            self.stats.errors["closed_by_server"] += 1
+        return data
+
+    async def _framed_session(self, reader, stop_event):
+        decoder = FrameDecoder()
+        while not stop_event.is_set():
+            data = await self._read(reader, stop_event)
+            if not data:
+                return
+            for opcode, payload in decoder.feed(data):
+                if opcode == OP_YOUR_TURN:
+                    await self._take_turn()
+                elif opcode == OP_SHOT:
+                    if self.shot_sent_at is not None and decode_shot(payload)[0] == self.name:
+                        self._shot_answered()
+                elif opcode == OP_PLAYERS:
+                    names, current, targets = decode_players(payload)
+                    if targets is not None:  # Цели присылают только ходящему - значит, ход еще наш
+                        await self._shoot(f"игрок {random.choice(targets)}" if targets else "я")
+                elif opcode == OP_GAME_OVER:
+                    if unpack_str(payload)[0] == self.name:
+                        self.stats.games += 1
+                elif opcode == OP_PING:
+                    self.writer.write(encode_pong())
+                elif opcode == OP_TEXT:
+                    self._check_winner(payload.decode(errors="replace"))  # Сервер без типизированных событий
+
+    async def _text_session(self, reader, stop_event):
+        decoder = LineDecoder()  # Режет по байту перевода строки: буквы, разорванные между read, не портятся
+        while not stop_event.is_set():
+            data = await self._read(reader, stop_event)
+            if not data:
+                return
+            if self.shot_sent_at is not None:
+                self._shot_answered()  # Пока мы ходим, остальные молчат: первый ответ - наш выстрел
+            elif self.shoot_after_reply:
+                self.shoot_after_reply = False
+                await self._shoot("я")
+            your_turn = self.your_turn_bytes
+            lines = decoder.feed(data)
+            # Приглашение к ходу приходит без перевода строки и может слиться со следующим сообщением
+            my_turn = your_turn in decoder.pending()
+            for line in lines:
+                self._check_winner(line)
+                my_turn = my_turn or your_turn in line.encode("utf-8")
+            if my_turn:
+                decoder.clear()
+                await self._take_turn()
+
+    def _check_winner(self, text):
+        for line in text.split("\n"):
+            match = self.winner_pattern.fullmatch(line)
+            if match and match.group(1) == self.name:
+                self.stats.games += 1
+
+    async def _take_turn(self):
+        if self.think:
+            await asyncio.sleep(random.uniform(0, self.think))
+        roll = random.random()
+        if roll < 0.15:
+            self._send("инфо")
+        elif roll < 0.5:
+            self._send("игроки")
+        else:
+            await self._shoot("я")
+            return
+        # В текстовом протоколе у команд нет границ: две подряд сервер прочтет как одну,
+        # поэтому стреляем после ответа. В кадровом выстрел - по списку целей или сразу после "инфо"
+        if not self.framed:
+            self.shoot_after_reply = True
+        elif roll < 0.15:
+            await self._shoot("я")
+
+    async def _shoot(self, action):
+        self.shot_sent_at = time.perf_counter()
+        self._send(action)
+        await self.writer.drain()
+
+    def _shot_answered(self):
+        self.stats.latencies.append(time.perf_counter() - self.shot_sent_at)
+        self.shot_sent_at = None
+
+    def _send(self, action):
+        self.stats.commands += 1
+        self.writer.write(encode_command(action) if self.framed else action.encode())
+
+
+def _report(stats, elapsed, games, commands, latencies):
+    if latencies:
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        latency = f"p50 {p50:7.2f} мс  p99 {p99:7.2f} мс"
+    else:
+        latency = "p50       - мс  p99       - мс"
+    errors = ", ".join(f"{kind}: {count}" for kind, count in sorted(stats.errors.items())) or "нет"
+    print(f"[{time.strftime('%H:%M:%S')}] ботов {stats.connected:>6} | партий/с {games / elapsed:8.1f} | "
+          f"команд/с {commands / elapsed:9.1f} | {latency} | ошибки: {errors}", flush=True)
+
+
+async def drive(host, port, bots, duration, text_share=0.0, think=0.0, connect_rate=CONNECT_RATE,
+                interval=REPORT_INTERVAL, locale=DEFAULT_LOCALE):
+    stats = LoadStats()
+    catalog = get_catalog(locale)
+    stop_event = asyncio.Event()
+    tasks = []
+    for index in range(bots):
+        bot = Bot(index, host, port, stats, catalog, framed=random.random() >= text_share, think=think)
+        tasks.append(asyncio.create_task(bot.run(stop_event)))
+        if connect_rate and index % connect_rate == connect_rate - 1:
+            await asyncio.sleep(1.0)
+
+    started = last_report = time.perf_counter()
+    last_games = last_commands = 0
+    all_latencies = []
+    while True:
+        now = time.perf_counter()
+        remaining = started + duration - now
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(interval - (now - last_report), remaining))
+        now = time.perf_counter()
+        latencies = stats.take_latencies()
+        all_latencies.extend(latencies)
+        _report(stats, now - last_report, stats.games - last_games, stats.commands - last_commands, latencies)
+        last_report, last_games, last_commands = now, stats.games, stats.commands
+
+    elapsed = time.perf_counter() - started
+    all_latencies.extend(stats.take_latencies())
+    print("Итого:", end=" ")
+    _report(stats, elapsed, stats.games, stats.commands, all_latencies)
+    stop_event.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--bots", type=int, default=100, help="число одновременных ботов")
+    parser.add_argument("--duration", type=float, default=30.0, help="сколько секунд гонять нагрузку")
+    parser.add_argument("--text-share", type=float, default=0.0, help="доля ботов на старом текстовом протоколе")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="максимальная случайная пауза перед ходом")
+    parser.add_argument("--connect-rate", type=int, default=CONNECT_RATE, help="новых ботов в секунду")
+    parser.add_argument("--interval", type=float, default=REPORT_INTERVAL, help="период сводки, секунд")
+    parser.add_argument("--locale", choices=sorted(LOCALES), default=DEFAULT_LOCALE,
+                        help="язык сервера; по нему бот узнает приглашение к ходу и победу. Какой язык у внешнего "
+                             "сервера (--port), проверить нельзя - укажите тот же, что в его --locale")
+    parser.add_argument("--serve", choices=ENGINES,
+                        help="поднять сервер с этим движком в отдельном процессе на свободном порту")
+    parser.add_argument("--room-size", type=int, default=6, help="мест за столом для --serve")
+    args = parser.parse_args()
+
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = args.bots * 2 + 64
+        if soft < wanted:
+            # На macOS жесткий предел - RLIM_INFINITY, а его setrlimit не принимает
+            limit = wanted if hard == resource.RLIM_INFINITY else hard
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+            except (ValueError, OSError) as e:
+                print(f"Не удалось поднять предел открытых файлов до {limit} (сейчас {soft}): {e}")
+
+    process = None
+    port = args.port
+    if args.serve:
+        port = _free_port(args.host)
+        process = multiprocessing.Process(target=_run_server, args=(args.serve, args.host, port),
+                                          kwargs={"room_size": args.room_size, "locale": args.locale}, daemon=True)
+        process.start()
+        _wait_for_server(args.host, port)
+    try:
+        asyncio.run(drive(args.host, port, args.bots, args.duration, text_share=args.text_share,
+                          think=args.think_ms / 1000, connect_rate=args.connect_rate, interval=args.interval,
+                          locale=args.locale))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,32 @@
+"""Окно игрока. Сеть - в client_core.ClientSession, окно только показывает ее события.
+
+    python client.py
+    python client.py --seats 3 --name Тест   # три места в одном процессе, для проверки партии
+"""
+import argparse
+import queue
 import socket
-import threading
+
 import customtkinter as ctk
-from tkinter import scrolledtext, messagebox, Toplevel
+from tkinter import scrolledtext, messagebox
+
+from client_core import ClientSession
+from log_view import LogView
+
+EVENT_POLL_MS = 50  # Как часто окно забирает события сессии из очереди
 
 
 class RussianRouletteClient:
-    def __init__(self):
-        self.client_socket = None
-        self.player_name = ""
-        self.game_started = False
-        self.is_my_turn = False
-        self.players_list = []
+    def __init__(self, master=None, host="localhost", port=12345, name=""):
+        """Без master - главное окно приложения, иначе дополнительное окно (место) в том же процессе."""
+        self.session = None
+        self.events = queue.Queue()  # События сессии из потока приема, кроме строк журнала
         self.selection_window = None
         self.loading_label = None
         self.player_var = None
+        self.player_menu = None  # Меню целей открытого окна выбора; обновляется без пересоздания
 
-        ctk.set_appearance_mode("light")
-        ctk.set_default_color_theme("blue")
-
-        self.root = ctk.CTk()
+        self.root = ctk.CTk() if master is None else ctk.CTkToplevel(master)
         self.root.title("Русская рулетка")
         self.root.geometry("700x600")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -36,9 +44,11 @@ class RussianRouletteClient:
         self.create_help_tab()
         self.create_about_tab()
 
+        self.host_entry.insert(0, host)
+        self.port_entry.insert(0, str(port))
+        self.name_entry.insert(0, name)
         self.tabview.set("Подключение")
-
-        self.root.mainloop()
+        self.poll_job = self.root.after(EVENT_POLL_MS, self.poll_events)
 
     def create_connection_tab(self):
         tab = self.tabview.tab("Подключение")
@@ -47,12 +57,10 @@ class RussianRouletteClient:
 
         ctk.CTkLabel(tab, text="Адрес сервера:").pack()
         self.host_entry = ctk.CTkEntry(tab)
-        self.host_entry.insert(0, "localhost")
         self.host_entry.pack(pady=5, fill="x", padx=20)
 
         ctk.CTkLabel(tab, text="Порт:").pack()
         self.port_entry = ctk.CTkEntry(tab)
-        self.port_entry.insert(0, "12345")
         self.port_entry.pack(pady=5, fill="x", padx=20)
 
         ctk.CTkLabel(tab, text="Ваше имя:").pack()
@@ -70,6 +78,7 @@ class RussianRouletteClient:
 
         self.game_log = scrolledtext.ScrolledText(tab, state='disabled', height=20, wrap="word", font=("Arial", 12))
         self.game_log.pack(pady=10, padx=10, fill="both", expand=True)
+        self.log_view = LogView(self.game_log)
 
         self.actions_frame = ctk.CTkFrame(tab)
         self.actions_frame.pack(pady=10, fill="x", padx=10)
@@ -157,9 +166,9 @@ class RussianRouletteClient:
     def connect_to_server(self):
         host = self.host_entry.get().strip()
         port_str = self.port_entry.get().strip()
-        self.player_name = self.name_entry.get().strip()
+        player_name = self.name_entry.get().strip()
 
-        if not self.player_name:
+        if not player_name:
             messagebox.showerror("Ошибка", "Пожалуйста, введите ваше имя.")
             return
 
@@ -180,177 +189,64 @@ class RussianRouletteClient:
             messagebox.showerror("Ошибка", "Порт должен быть числом.")
             return
 
-        try:
-            self.status_label.configure(text="Подключение...")
-            self.root.update_idletasks()
-
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.client_socket.settimeout(5)
-            self.client_socket.connect((host, port))
-            self.client_socket.settimeout(None)
-
-            welcome_msg_bytes = self.client_socket.recv(1024)
-            welcome_msg = welcome_msg_bytes.decode('utf-8').strip()
-            self.add_to_log(f"Сервер: {welcome_msg}")
-
-            self.client_socket.send(self.player_name.encode('utf-8'))
-            self.add_to_log(f"Вы: Имя '{self.player_name}' отправлено.")
-
-            self.status_label.configure(text=f"Подключено как {self.player_name}", text_color="green")
-
-            threading.Thread(target=self.receive_messages, daemon=True).start()
-
-            self.tabview.set("Игра")
-            self.connect_button.configure(state="disabled")
+        self.status_label.configure(text="Подключение...")
+        self.root.update_idletasks()
 
+        session = ClientSession(player_name, listener=self.on_session_event)
+        try:
+            session.connect(host, port)
         except socket.timeout:
             messagebox.showerror("Ошибка", "Не удалось подключиться: превышено время ожидания.")
             self.status_label.configure(text="Ошибка подключения (timeout)", text_color="red")
-            if self.client_socket:
-                self.client_socket.close()
-                self.client_socket = None
+            return
         except ConnectionRefusedError:
             messagebox.showerror("Ошибка", "Не удалось подключиться: сервер отклонил соединение.")
             self.status_label.configure(text="Ошибка подключения (refused)", text_color="red")
-            if self.client_socket:
-                self.client_socket.close()
-                self.client_socket = None
+            return
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось подключиться: {str(e)}")
             self.status_label.configure(text=f"Ошибка: {str(e)}", text_color="red")
-            if self.client_socket:
-                self.client_socket.close()
-                self.client_socket = None
-
-    def receive_messages(self):
-        buffer = ""
-        while True:
-            if not self.client_socket:
-                break
-            try:
-                data_bytes = self.client_socket.recv(2048)
-                if not data_bytes:
-                    self.add_to_log("Сервер закрыл соединение.")
-                    break
-
-                buffer += data_bytes.decode('utf-8')
-
-                while '\n' in buffer:
-                    message, buffer = buffer.split('\n', 1)
-                    single_message = message.strip()
-
-                    if not single_message:
-                        continue
-
-                    self.add_to_log(f"Сервер: {single_message}")
-
-                    # --- Новая, более строгая логика is_my_turn ---
-                    if "Ваш ход!" in single_message:
-                        self.is_my_turn = True
-                    elif "Ход игрока " in single_message:
-                        try:
-                            announced_player_name = single_message.split("Ход игрока ")[1].strip()
-                            if announced_player_name.lower() != self.player_name.lower():
-                                self.is_my_turn = False
-                        except IndexError:
-                            pass
-                    elif ("выбывает из игры!" in single_message and self.player_name in single_message) or \
-                            ("=== ИГРА ОКОНЧЕНА ===" in single_message) or \
-                            (
-                                    "побеждает!" in single_message and self.player_name not in single_message and "Никто не" not in single_message):
-                        self.is_my_turn = False
-                    # Не сбрасываем is_my_turn по "=== ИГРА НАЧИНАЕТСЯ ===" без дополнительной проверки,
-                    # так как "Ваш ход!" может прийти чуть позже или в том же блоке данных.
-                    # Флаг is_my_turn должен меняться только при явном указании смены хода.
-
-                    # --- Остальная логика ---
-                    if "Живые игроки:" in single_message or "Доступные цели для 'игрок [имя]':" in single_message:
-                        self.parse_players_list_from_full_message(message)
-
-                    if "=== ИГРА НАЧИНАЕТСЯ ===" in single_message:
-                        self.game_started = True
-                    elif "=== ИГРА ОКОНЧЕНА ===" in single_message or "побеждает!" in single_message:
-                        self.game_started = False
-
-            except ConnectionResetError:
-                self.add_to_log("Соединение с сервером сброшено.")
-                break
-            except ConnectionAbortedError:
-                self.add_to_log("Соединение с сервером прервано.")
-                break
-            except socket.error as e:
-                self.add_to_log(f"Ошибка сокета: {e}")
-                break
-            except Exception as e:
-                self.add_to_log(f"Ошибка получения сообщения: {str(e)}")
-                break
-
-        self.handle_disconnect()
+            return
 
-    def handle_disconnect(self):
-        self.add_to_log("Отключено от сервера.")
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except:
-                pass
-        self.client_socket = None
-        self.is_my_turn = False
-        self.game_started = False
-        if hasattr(self, 'connect_button'):
-            self.connect_button.configure(state="normal")
-        if hasattr(self, 'status_label'):
-            self.status_label.configure(text="Отключено", text_color="orange")
-
-    def parse_players_list_from_full_message(self, full_server_message):
-        lines = full_server_message.split('\n')
-
-        targets_for_shot = []
-        all_live_players = []
-
-        parsing_mode = None
-
-        for line in lines:
-            line_stripped = line.strip()
-            if not line_stripped:
-                continue
-
-            if "Доступные цели для 'игрок [имя]':" in line_stripped:
-                parsing_mode = "targets"
-                continue
-            elif "Живые игроки:" in line_stripped:
-                parsing_mode = "live"
-                continue
-
-            if line_stripped.startswith('- '):
-                player_name_part = line_stripped[2:]
-                if "(ходит)" in player_name_part:
-                    player_name_part = player_name_part.replace("(ходит)", "").strip()
-
-                if parsing_mode == "targets":
-                    targets_for_shot.append(player_name_part)
-                elif parsing_mode == "live":
-                    all_live_players.append(player_name_part)
-
-        if targets_for_shot:
-            self.players_list = targets_for_shot
-        elif all_live_players:
-            self.players_list = [p for p in all_live_players if p.lower() != self.player_name.lower()]
+        self.session = session
+        self.status_label.configure(text=f"Подключено как {player_name}", text_color="green")
+        session.start()
+
+        self.tabview.set("Игра")
+        self.connect_button.configure(state="disabled")
+
+    def on_session_event(self, event, data):
+        # Поток приема: строки журнала LogView принимает из любого потока, остальное - через очередь
+        if event == "log":
+            self.add_to_log(data)
         else:
-            self.players_list = []
+            self.events.put((event, data))
 
-        if self.selection_window and self.selection_window.winfo_exists():
-            self.update_selection_window_content()
+    def poll_events(self):
+        try:
+            while True:
+                event, data = self.events.get_nowait()
+                if event == "players":
+                    self.update_selection_window_content()
+                elif event == "reconnecting":
+                    self.status_label.configure(text="Переподключение...", text_color="orange")
+                elif event == "reconnected":
+                    self.status_label.configure(text=f"Подключено как {self.session.player_name}",
+                                                text_color="green")
+                elif event == "disconnected":
+                    self.handle_disconnect()
+        except queue.Empty:
+            pass
+        self.poll_job = self.root.after(EVENT_POLL_MS, self.poll_events)
+
+    def handle_disconnect(self):
+        self.connect_button.configure(state="normal")
+        self.status_label.configure(text="Отключено", text_color="orange")
 
     def show_player_selection(self):
-        if not self.is_my_turn:
-            self.add_to_log("Сейчас не ваш ход!")
-            return
-        if not self.game_started:
-            self.add_to_log("Игра еще не началась!")
-            return
-        if not self.client_socket:
-            self.add_to_log("Нет подключения к серверу.")
+        error = self.session.action_error("игрок ") if self.session else "Нет подключения к серверу."
+        if error:
+            self.add_to_log(error)
             return
 
         if self.selection_window and self.selection_window.winfo_exists():
@@ -362,6 +258,12 @@ class RussianRouletteClient:
         self.selection_window.transient(self.root)
         self.selection_window.grab_set()
         self.selection_window.attributes("-topmost", True)
+        self.player_menu = None
+
+        if self.session.typed_events:
+            # Состав стола уже есть у сессии - окно открывается сразу, без запроса к серверу
+            self.update_selection_window_content()
+            return
 
         self.loading_label = ctk.CTkLabel(self.selection_window, text="Загрузка списка игроков...")
         self.loading_label.pack(pady=20, padx=10)
@@ -372,10 +274,18 @@ class RussianRouletteClient:
         if not (self.selection_window and self.selection_window.winfo_exists()):
             return
 
+        available_targets = self.session.players_list if self.session else []
+
+        if self.player_menu is not None and available_targets:
+            # Окно уже со списком: меняем только пункты меню, выбранную цель по возможности оставляем
+            self.player_menu.configure(values=available_targets)
+            if self.player_var.get() not in available_targets:
+                self.player_var.set(available_targets[0])
+            return
+
         for widget in self.selection_window.winfo_children():
             widget.destroy()
-
-        available_targets = self.players_list
+        self.player_menu = None
 
         if not available_targets:
             ctk.CTkLabel(self.selection_window, text="Нет доступных целей!").pack(pady=20, padx=10)
@@ -385,14 +295,14 @@ class RussianRouletteClient:
         ctk.CTkLabel(self.selection_window, text="Выберите игрока для выстрела:").pack(pady=10)
 
         self.player_var = ctk.StringVar(value=available_targets[0] if available_targets else "")
-        player_menu = ctk.CTkOptionMenu(
+        self.player_menu = ctk.CTkOptionMenu(
             self.selection_window,
             values=available_targets if available_targets else ["Нет целей"],
             variable=self.player_var,
             width=200,
             state="normal" if available_targets else "disabled"
         )
-        player_menu.pack(pady=10)
+        self.player_menu.pack(pady=10)
 
         confirm_button = ctk.CTkButton(
             self.selection_window,
@@ -420,54 +330,48 @@ class RussianRouletteClient:
             self.selection_window = None
 
     def add_to_log(self, message):
-        if self.root and hasattr(self, 'game_log') and self.game_log:
-            try:
-                # Выполняем обновление GUI в основном потоке
-                self.root.after(0, self._add_to_log_threadsafe, message)
-            except Exception as e:
-                print(f"Ошибка планирования добавления в лог GUI: {e}")
-
-    def _add_to_log_threadsafe(self, message):
-        """Этот метод будет вызван в основном потоке GUI."""
-        try:
-            self.game_log.configure(state='normal')
-            self.game_log.insert('end', message + '\n')
-            self.game_log.configure(state='disabled')
-            self.game_log.see('end')
-        except Exception as e:
-            print(f"Ошибка добавления в лог GUI (threadsafe): {e}")
+        # Можно звать из потока приема: в виджет строки выведет LogView в основном потоке
+        if getattr(self, 'log_view', None):
+            self.log_view.append(message)
 
     def send_action(self, action):
-        if not self.client_socket:
-            self.add_to_log("Ошибка: нет подключения к серверу.")
-            messagebox.showerror("Ошибка", "Нет подключения к серверу. Пожалуйста, подключитесь снова.")
+        error = self.session.action_error(action) if self.session else "Нет подключения к серверу."
+        if error:
+            if not (self.session and self.session.connected):
+                self.add_to_log(f"Ошибка: {error.lower()}")
+                messagebox.showerror("Ошибка", f"{error} Пожалуйста, подключитесь снова.")
+            else:
+                self.add_to_log(error)
+                messagebox.showwarning("Внимание", error)
             return
-
-        if action == "я" or action.startswith("игрок "):
-            if not self.is_my_turn:
-                self.add_to_log("Сейчас не ваш ход!")
-                messagebox.showwarning("Внимание", "Сейчас не ваш ход!")
-                return
-            if not self.game_started:
-                self.add_to_log("Игра еще не началась!")
-                messagebox.showwarning("Внимание", "Игра еще не началась!")
-                return
-
-        try:
-            self.client_socket.send(action.encode('utf-8'))
-            self.add_to_log(f"Вы: {action}")
-        except Exception as e:
-            self.add_to_log(f"Ошибка отправки действия: {str(e)}")
-            self.handle_disconnect()
+        self.session.send_action(action)
 
     def on_closing(self):
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except Exception as e:
-                print(f"Ошибка при закрытии сокета: {e}")
+        self.root.after_cancel(self.poll_job)
+        if self.session:
+            self.session.close()
         self.root.destroy()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Клиент игры \"Русская рулетка\"")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--name", default="", help="имя игрока; при нескольких местах к нему добавляется номер")
+    parser.add_argument("--seats", type=int, default=1, help="сколько окон-мест открыть в одном процессе")
+    args = parser.parse_args()
+
+    ctk.set_appearance_mode("light")
+    ctk.set_default_color_theme("blue")
+
+    def seat_name(index):
+        return f"{args.name}{index + 1}" if args.name and args.seats > 1 else args.name
+
+    main_window = RussianRouletteClient(host=args.host, port=args.port, name=seat_name(0))
+    for index in range(1, args.seats):
+        RussianRouletteClient(master=main_window.root, host=args.host, port=args.port, name=seat_name(index))
+    main_window.root.mainloop()
+
+
 if __name__ == "__main__":
-    client_app = RussianRouletteClient()
\ No newline at end of file
+    main()
@@ -0,0 +1,435 @@
+"""Сетевая часть клиента без окна: подключение, прием, разбор сообщений, команды.
+
+ClientSession - одно место за столом. Окно (client.py), многоместное
+тестовое окно или бот держат у себя сколько угодно сессий в одном
+процессе; каждая принимает данные в своем потоке и сообщает о событиях
+через listener(event, data), вызываемый из этого потока:
+  "log"          - строка для журнала игры;
+  "players"      - новый список целей для выстрела (с сервером, присылающим
+                   изменения состава, - после каждого изменения, без запроса);
+  "reconnecting" - связь оборвалась, идет попытка переподключения (data - ее номер);
+  "reconnected"  - место за столом восстановлено;
+  "disconnected" - соединение закрыто (data = None).
+Tk-виджеты из listener трогать нельзя: окно перекладывает события в
+очередь и забирает их в основном потоке.
+"""
+import random
+import socket
+import threading
+import time
+
+from protocol import (FRAME_TOKEN, EVENTS_TOKEN, OP_TEXT, OP_TURN, OP_YOUR_TURN, OP_PLAYERS, OP_GAME_START, OP_ELIM,
+                      OP_GAME_OVER, OP_JOIN, OP_LEAVE, OP_ROSTER, OP_SESSION, OP_PING, BYE_COMMAND, FrameDecoder,
+                      LineDecoder, encode_hello, encode_resume, encode_command, encode_pong, render_frame, unpack_str,
+                      unpack_str_list, decode_players, decode_join, decode_roster, decode_session)
+
+CONNECT_TIMEOUT = 5.0
+RECV_SIZE = 2048
+RECONNECT_DELAY = 0.5  # Первая пауза перед переподключением, секунд; дальше удваивается
+RECONNECT_MAX_DELAY = 8.0
+RECONNECT_MARGIN = 0.1  # Последняя попытка должна успеть до того, как сервер освободит место
+
+
+def parse_players_list(full_server_message, player_name):
+    # Цели для выстрела из текстового ответа на "игроки"; если целей нет - живые игроки, кроме себя
+    targets_for_shot = []
+    all_live_players = []
+    parsing_mode = None
+
+    for line in full_server_message.split('\n'):
+        line_stripped = line.strip()
+        if not line_stripped:
+            continue
+
+        if "Доступные цели для 'игрок [имя]':" in line_stripped:
+            parsing_mode = "targets"
+            continue
+        elif "Живые игроки:" in line_stripped:
+            parsing_mode = "live"
+            continue
+
+        if line_stripped.startswith('- '):
+            player_name_part = line_stripped[2:]
+            if "(ходит)" in player_name_part:
+                player_name_part = player_name_part.replace("(ходит)", "").strip()
+
+            if parsing_mode == "targets":
+                targets_for_shot.append(player_name_part)
+            elif parsing_mode == "live":
+                all_live_players.append(player_name_part)
+
+    if targets_for_shot:
+        return targets_for_shot
+    return [p for p in all_live_players if p.lower() != player_name.lower()]
+
+
+def _without(names, name):
+    name = name.lower()
+    return [p for p in names if p.lower() != name]
+
+
+class ClientSession:
+    def __init__(self, player_name, listener=None):
+        self.player_name = player_name
+        self.listener = listener  # listener(event, data); вызывается из потока приема
+        self.client_socket = None
+        self.framed = False  # Сервер поддерживает кадровый протокол RRF/1
+        self.typed_events = False  # Начало/конец партии и выбывание приходят своими кадрами, а не текстом
+        self.game_started = False
+        self.is_my_turn = False
+        self.players_list = []
+        # Состав стола по изменениям от сервера (только при typed_events)
+        self.table = []  # Все, кто сидит за столом
+        self.alive = []  # Живые в порядке хода
+        self.current = None  # Кто ходит
+        self.host = None
+        self.port = None
+        self.resume_token = None  # Выдан сервером (OP_SESSION): с ним можно вернуться на место после обрыва
+        self.resume_grace = 0  # Сколько секунд сервер держит место
+        self.closed = False  # Игрок сам закрыл сессию - не переподключаемся
+        self.resume_deadline = None  # До какого time.monotonic() пробовать вернуться; считается от первого обрыва
+        self.reconnect_delay = RECONNECT_DELAY
+        self.reconnect_attempt = 0
+        self.lock = threading.Lock()  # Отключение может начаться и из потока приема, и из отправки
+        # Кадр -> обработчик; текст кадра для журнала выводится до вызова
+        self.frame_handlers = {
+            OP_YOUR_TURN: self.on_your_turn,
+            OP_TURN: self.on_turn,
+            OP_PLAYERS: self.on_players,
+            OP_GAME_START: self.on_game_start,
+            OP_ELIM: self.on_eliminated,
+            OP_GAME_OVER: self.on_game_over,
+            OP_JOIN: self.on_join,
+            OP_LEAVE: self.on_leave,
+            OP_ROSTER: self.on_roster,
+            OP_SESSION: self.on_session,
+            OP_PING: self.on_ping,
+        }
+
+    @property
+    def connected(self):
+        return self.client_socket is not None
+
+    def emit(self, event, data=None):
+        if self.listener is not None:
+            self.listener(event, data)
+
+    def log(self, message):
+        self.emit("log", message)
+
+    def connect(self, host, port, timeout=CONNECT_TIMEOUT):
+        """Подключается, читает приветствие и представляется; ошибки сети (OSError) - вызывающему.
+        Прием запускает start()."""
+        self.host, self.port = host, port
+        self.closed = False
+        self.resume_deadline = None
+        self._open(timeout)
+        self.log(f"Вы: Имя '{self.player_name}' отправлено.")
+
+    def _open(self, timeout, resume=False):
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            client_socket.settimeout(timeout)
+            client_socket.connect((self.host, self.port))
+            welcome_msg = client_socket.recv(1024).decode('utf-8').strip()
+            client_socket.settimeout(None)
+            if not welcome_msg:
+                raise ConnectionResetError("Сервер закрыл соединение до приветствия")
+            self.framed = FRAME_TOKEN in welcome_msg
+            self.typed_events = self.framed and EVENTS_TOKEN in welcome_msg
+            if not resume:
+                self.log(f"Сервер: {welcome_msg.replace(FRAME_TOKEN, '').replace(EVENTS_TOKEN, '').strip()}")
+
+            if resume:
+                if not (self.typed_events and self.resume_token):  # Например, "Сервер переполнен"
+                    raise ConnectionRefusedError(f"Сервер не принял возврат: {welcome_msg}")
+                client_socket.send(encode_resume(self.resume_token, self.player_name))
+            elif self.framed:
+                client_socket.send(encode_hello(self.player_name, events=self.typed_events))
+            else:
+                client_socket.send(self.player_name.encode('utf-8'))
+        except BaseException:
+            client_socket.close()
+            raise
+        self.client_socket = client_socket
+
+    def start(self):
+        threading.Thread(target=self.receive_messages, name=f"client-{self.player_name}", daemon=True).start()
+
+    def receive_messages(self):
+        while True:
+            self.receive_until_closed()
+            if not self.reconnect():
+                break
+        self.handle_disconnect()
+
+    def receive_until_closed(self):
+        decoder = FrameDecoder() if self.framed else None
+        line_decoder = None if self.framed else LineDecoder()
+        while True:
+            client_socket = self.client_socket
+            if not client_socket:
+                break
+            try:
+                data_bytes = client_socket.recv(RECV_SIZE)
+                if not data_bytes:
+                    if not self.closed:  # Иначе сокет закрыли мы сами
+                        self.log("Сервер закрыл соединение.")
+                    break
+
+                if decoder is not None:
+                    for opcode, payload in decoder.feed(data_bytes):
+                        self.handle_frame(opcode, payload)
+                    continue
+
+                for message in line_decoder.feed(data_bytes):
+                    self.handle_server_message(message)
+
+            except ConnectionResetError:
+                self.log("Соединение с сервером сброшено.")
+                break
+            except ConnectionAbortedError:
+                self.log("Соединение с сервером прервано.")
+                break
+            except socket.error as e:
+                if not self.closed:  # Иначе сокет закрыли мы сами
+                    self.log(f"Ошибка сокета: {e}")
+                break
+            except Exception as e:
+                self.log(f"Ошибка получения сообщения: {str(e)}")
+                break
+
+    def reconnect(self):
+        # Обрыв связи: пока сервер держит место, переподключаемся с растущей паузой и предъявляем токен
+        if self.closed or not self.resume_token:
+            return False
+        with self.lock:
+            client_socket, self.client_socket = self.client_socket, None
+        if client_socket is not None:
+            self.close_socket(client_socket)
+        self.is_my_turn = False  # Если ход наш, сервер пришлет его заново вместе со снимком
+
+        if self.resume_deadline is None:  # Первый обрыв; соединение, так и не приславшее снимок, срок не продлевает
+            self.resume_deadline = time.monotonic() + self.resume_grace
+            self.reconnect_delay = RECONNECT_DELAY
+            self.reconnect_attempt = 0
+        while not self.closed:
+            # Разброс, чтобы клиенты после общего сбоя не шли разом; последняя попытка - до истечения срока
+            delay = min(self.reconnect_delay * random.uniform(0.8, 1.2),
+                        self.resume_deadline - time.monotonic() - RECONNECT_MARGIN)
+            if delay < 0:
+                break
+            self.reconnect_delay = min(self.reconnect_delay * 2, RECONNECT_MAX_DELAY)
+            self.reconnect_attempt += 1
+            self.log(f"Связь потеряна. Переподключение через {delay:.1f} с (попытка {self.reconnect_attempt})...")
+            self.emit("reconnecting", self.reconnect_attempt)
+            time.sleep(delay)
+            if self.closed:
+                return False
+            try:
+                self._open(CONNECT_TIMEOUT, resume=True)
+            except OSError as e:
+                self.log(f"Не удалось переподключиться: {e}")
+                continue
+            return True  # Возврат засчитает снимок OP_ROSTER (on_roster); если его не будет - следующая попытка
+        if not self.closed:
+            self.log("Вернуться в игру не удалось.")
+        return False
+
+    def handle_frame(self, opcode, payload):
+        # Кадр - ровно одно сообщение сервера, тип известен по коду операции
+        if opcode == OP_TEXT:
+            for message in payload.decode('utf-8').split('\n'):
+                if self.typed_events:
+                    if message.strip():
+                        self.log(f"Сервер: {message.strip()}")
+                else:
+                    self.handle_server_message(message)  # Старый сервер: о событиях узнаем из текста
+            return
+
+        for line in render_frame(opcode, payload).split('\n'):
+            if line.strip():
+                self.log(f"Сервер: {line.strip()}")
+
+        handler = self.frame_handlers.get(opcode)
+        if handler is not None:
+            handler(payload)
+
+    def on_your_turn(self, payload):
+        self.is_my_turn = True
+
+    def on_turn(self, payload):
+        announced_player_name = unpack_str(payload)[0]
+        self.current = announced_player_name
+        if announced_player_name.lower() != self.player_name.lower():
+            self.is_my_turn = False
+
+    def on_players(self, payload):
+        names, current, targets = decode_players(payload)
+        if targets is None:
+            targets = [p for p in names if p.lower() != self.player_name.lower()]
+        self.set_players_list(targets)
+
+    def on_game_start(self, payload):
+        self.game_started = True
+        self.alive = unpack_str_list(payload)[0]
+        self.set_players_list(self.targets())
+
+    def on_eliminated(self, payload):
+        name = unpack_str(payload)[0]
+        if name.lower() == self.player_name.lower():
+            self.is_my_turn = False
+        self.alive = _without(self.alive, name)
+        self.set_players_list(self.targets())
+
+    def on_game_over(self, payload):
+        self.is_my_turn = False
+        self.game_started = False
+        self.alive = []
+        self.current = None
+        self.set_players_list([])
+
+    def on_join(self, payload):
+        name = decode_join(payload)[0]
+        self.table = _without(self.table, name) + [name]
+
+    def on_leave(self, payload):
+        name = unpack_str(payload)[0]
+        self.table = _without(self.table, name)
+        if any(p.lower() == name.lower() for p in self.alive):
+            self.alive = _without(self.alive, name)
+            self.set_players_list(self.targets())
+
+    def on_roster(self, payload):
+        # Снимок при входе и при возврате; сервер мог переименовать нас, если имя было занято
+        self.player_name, self.table, self.alive, self.current = decode_roster(payload)
+        self.game_started = bool(self.alive)
+        self.set_players_list(self.targets())
+        if self.resume_deadline is not None:  # Сервер подтвердил возврат
+            self.resume_deadline = None
+            self.log("Соединение восстановлено.")
+            self.emit("reconnected")
+
+    def on_session(self, payload):
+        self.resume_token, self.resume_grace = decode_session(payload)
+
+    def on_ping(self, payload):
+        client_socket = self.client_socket
+        if client_socket is not None:
+            try:
+                client_socket.send(encode_pong())
+            except OSError:
+                pass  # Обрыв заметит поток приема
+
+    def targets(self):
+        # Цели для выстрела по составу стола: живые, кроме себя
+        return _without(self.alive, self.player_name)
+
+    def handle_server_message(self, message):
+        # Текстовый протокол и старые серверы: состояние угадывается по тексту сообщений
+        single_message = message.strip()
+
+        if not single_message:
+            return
+
+        self.log(f"Сервер: {single_message}")
+
+        # --- Новая, более строгая логика is_my_turn ---
+        if "Ваш ход!" in single_message:
+            self.is_my_turn = True
+        elif "Ход игрока " in single_message:
+            try:
+                announced_player_name = single_message.split("Ход игрока ")[1].strip()
+                if announced_player_name.lower() != self.player_name.lower():
+                    self.is_my_turn = False
+            except IndexError:
+                pass
+        elif ("выбывает из игры!" in single_message and self.player_name in single_message) or \
+                ("=== ИГРА ОКОНЧЕНА ===" in single_message) or \
+                (
+                        "побеждает!" in single_message and self.player_name not in single_message and "Никто не" not in single_message):
+            self.is_my_turn = False
+        # Не сбрасываем is_my_turn по "=== ИГРА НАЧИНАЕТСЯ ===" без дополнительной проверки,
+        # так как "Ваш ход!" может прийти чуть позже или в том же блоке данных.
+        # Флаг is_my_turn должен меняться только при явном указании смены хода.
+
+        # --- Остальная логика ---
+        if "Живые игроки:" in single_message or "Доступные цели для 'игрок [имя]':" in single_message:
+            self.set_players_list(parse_players_list(message, self.player_name))
+
+        if "=== ИГРА НАЧИНАЕТСЯ ===" in single_message:
+            self.game_started = True
+        elif "=== ИГРА ОКОНЧЕНА ===" in single_message or "побеждает!" in single_message:
+            self.game_started = False
+
+    def set_players_list(self, players):
+        self.players_list = players
+        self.emit("players", players)
+
+    def action_error(self, action):
+        # Почему команду сейчас отправлять нельзя (текст для игрока), или None
+        if not self.client_socket:
+            return "Нет подключения к серверу."
+        if action == "я" or action.startswith("игрок "):
+            if not self.is_my_turn:
+                return "Сейчас не ваш ход!"
+            if not self.game_started:
+                return "Игра еще не началась!"
+        return None
+
+    def send_action(self, action):
+        client_socket = self.client_socket
+        if not client_socket:
+            self.log("Ошибка: нет подключения к серверу.")
+            return False
+        try:
+            if self.framed:
+                client_socket.send(encode_command(action))
+            else:
+                client_socket.send(action.encode('utf-8'))
+            self.log(f"Вы: {action}")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка отправки действия: {str(e)}")
+            self.close_socket(client_socket)  # Поток приема заметит обрыв и попробует переподключиться
+            return False
+
+    def handle_disconnect(self):
+        with self.lock:
+            client_socket, self.client_socket = self.client_socket, None
+        if client_socket is not None:
+            self.close_socket(client_socket)
+        if self.closed:
+            return  # Закрыли сами, сообщать некому
+        self.log("Отключено от сервера.")
+        self.resume_token = None
+        self.resume_deadline = None
+        self.framed = False
+        self.is_my_turn = False
+        self.game_started = False
+        self.table, self.alive, self.current = [], [], None
+        self.emit("disconnected")
+
+    def close(self):
+        # Закрытие по желанию игрока: поток приема проснется на закрытом сокете и завершится
+        self.closed = True
+        with self.lock:
+            client_socket, self.client_socket = self.client_socket, None
+        if client_socket is not None:
+            if self.resume_token:
+                try:
+                    client_socket.send(encode_command(BYE_COMMAND))  # Иначе сервер будет держать место
+                except OSError:
+                    pass
+            self.close_socket(client_socket)
+
+    @staticmethod
+    def close_socket(client_socket):
+        try:
+            client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            client_socket.close()
+        except OSError as e:
+            print(f"Ошибка при закрытии сокета: {e}")
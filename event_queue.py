@@ -0,0 +1,59 @@
+"""Очередь событий сервера для окна управления и консоли.
+
+Сервер кладет сюда строки журнала и рассылки из многих потоков, а разбирает
+очередь один поток GUI. Снимок статуса сюда не попадает: окно и консоль сами
+запрашивают его у сервера (server.status()) по своему таймеру. Чтобы под
+нагрузкой очередь не росла без предела и не замораживала Tk:
+  - строки журнала хранятся в ограниченной очереди, лишние отбрасываются
+    и считаются в dropped;
+  - drain() отдает за один вызов не больше заданного числа строк.
+"""
+import collections
+import queue
+import threading
+
+EVENT_QUEUE_SIZE = 10000  # Строк журнала в очереди, сверх этого - отбрасываются
+STOPPED_EVENT = "server_stopped"
+
+
+class EventQueue:
+    def __init__(self, maxsize=EVENT_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.events = collections.deque()  # (тип, данные) - журнал, рассылки, остановка
+        self.dropped = 0  # Всего отброшено строк из-за переполнения
+        self.cond = threading.Condition()
+
+    def put(self, event, block=False, timeout=None):
+        # Никогда не ждет и не бросает queue.Full: сервер не должен тормозить из-за окна
+        with self.cond:
+            if len(self.events) < self.maxsize or event[0] == STOPPED_EVENT:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+                return
+            self.cond.notify()
+
+    def put_nowait(self, event):
+        self.put(event)
+
+    def get(self, block=True, timeout=None):
+        # Совместимо с queue.Queue.get: события по порядку
+        with self.cond:
+            if block and not self.cond.wait_for(lambda: self.events, timeout):
+                raise queue.Empty
+            if self.events:
+                return self.events.popleft()
+            raise queue.Empty
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def drain(self, max_events):
+        """Забрать до max_events событий журнала."""
+        with self.cond:
+            count = min(max_events, len(self.events))
+            return [self.events.popleft() for _ in range(count)]
+
+    def qsize(self):
+        with self.cond:
+            return len(self.events)
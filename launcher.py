@@ -0,0 +1,305 @@
+"""Запуск нескольких процессов-воркеров сервера на одном порту.
+
+Каждый воркер - отдельный процесс со своим RussianRouletteServer, поэтому игровая
+логика разных комнат выполняется на разных ядрах, а не под одним GIL.
+Порт делится через SO_REUSEPORT (ядро само распределяет подключения), а где
+его нет - родитель создает слушающий сокет и передает его воркерам.
+Родитель следит за воркерами, перезапускает упавшие и сводит их статистику.
+
+    python launcher.py --workers 8 --host 0.0.0.0 --port 12345
+"""
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+
+from event_queue import EventQueue
+from messages import LOCALES, DEFAULT_LOCALE
+from server_log import LEVELS, INFO
+from outbound import OVERFLOW_POLICIES, OVERFLOW_DROP, SEND_QUEUE_LIMIT, OVERFLOW_TIMEOUT
+from server import (create_server, ENGINES, MAX_PLAYERS, MAX_ROOMS, LISTEN_BACKLOG, STATS_INTERVAL, RESUME_GRACE,
+                    TURN_TIMEOUT, TURN_TIMEOUT_PASS, TURN_TIMEOUT_ACTIONS, HANDSHAKE_TIMEOUT, KEEPALIVE_INTERVAL)
+
+RESTART_BACKOFF_MAX = 30.0  # Максимальная пауза перед перезапуском воркера, падающего в цикле
+STABLE_UPTIME = 60.0  # Воркер, проживший дольше, считается стабильным и задержка сбрасывается
+
+
+def create_listen_socket(host, port):
+    listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listen_socket.bind((host, port))
+    listen_socket.listen(LISTEN_BACKLOG)
+    return listen_socket
+
+
+def run_worker(index, workers, options, stats_queue, listen_socket=None):
+    # Родитель сам решает, когда останавливаться: Ctrl+C в воркерах игнорируем
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    events = EventQueue()
+    metrics_port = options["metrics_port"] + index if options["metrics_port"] is not None else None
+    server = create_server(options["engine"], host=options["host"], port=options["port"], gui_queue=events,
+                           room_size=options["room_size"], max_rooms=options["max_rooms"],
+                           reuse_port=listen_socket is None, listen_socket=listen_socket,
+                           room_id_start=index + 1, room_id_step=workers,
+                           send_queue_limit=options["send_queue_limit"], overflow_policy=options["overflow_policy"],
+                           overflow_timeout=options["overflow_timeout"], locale=options["locale"],
+                           log_level=options["log_level"], metrics_host=options["metrics_host"],
+                           metrics_port=metrics_port, timings=options["timings"],
+                           resume_grace=options["resume_grace"], turn_timeout=options["turn_timeout"],
+                           turn_timeout_action=options["turn_timeout_action"],
+                           handshake_timeout=options["handshake_timeout"], keepalive=options["keepalive"])
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: server.timings.toggle())
+
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+
+    next_report = time.monotonic()
+    stopped = False
+    while not stopped:
+        try:
+            message_type, data = events.get(timeout=0.5)
+            if message_type == "log":
+                print(f"[воркер {index}] {data}", flush=True)
+            elif message_type == "server_stopped":
+                stopped = True
+        except queue.Empty:
+            pass
+
+        now = time.monotonic()
+        if now >= next_report or stopped:
+            try:
+                stats_queue.put_nowait((index, os.getpid(), server.status()))
+            except queue.Full:
+                pass
+            next_report = now + options["stats_interval"]
+
+    server_thread.join(timeout=5.0)
+
+
+class WorkerSupervisor:
+    def __init__(self, host='0.0.0.0', port=12345, workers=None, engine="threading", room_size=MAX_PLAYERS,
+                 max_rooms=MAX_ROOMS, stats_interval=STATS_INTERVAL, shared_socket=False,
+                 send_queue_limit=SEND_QUEUE_LIMIT, overflow_policy=OVERFLOW_DROP, overflow_timeout=OVERFLOW_TIMEOUT,
+                 locale=DEFAULT_LOCALE, log_level=INFO, metrics_host="127.0.0.1", metrics_port=None,
+                 timings=False, resume_grace=RESUME_GRACE, turn_timeout=TURN_TIMEOUT,
+                 turn_timeout_action=TURN_TIMEOUT_PASS, handshake_timeout=HANDSHAKE_TIMEOUT,
+                 keepalive=KEEPALIVE_INTERVAL):
+        self.options = {
+            "host": host,
+            "port": port,
+            "engine": engine,
+            "room_size": room_size,
+            "max_rooms": max_rooms,
+            "stats_interval": stats_interval,
+            "send_queue_limit": send_queue_limit,
+            "overflow_policy": overflow_policy,
+            "overflow_timeout": overflow_timeout,
+            "locale": locale,
+            "log_level": log_level,
+            "metrics_host": metrics_host,
+            "metrics_port": metrics_port,  # Воркер N отдает метрики на metrics_port + N
+            "timings": timings,  # Замеры времени; перезапущенный воркер получает текущее состояние
+            # Токен возобновления знает только выдавший его воркер: при SO_REUSEPORT переподключение может
+            # попасть в другой, и тогда игрок регистрируется заново
+            "resume_grace": resume_grace,
+            "turn_timeout": turn_timeout,
+            "turn_timeout_action": turn_timeout_action,
+            "handshake_timeout": handshake_timeout,
+            "keepalive": keepalive,
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.shared_socket = shared_socket or not hasattr(socket, "SO_REUSEPORT")
+        self.listen_socket = None
+        self.processes = {}  # {index: Process}
+        self.started_at = {}  # {index: время запуска}
+        self.backoff = {}  # {index: текущая пауза перед перезапуском}
+        self.restart_at = {}  # {index: когда перезапускать упавший воркер}
+        self.restarts = 0
+        self.worker_stats = {}  # {index: последний снимок статуса воркера}
+        self.stats_queue = multiprocessing.Queue()
+        self.running = False
+
+    def log(self, message):
+        print(f"[супервизор] {message}", flush=True)
+
+    def spawn(self, index):
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(index, self.workers, self.options, self.stats_queue, self.listen_socket),
+            name=f"roulette-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        self.log(f"Воркер {index} запущен (pid {process.pid}).")
+
+    def start(self):
+        if self.shared_socket:
+            self.listen_socket = create_listen_socket(self.options["host"], self.options["port"])
+            self.log("Режим общего слушающего сокета.")
+        else:
+            self.log("Режим SO_REUSEPORT.")
+
+        self.running = True
+        for index in range(self.workers):
+            self.spawn(index)
+        self.log(f"Запущено воркеров: {self.workers}, порт {self.options['port']}.")
+
+        next_report = time.monotonic() + self.options["stats_interval"]
+        try:
+            while self.running:
+                sentinels = {process.sentinel: index for index, process in self.processes.items()}
+                ready = multiprocessing.connection.wait(list(sentinels), timeout=0.5)
+                for sentinel in ready:
+                    self._on_worker_exit(sentinels[sentinel])
+                self._restart_due_workers()
+                self._drain_stats()
+                if time.monotonic() >= next_report:
+                    self.log(self.format_stats())
+                    next_report = time.monotonic() + self.options["stats_interval"]
+        finally:
+            self.shutdown()
+
+    def toggle_timings(self):
+        # Переключить замеры во всех воркерах (SIGUSR1 супервизору пересылается воркерам)
+        self.options["timings"] = not self.options["timings"]
+        self.log(f"Замеры времени {'включены' if self.options['timings'] else 'выключены'}.")
+        for process in self.processes.values():
+            if process.pid is not None:
+                os.kill(process.pid, signal.SIGUSR1)
+
+    def _on_worker_exit(self, index):
+        process = self.processes.pop(index)
+        process.join()
+        self.worker_stats.pop(index, None)
+        if not self.running:
+            return
+        uptime = time.monotonic() - self.started_at.get(index, 0)
+        if uptime >= STABLE_UPTIME:
+            self.backoff[index] = 0.0
+        delay = self.backoff.get(index, 0.0)
+        self.backoff[index] = min(max(delay * 2, 1.0), RESTART_BACKOFF_MAX)
+        self.restart_at[index] = time.monotonic() + delay
+        self.log(f"Воркер {index} (pid {process.pid}) завершился с кодом {process.exitcode}. "
+                 f"Перезапуск через {delay:.0f} с.")
+
+    def _restart_due_workers(self):
+        now = time.monotonic()
+        for index, restart_time in list(self.restart_at.items()):
+            if now >= restart_time:
+                del self.restart_at[index]
+                self.restarts += 1
+                self.spawn(index)
+
+    def _drain_stats(self):
+        while True:
+            try:
+                index, pid, status = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            process = self.processes.get(index)
+            if process is not None and process.pid == pid:  # Отбрасываем отчеты от уже перезапущенных воркеров
+                self.worker_stats[index] = status
+
+    def aggregate_stats(self):
+        totals = {"workers": len(self.processes), "connected": 0, "rooms": 0, "games_running": 0, "alive": 0,
+                  "send_queue_messages": 0, "send_queue_max_bytes": 0, "restarts": self.restarts}
+        for status in self.worker_stats.values():
+            for key in ("connected", "rooms", "games_running", "alive", "send_queue_messages"):
+                totals[key] += status.get(key, 0)
+            totals["send_queue_max_bytes"] = max(totals["send_queue_max_bytes"], status.get("send_queue_max_bytes", 0))
+        return totals
+
+    def format_stats(self):
+        totals = self.aggregate_stats()
+        return (f"Воркеров: {totals['workers']}/{self.workers} | Подкл: {totals['connected']} | "
+                f"Комнат: {totals['rooms']} | Игр: {totals['games_running']} | Живых: {totals['alive']} | "
+                f"В очередях: {totals['send_queue_messages']} сообщ. (макс. {totals['send_queue_max_bytes']} Б) | "
+                f"Перезапусков: {totals['restarts']}")
+
+    def stop(self):
+        self.running = False
+
+    def shutdown(self):
+        self.running = False
+        self.log("Остановка воркеров...")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: воркер штатно останавливает свой сервер
+        deadline = time.monotonic() + 5.0
+        for process in self.processes.values():
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.processes.clear()
+        if self.listen_socket is not None:
+            self.listen_socket.close()
+            self.listen_socket = None
+        self.log("Все воркеры остановлены.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="число процессов (по умолчанию - ядер)")
+    parser.add_argument("--engine", choices=ENGINES, default="threading")
+    parser.add_argument("--room-size", type=int, default=MAX_PLAYERS, help="мест за одним столом")
+    parser.add_argument("--max-rooms", type=int, default=MAX_ROOMS, help="максимум комнат на воркер")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL)
+    parser.add_argument("--shared-socket", action="store_true",
+                        help="передавать воркерам общий сокет вместо SO_REUSEPORT")
+    parser.add_argument("--send-queue-limit", type=int, default=SEND_QUEUE_LIMIT,
+                        help="байт в исходящей очереди одного клиента")
+    parser.add_argument("--overflow-policy", choices=OVERFLOW_POLICIES, default=OVERFLOW_DROP,
+                        help="что делать с клиентом, чья очередь переполнена")
+    parser.add_argument("--overflow-timeout", type=float, default=OVERFLOW_TIMEOUT,
+                        help="сколько секунд ждать освобождения очереди при политике block")
+    parser.add_argument("--locale", choices=sorted(LOCALES), default=DEFAULT_LOCALE, help="язык сообщений игрокам")
+    parser.add_argument("--log-level", choices=LEVELS, default="info", help="минимальный уровень журнала воркеров")
+    parser.add_argument("--metrics-port", type=int, help="первый порт метрик Prometheus; воркер N - порт + N")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="адрес HTTP-слушателя метрик")
+    parser.add_argument("--timings", action="store_true",
+                        help="сразу включить замеры времени; на ходу переключаются сигналом SIGUSR1")
+    parser.add_argument("--resume-grace", type=float, default=RESUME_GRACE,
+                        help="сколько секунд держать место игрока после обрыва связи (0 - не держать)")
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT, help="секунд на ход (0 - без ограничения)")
+    parser.add_argument("--turn-timeout-action", choices=TURN_TIMEOUT_ACTIONS, default=TURN_TIMEOUT_PASS,
+                        help="что делать с ходом, не сделанным вовремя: пропустить или выстрелить в себя")
+    parser.add_argument("--handshake-timeout", type=float, default=HANDSHAKE_TIMEOUT,
+                        help="сколько секунд ждать имя от нового подключения (0 - без ограничения)")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                        help="после скольких секунд тишины проверять связь с клиентом (0 - не проверять)")
+    args = parser.parse_args()
+
+    supervisor = WorkerSupervisor(host=args.host, port=args.port, workers=args.workers, engine=args.engine,
+                                  room_size=args.room_size, max_rooms=args.max_rooms,
+                                  stats_interval=args.stats_interval, shared_socket=args.shared_socket,
+                                  send_queue_limit=args.send_queue_limit, overflow_policy=args.overflow_policy,
+                                  overflow_timeout=args.overflow_timeout, locale=args.locale,
+                                  log_level=LEVELS[args.log_level], metrics_host=args.metrics_host,
+                                  metrics_port=args.metrics_port, timings=args.timings,
+                                  resume_grace=args.resume_grace, turn_timeout=args.turn_timeout,
+                                  turn_timeout_action=args.turn_timeout_action,
+                                  handshake_timeout=args.handshake_timeout, keepalive=args.keepalive)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: supervisor.toggle_timings())
+    try:
+        supervisor.start()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Журнал в текстовом виджете Tk с ограниченной длиной.
+
+Раньше каждая строка выводилась отдельно: включить виджет, вставить строку,
+выключить, прокрутить - и так на каждое сообщение, а клиент еще и ставил
+на каждую строку свой root.after. Виджет при этом рос без предела.
+
+LogView копит строки в ограниченном буфере (append можно звать из любого
+потока) и раз в flush_ms выводит их одной вставкой. Лишние старые строки
+удаляются одним delete, так что в виджете не больше max_lines строк.
+"""
+import collections
+import threading
+
+LOG_MAX_LINES = 5000  # Строк в виджете, старые удаляются
+LOG_FLUSH_MS = 50  # Как часто накопленные строки выводятся в виджет
+
+
+class LogView:
+    def __init__(self, widget, max_lines=LOG_MAX_LINES, flush_ms=LOG_FLUSH_MS):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        # Больше max_lines строк за раз все равно не покажем - старые из буфера выпадают сами
+        self.pending = collections.deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.lines = 0  # Строк сейчас в виджете
+        self.widget.after(self.flush_ms, self._tick)
+
+    def append(self, line):
+        with self.lock:
+            self.pending.append(line)
+
+    def flush(self):
+        # Только из потока Tk
+        with self.lock:
+            if not self.pending:
+                return
+            lines = list(self.pending)
+            self.pending.clear()
+        text = "\n".join(lines) + "\n"
+        widget = self.widget
+        widget.configure(state="normal")
+        widget.insert("end", text)
+        self.lines += text.count("\n")
+        excess = self.lines - self.max_lines
+        if excess > 0:
+            widget.delete("1.0", f"{excess + 1}.0")
+            self.lines -= excess
+        widget.configure(state="disabled")
+        widget.see("end")
+
+    def _tick(self):
+        try:
+            if not self.widget.winfo_exists():
+                return
+            self.flush()
+        except Exception as e:
+            print(f"Ошибка вывода журнала в GUI: {e}")
+            return
+        self.widget.after(self.flush_ms, self._tick)
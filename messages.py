@@ -0,0 +1,181 @@
+"""Каталог сообщений сервера с заранее закодированным текстом.
+
+Статические сообщения хранятся сразу в виде UTF-8 байтов, шаблонные
+("Ход игрока {name}") - как список закодированных фрагментов, между которыми
+подставляются значения полей. Кириллица кодируется один раз при создании
+каталога, а не при каждой отправке.
+
+Каталог один на язык: get_catalog("ru"), get_catalog("en"). Ключи, которых нет
+в переводе, берутся из русского каталога.
+"""
+import functools
+import string
+
+DEFAULT_LOCALE = "ru"
+
+LOCALES = {
+    "ru": {
+        "welcome": "Добро пожаловать! Введите ваше имя:",
+        "server_full": "Сервер переполнен",
+        "server_shutdown": "Сервер отключается.",
+        "player_joined": "{name} присоединился к игре! Всего игроков: {count}",
+        "player_left": "{name} покинул игру.",
+        "player_disconnected": "{name} потерял связь. Ждем переподключения {seconds} с...",
+        "player_resumed": "{name} снова в игре.",
+        "turn_timeout_pass": "{name} не сходил вовремя - ход переходит дальше.",
+        "turn_timeout_shoot": "{name} не сходил вовремя - выстрел в себя.",
+        "game_over": "\n=== ИГРА ОКОНЧЕНА ===\n{winner} побеждает!",
+        "game_over_no_alive": "\n=== ИГРА ОКОНЧЕНА ===\nНе осталось живых игроков.",
+        "not_enough_players": "Недостаточно игроков для продолжения.",
+        "waiting_for_players": "Игра еще не началась. Ожидание игроков...",
+        "you_are_out": "Вы выбыли из игры.",
+        "turn_lookup_failed": "Ошибка сервера: не удалось определить текущего игрока. Попробуйте позже.",
+        "turn_usage": "Ваш ход. Используйте: 'я', 'игрок [имя]', 'инфо' или 'игроки'",
+        "not_your_turn": "Сейчас не ваш ход. Ходит {name}.",
+        "target_missing": "Укажите имя игрока после 'игрок '",
+        "target_already_out": "Игрок {name} уже выбыл!",
+        "target_not_found": "Игрок с таким именем не найден или не в игре. Используйте 'игроки' чтобы увидеть список.",
+        "need_two_players": "Нужно минимум 2 игрока для старта.",
+        "game_start": "\n=== ИГРА НАЧИНАЕТСЯ ===",
+        "chamber_loaded": "Патроны в барабане: {live} боевых и {blank} холостых",
+        "rules": ("Правила:\n"
+                  "'я' - выстрелить в себя\n"
+                  "'игрок [имя]' - выстрелить в другого игрока\n"
+                  "'инфо' - информация о патронах\n"
+                  "'игроки' - список живых игроков"),
+        "chamber_empty_error": "Ошибка: Барабан пуст! Перезарядка...",
+        "chamber_load_failed": "Критическая ошибка: не удалось зарядить барабан.",
+        "shot_self_live": "\n{shooter} стреляет в себя... БОЕВОЙ!",
+        "shot_self_blank": "\n{shooter} стреляет в себя... ХОЛОСТОЙ!",
+        "shot_other_live": "\n{shooter} стреляет в {target}... БОЕВОЙ!",
+        "shot_other_blank": "\n{shooter} стреляет в {target}... ХОЛОСТОЙ!",
+        "eliminated": "{name} выбывает из игры!",
+        "already_out": "Хм, {name} уже был вне игры...",
+        "safe": "{name} в безопасности (пока что).",
+        "extra_turn": "{name} получает дополнительный ход!",
+        "reloading": "\nБарабан пуст! Производится перезарядка...",
+        "new_bullets": "Новые патроны: {live} боевых и {blank} холостых",
+        "game_not_started": "Игра еще не началась.",
+        "waiting_new_game": "\nОжидание новых игроков или начала новой игры... (нужно минимум 2)",
+        "turn": "\nХод игрока {name}",
+        "your_turn": "Ваш ход! (я / игрок [имя] / инфо / игроки): ",
+        "players_header": "Живые игроки:",
+        "players_item": "- {name}",
+        "players_item_current": "- {name} (ходит)",
+        "players_none": "Нет живых игроков.",
+        "targets_header": "\n\nДоступные цели для 'игрок [имя]':",
+        "targets_unknown": "\n\nНе удалось определить доступные цели.",
+        "targets_none": "\n\nНет других игроков для выбора!",
+        "bullets": "Патроны: {live} боев., {blank} хол. (Всего в барабане: {total})",
+    },
+    "en": {
+        "welcome": "Welcome! Enter your name:",
+        "server_full": "Server is full",
+        "server_shutdown": "Server is shutting down.",
+        "player_joined": "{name} joined the game! Players: {count}",
+        "player_left": "{name} left the game.",
+        "player_disconnected": "{name} lost connection. Waiting {seconds} s for them to reconnect...",
+        "player_resumed": "{name} is back in the game.",
+        "turn_timeout_pass": "{name} ran out of time - the turn passes on.",
+        "turn_timeout_shoot": "{name} ran out of time - shooting themselves.",
+        "game_over": "\n=== GAME OVER ===\n{winner} wins!",
+        "game_over_no_alive": "\n=== GAME OVER ===\nNo players left alive.",
+        "not_enough_players": "Not enough players to continue.",
+        "waiting_for_players": "The game has not started yet. Waiting for players...",
+        "you_are_out": "You are out of the game.",
+        "turn_lookup_failed": "Server error: could not determine the current player. Try again later.",
+        "turn_usage": "Your turn. Use: 'я', 'игрок [name]', 'инфо' or 'игроки'",
+        "not_your_turn": "It is not your turn. {name} is moving.",
+        "target_missing": "Put the player's name after 'игрок '",
+        "target_already_out": "Player {name} is already out!",
+        "target_not_found": "No such player in the game. Use 'игроки' to see the list.",
+        "need_two_players": "At least 2 players are needed to start.",
+        "game_start": "\n=== GAME STARTS ===",
+        "chamber_loaded": "Chamber holds {live} live and {blank} blank rounds",
+        "rules": ("Rules:\n"
+                  "'я' - shoot yourself\n"
+                  "'игрок [name]' - shoot another player\n"
+                  "'инфо' - rounds left\n"
+                  "'игроки' - players alive"),
+        "chamber_empty_error": "Error: the chamber is empty! Reloading...",
+        "chamber_load_failed": "Critical error: could not load the chamber.",
+        "shot_self_live": "\n{shooter} shoots themselves... LIVE!",
+        "shot_self_blank": "\n{shooter} shoots themselves... BLANK!",
+        "shot_other_live": "\n{shooter} shoots {target}... LIVE!",
+        "shot_other_blank": "\n{shooter} shoots {target}... BLANK!",
+        "eliminated": "{name} is out of the game!",
+        "already_out": "Hm, {name} was already out...",
+        "safe": "{name} is safe (for now).",
+        "extra_turn": "{name} gets an extra turn!",
+        "reloading": "\nThe chamber is empty! Reloading...",
+        "new_bullets": "New rounds: {live} live and {blank} blank",
+        "game_not_started": "The game has not started yet.",
+        "waiting_new_game": "\nWaiting for new players or a new game... (at least 2 needed)",
+        "turn": "\n{name}'s turn",
+        "your_turn": "Your turn! (я / игрок [name] / инфо / игроки): ",
+        "players_header": "Players alive:",
+        "players_item": "- {name}",
+        "players_item_current": "- {name} (moving)",
+        "players_none": "No players alive.",
+        "targets_header": "\n\nTargets for 'игрок [name]':",
+        "targets_unknown": "\n\nCould not determine available targets.",
+        "targets_none": "\n\nNo other players to choose!",
+        "bullets": "Rounds: {live} live, {blank} blank ({total} in the chamber)",
+    },
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def _encode_value(value):
+    # Имена игроков повторяются из хода в ход - кодируем каждое один раз
+    return str(value).encode()
+
+
+class MessageCatalog:
+    def __init__(self, locale=DEFAULT_LOCALE):
+        if locale not in LOCALES:
+            raise ValueError(f"Неизвестный язык сообщений: {locale}")
+        self.locale = locale
+        self.texts = dict(LOCALES[DEFAULT_LOCALE])
+        self.texts.update(LOCALES[locale])
+        self.static = {}  # {key: bytes} - сообщения без полей
+        self.static_lines = {}  # {key: bytes} - то же с переводом строки для рассылки
+        self.templates = {}  # {key: ((литерал bytes, имя поля или None), ...)}
+        for key, text in self.texts.items():
+            fragments = tuple((literal.encode(), field_name)
+                              for literal, field_name, _, _ in string.Formatter().parse(text))
+            if all(field_name is None for _, field_name in fragments):
+                self.static[key] = text.encode()
+                self.static_lines[key] = f"{text}\n".encode()
+            else:
+                self.templates[key] = fragments
+
+    def text(self, key, **fields):
+        return self.texts[key].format(**fields) if fields else self.texts[key]
+
+    def encode(self, key, **fields):
+        static = self.static.get(key)
+        if static is not None:
+            return static
+        parts = []
+        for literal, field_name in self.templates[key]:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(_encode_value(fields[field_name]))
+        return b"".join(parts)
+
+    def encode_line(self, key, **fields):
+        static = self.static_lines.get(key)
+        if static is not None:
+            return static
+        return self.encode(key, **fields) + b"\n"
+
+
+_catalogs = {}
+
+
+def get_catalog(locale=DEFAULT_LOCALE):
+    catalog = _catalogs.get(locale)
+    if catalog is None:
+        catalog = _catalogs[locale] = MessageCatalog(locale)
+    return catalog
@@ -0,0 +1,235 @@
+"""Метрики сервера в текстовом формате Prometheus.
+
+Счетчики, гистограммы и значения, вычисляемые при опросе, собраны в реестре
+MetricsRegistry; ServerMetrics - набор метрик одного RussianRouletteServer.
+MetricsHTTPServer отдает их на GET /metrics с локального порта, откуда их
+забирает сборщик:
+
+    python server.py serve --metrics-port 9105
+    curl http://127.0.0.1:9105/metrics
+"""
+import bisect
+import http.server
+import threading
+
+# Границы корзин гистограмм задержек, секунд
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Границы корзин для размера исходящей очереди клиента, байт (лимит по умолчанию - 256 КБ)
+QUEUE_BUCKETS = (0, 1024, 4096, 16384, 65536, 131072, 262144, 524288, 1048576)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.children = {}  # {значения меток: дочерняя метрика}
+
+    def labels(self, *values):
+        # Дочерняя метрика с конкретными значениями меток; создается один раз, дальше берется из словаря
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        children = list(self.children.items()) if self.label_names else [((), self)]
+        for values, child in children:
+            lines.extend(child._samples(self.name, self.label_names, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.value = 0
+
+    def _new_child(self):
+        return Counter(self.name, self.help_text)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def _samples(self, name, label_names, values):
+        return [f"{name}{_labels_text(label_names, values)} {_number(self.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.help_text, buckets=self.buckets)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def _samples(self, name, label_names, values):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            samples.append(f"{name}_bucket{_labels_text(label_names, values, le)} {cumulative}")
+        labels = _labels_text(label_names, values)
+        samples.append(f"{name}_sum{labels} {_number(total)}")
+        samples.append(f"{name}_count{labels} {cumulative}")
+        return samples
+
+
+class GaugeFunction(_Metric):
+    """Значение, которое вычисляется в момент опроса (например, число комнат)."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function):
+        super().__init__(name, help_text)
+        self.function = function
+
+    def _samples(self, name, label_names, values):
+        return [f"{name} {_number(self.function())}"]
+
+
+class HistogramFunction(Histogram):
+    """Распределение, которое собирается заново в момент опроса (например, глубина очередей клиентов)."""
+
+    def __init__(self, name, help_text, function, buckets):
+        super().__init__(name, help_text, buckets=buckets)
+        self.function = function  # -> итерируемое значений
+
+    def _samples(self, name, label_names, values):
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0
+        for value in self.function():
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total += value
+        with self.lock:
+            self.counts, self.sum = counts, total
+        return super()._samples(name, label_names, values)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge_function(self, name, help_text, function):
+        return self._register(GaugeFunction(name, help_text, function))
+
+    def histogram_function(self, name, help_text, function, buckets):
+        return self._register(HistogramFunction(name, help_text, function, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class ServerMetrics(MetricsRegistry):
+    def __init__(self, server):
+        super().__init__()
+        self.accepted = self.counter("roulette_connections_accepted_total", "Принятые подключения")
+        self.rejected = self.counter("roulette_connections_rejected_total", "Отклоненные подключения (нет мест)")
+        self.commands = self.counter("roulette_commands_total", "Команды игроков по типу", labels=("command",))
+        self.command_seconds = self.histogram("roulette_command_seconds",
+                                              "Время от получения команды до конца ее обработки в комнате",
+                                              labels=("command",))
+        self.shots = self.counter("roulette_shots_total", "Выстрелы по типу патрона", labels=("bullet",))
+        self.eliminations = self.counter("roulette_eliminations_total", "Игроки, выбывшие от выстрела")
+        self.games_finished = self.counter("roulette_games_finished_total", "Доигранные партии")
+        self.turn_timeouts = self.counter("roulette_turn_timeouts_total", "Ходы, не сделанные вовремя")
+        self.broadcast_seconds = self.histogram("roulette_broadcast_seconds",
+                                                "Время рассылки одного сообщения всем игрокам комнаты")
+        self.gauge_function("roulette_rooms_active", "Открытые комнаты", lambda: len(server.rooms))
+        self.gauge_function("roulette_players_connected", "Игроки, занявшие место", lambda: len(server.sessions))
+        self.gauge_function("roulette_games_running", "Идущие партии", lambda: server.games_running)
+        # Клиенты обходятся только при опросе метрик, а не на каждое игровое событие
+        self.histogram_function("roulette_send_queue_bytes", "Байт в исходящей очереди клиента (на момент опроса)",
+                                lambda: [queued_bytes for _, queued_bytes in server.queue_depths()], QUEUE_BUCKETS)
+
+
+class MetricsHTTPServer:
+    """Отдает реестр по HTTP из фонового потока; слушать лучше только локальный адрес."""
+
+    def __init__(self, registry, host="127.0.0.1", port=0):
+        handler = self._handler_class(registry)
+        self.httpd = http.server.ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+
+    @staticmethod
+    def _handler_class(registry):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Опросы сборщика в журнал сервера не пишем
+
+        return Handler
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join(timeout=2.0)
@@ -0,0 +1,364 @@
+"""Исходящие очереди клиентов с ограничением размера.
+
+Игровая логика больше не пишет в сокет напрямую: send() кладет байты в очередь
+клиента, а сокеты дописывает слой ввода-вывода (поток SendPump в потоковом
+движке или задача цикла событий в asyncio). Медленный клиент копит данные
+в своей очереди и не задерживает рассылку остальным игрокам.
+
+Что делать при переполнении очереди, задает политика:
+  "drop"     - отключить клиента;
+  "coalesce" - выбросить устаревшие снимки состояния (списки игроков, инфо
+               о патронах), оставив по последнему; если места все равно нет -
+               отключить клиента;
+  "block"    - подождать, пока очередь освободится, но не дольше таймаута,
+               затем отключить клиента.
+"""
+import collections
+import selectors
+import socket
+import threading
+import time
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_POLICIES = (OVERFLOW_DROP, OVERFLOW_COALESCE, OVERFLOW_BLOCK)
+
+SEND_QUEUE_LIMIT = 256 * 1024  # Байт в очереди одного клиента
+OVERFLOW_TIMEOUT = 2.0  # Секунд ожидания для политики "block"
+OVERFLOW_GRACE_FACTOR = 4  # Во сколько раз очередь может превысить лимит, пока идет таймаут без ожидания
+FLUSH_CHUNK = 64 * 1024  # Сколько байт отдавать в сокет за один вызов send()
+# Отправка без ожидания на обычном (блокирующем) сокете. Где флага нет (Windows), сокет клиента
+# переводится в неблокирующий режим, а поток чтения ждет данных через селектор (см. QueuedSocket)
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+_WAIT_SELECTOR = getattr(selectors, "PollSelector", selectors.SelectSelector)  # Без лишнего дескриптора
+
+
+class QueueClosedError(ConnectionResetError):
+    """Клиент уже закрыт: данные для него больше не принимаются."""
+
+
+class OutboundQueue:
+    def __init__(self, limit=SEND_QUEUE_LIMIT, policy=OVERFLOW_DROP, timeout=OVERFLOW_TIMEOUT, can_block=True,
+                 on_ready=None, on_overflow=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Неизвестная политика переполнения: {policy}")
+        self.limit = limit
+        self.policy = policy
+        self.timeout = timeout
+        # Владелец очереди в цикле событий не может ждать: для него "block" означает
+        # "терпеть превышение лимита не дольше таймаута"
+        self.can_block = can_block
+        self.on_ready = on_ready  # Вызывается, когда в пустую очередь пришли данные
+        self.on_overflow = on_overflow  # Вызывается один раз, когда клиента решено отключить
+        self.chunks = collections.deque()  # [данные, ключ склейки]
+        self.queued_bytes = 0
+        self.head_offset = 0  # Сколько байт первого фрагмента уже отправлено
+        self.overflow_since = None
+        self.closed = False
+        self.overflowed = False
+        self.cond = threading.Condition()
+
+    def depth(self):
+        return len(self.chunks), self.queued_bytes
+
+    def put(self, data, key=None):
+        with self.cond:
+            if self.closed:
+                raise QueueClosedError("Очередь отправки закрыта")
+            if self.queued_bytes + len(data) > self.limit and not self._make_room(len(data), key):
+                self._overflow()
+            else:
+                was_empty = not self.chunks
+                self.chunks.append([data, key])
+                self.queued_bytes += len(data)
+                if not was_empty:
+                    return
+        if self.overflowed:
+            if self.on_overflow:
+                self.on_overflow()
+            raise ConnectionResetError("Переполнена очередь отправки")
+        if self.on_ready:
+            self.on_ready()
+
+    def _fits(self, size):
+        return self.queued_bytes + size <= self.limit
+
+    def _make_room(self, size, key):
+        if self.policy == OVERFLOW_COALESCE:
+            self._coalesce(key)
+            return self._fits(size)
+        if self.policy == OVERFLOW_BLOCK:
+            if self.can_block:
+                return self.cond.wait_for(lambda: self.closed or self._fits(size), self.timeout) and not self.closed
+            now = time.monotonic()
+            if self.overflow_since is None:
+                self.overflow_since = now
+            return (now - self.overflow_since <= self.timeout and
+                    self.queued_bytes + size <= self.limit * OVERFLOW_GRACE_FACTOR)
+        return False
+
+    def _coalesce(self, new_key):
+        # От каждого снимка состояния оставляем только самый свежий; новый снимок
+        # с ключом new_key заменяет все такие же в очереди. Первый фрагмент не
+        # трогаем, если он уже отправлен частично.
+        seen = {new_key} if new_key is not None else set()
+        kept = collections.deque()
+        for index in range(len(self.chunks) - 1, -1, -1):
+            chunk = self.chunks[index]
+            key = chunk[1]
+            if key is not None and key in seen and not (index == 0 and self.head_offset):
+                self.queued_bytes -= len(chunk[0])
+                continue
+            if key is not None:
+                seen.add(key)
+            kept.appendleft(chunk)
+        self.chunks = kept
+
+    def _overflow(self):
+        self.closed = True
+        self.overflowed = True
+        self.chunks.clear()
+        self.queued_bytes = 0
+        self.cond.notify_all()
+
+    def peek(self, max_bytes=FLUSH_CHUNK):
+        with self.cond:
+            parts = []
+            total = 0
+            offset = self.head_offset
+            for data, _ in self.chunks:
+                part = data[offset:] if offset else data
+                offset = 0
+                parts.append(part)
+                total += len(part)
+                if total >= max_bytes:
+                    break
+            return b"".join(parts)
+
+    def consume(self, sent):
+        with self.cond:
+            self.queued_bytes -= sent
+            sent += self.head_offset
+            while self.chunks and sent >= len(self.chunks[0][0]):
+                sent -= len(self.chunks.popleft()[0])
+            self.head_offset = sent if self.chunks else 0
+            if self.queued_bytes <= self.limit:
+                self.overflow_since = None
+            self.cond.notify_all()
+
+    def take(self):
+        # Забрать все накопленное разом (для цикла событий, где транспорт сам буферизует)
+        data = self.peek(max_bytes=self.queued_bytes or 1)
+        self.consume(len(data))
+        return data
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+# --- Потоковый движок: один поток отправки на все сокеты ---
+
+class QueuedSocket:
+    """Клиентский сокет, у которого send() только ставит данные в очередь.
+
+    recv() и остальные методы работают с настоящим сокетом, поэтому поток
+    handle_client читает как раньше, а пишет в сеть поток SendPump. Один на
+    всех поток отправки не должен ждать ни одного клиента: если у платформы
+    нет MSG_DONTWAIT, сокет становится неблокирующим, и ждет уже только recv()
+    в потоке своего клиента.
+    """
+
+    def __init__(self, sock, pump, limit=SEND_QUEUE_LIMIT, policy=OVERFLOW_DROP, timeout=OVERFLOW_TIMEOUT):
+        self.sock = sock
+        self.pump = pump
+        self.queue = OutboundQueue(limit=limit, policy=policy, timeout=timeout, can_block=True,
+                                   on_ready=lambda: pump.wake(self), on_overflow=self.abort)
+        self.read_selector = None  # Ожидание чтения для неблокирующего сокета
+        if not _MSG_DONTWAIT:
+            sock.setblocking(False)
+            self.read_selector = _WAIT_SELECTOR()
+            self.read_selector.register(sock, selectors.EVENT_READ)
+
+    def send(self, data, key=None):
+        self.queue.put(data, key)
+        return len(data)
+
+    def recv(self, bufsize):
+        if self.read_selector is None:
+            return self.sock.recv(bufsize)
+        while True:
+            try:
+                return self.sock.recv(bufsize)
+            except BlockingIOError:
+                self.read_selector.select()  # abort()/закрытие тоже разбудят: сокет станет читаемым
+
+    def getpeername(self):
+        return self.sock.getpeername()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def shutdown(self, how):
+        # Сначала отдаем то, что уже в очереди (например, "Сервер отключается.")
+        self.pump.close(self, how=how)
+
+    def close(self):
+        self.queue.close()
+        self.pump.close(self)
+
+    def abort(self):
+        # Разрыв без дописывания очереди; можно звать из любого потока
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # recv() в потоке клиента вернет пустые данные
+        except OSError:
+            pass
+
+
+class DetachedSocket:
+    """Заглушка вместо сокета игрока, чье соединение оборвалось и чье место ждет переподключения.
+
+    Сообщения ему выбрасываются: вернувшись, клиент получит снимок партии целиком.
+    """
+    queue = None  # Исходящей очереди нет (см. queue_depths)
+
+    def send(self, data, key=None):
+        return len(data)
+
+    def recv(self, bufsize):
+        return b""
+
+    def getpeername(self):
+        return None
+
+    def fileno(self):
+        return -1
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class SendPump:
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+        self.lock = threading.Lock()
+        self.ready = collections.deque()  # Клиенты, в чьих очередях появились данные
+        self.closing = collections.deque()  # (клиент, how) - закрыть после последней отправки
+        self.registered = set()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="send-pump", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._signal()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        self._process_closing()
+        self.selector.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+
+    def wake(self, client):
+        with self.lock:
+            self.ready.append(client)
+        self._signal()
+
+    def close(self, client, how=None):
+        if not self.running:
+            self._finish(client, how)
+            return
+        with self.lock:
+            self.closing.append((client, how))
+        self._signal()
+
+    def _signal(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # Канал пробуждения уже полон - поток и так проснется
+
+    def run(self):
+        while self.running:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        while self.wake_reader.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    self._flush(key.data)
+            with self.lock:
+                ready = list(self.ready)
+                self.ready.clear()
+            for client in ready:
+                self._flush(client)
+            self._process_closing()
+
+    def _process_closing(self):
+        with self.lock:
+            closing = list(self.closing)
+            self.closing.clear()
+        for client, how in closing:
+            self._flush(client)
+            self._finish(client, how)
+
+    def _flush(self, client):
+        if client.sock.fileno() == -1:
+            self._unregister(client)
+            return
+        while True:
+            data = client.queue.peek()
+            if not data:
+                self._unregister(client)
+                return
+            try:
+                sent = client.sock.send(data, _MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                client.queue.close()
+                self._unregister(client)
+                client.abort()
+                return
+            client.queue.consume(sent)
+            if sent < len(data):
+                break
+        if client not in self.registered:  # Сокет занят - допишем, когда станет доступен для записи
+            self.selector.register(client.sock, selectors.EVENT_WRITE, client)
+            self.registered.add(client)
+
+    def _unregister(self, client):
+        if client in self.registered:
+            self.registered.discard(client)
+            try:
+                self.selector.unregister(client.sock)
+            except (KeyError, ValueError):
+                pass
+
+    def _finish(self, client, how):
+        self._unregister(client)
+        try:
+            if how is None:
+                client.sock.close()
+            else:
+                client.sock.shutdown(how)
+        except OSError:
+            pass
@@ -0,0 +1,491 @@
+"""Сетевой протокол русской рулетки: старый текстовый режим и кадровый режим RRF/1.
+
+Кадр: 4 байта длины (big-endian, без учета самого поля длины), 1 байт кода
+операции и полезная нагрузка. Строки в нагрузке - 2 байта длины и UTF-8.
+
+Согласование: сервер добавляет к приветствию метку FRAME_TOKEN. Новый клиент,
+увидев ее, отвечает FRAME_MAGIC и кадром HELLO с именем. Старый клиент метку
+игнорирует и присылает имя обычным текстом - с ним сервер говорит как раньше.
+
+Типизированные события: сервер, умеющий присылать начало партии, выбывание
+и конец партии отдельными кадрами (OP_GAME_START, OP_ELIM, OP_GAME_OVER), пишет
+в приветствии еще и EVENTS_TOKEN. Клиент, который их понимает, начинает ответ
+с EVENTS_MAGIC вместо FRAME_MAGIC. Остальным кадровым клиентам эти события
+по-прежнему приходят текстом в OP_TEXT.
+
+Такой клиент ведет у себя состав стола: при входе получает снимок OP_ROSTER,
+дальше сервер присылает только изменения - OP_JOIN, OP_LEAVE, OP_ELIM, OP_TURN,
+OP_GAME_START (с порядком живых) и OP_GAME_OVER. Список целей клиент строит сам,
+без запроса "игроки".
+
+Ему же сервер выдает токен OP_SESSION. Если связь оборвалась, место за
+столом держится несколько секунд: клиент переподключается и вместо HELLO
+присылает OP_RESUME с токеном, а сервер возвращает его на то же место и
+присылает снимок партии (OP_ROSTER, патроны и, если ход его, OP_YOUR_TURN).
+Уходя сам, клиент перед закрытием шлет OP_BYE - тогда место не держится.
+Если такой клиент долго молчит, сервер присылает OP_PING; не ответивший
+OP_PONG отключается (старые клиенты проверяются только TCP keepalive).
+"""
+import struct
+
+from messages import get_catalog
+
+FRAME_TOKEN = "[RRF/1]"  # Метка поддержки кадров в приветствии сервера
+FRAME_MAGIC = b"\x00RRF1"  # Первые байты ответа клиента, включающего кадровый режим
+EVENTS_TOKEN = "[EV]"  # Метка поддержки типизированных событий, идет сразу после FRAME_TOKEN
+EVENTS_MAGIC = b"\x00RRFE"  # Как FRAME_MAGIC (и той же длины), но клиент понимает типизированные события
+MAX_FRAME_SIZE = 1 << 20  # Защита от мусора вместо заголовка
+
+_HEADER = struct.Struct("!IB")
+_U16 = struct.Struct("!H")
+_PLAYERS_HEAD = struct.Struct("!BHH")
+_BULLETS = struct.Struct("!BBB")
+NO_CURRENT = 0xFFFF  # Индекс "никто не ходит" в кадре PLAYERS
+
+# Сервер -> клиент
+OP_TEXT = 0x01  # Произвольное сообщение для лога
+OP_SHOT = 0x02  # Выстрел: стрелок, цель ("" - в себя), боевой ли патрон
+OP_TURN = 0x03  # Ход перешел к игроку
+OP_YOUR_TURN = 0x04  # Ход получателя
+OP_PLAYERS = 0x05  # Живые игроки, индекс ходящего, цели для стрелка
+OP_BULLETS = 0x06  # Боевые, холостые, всего в барабане
+OP_GAME_START = 0x07  # Партия началась, живые по порядку хода (только для клиентов с EVENTS_MAGIC)
+OP_ELIM = 0x08  # Игрок выбыл
+OP_GAME_OVER = 0x09  # Партия окончена: победитель ("" - живых не осталось)
+OP_JOIN = 0x0A  # Игрок сел за стол, игроков за столом
+OP_LEAVE = 0x0B  # Игрок ушел из-за стола
+OP_ROSTER = 0x0C  # Снимок для вошедшего: его имя, все за столом, живые, ходящий ("" - никто)
+OP_SESSION = 0x0D  # Токен возобновления и сколько секунд держится место после обрыва
+OP_PING = 0x0E  # Проверка связи: клиент отвечает OP_PONG
+
+# Клиент -> сервер
+OP_HELLO = 0x10  # Имя игрока
+OP_COMMAND = 0x11  # Текстовая команда как в старом протоколе
+OP_SHOOT_SELF = 0x12
+OP_SHOOT_PLAYER = 0x13  # Имя цели
+OP_INFO = 0x14
+OP_LIST_PLAYERS = 0x15
+OP_RESUME = 0x16  # Вместо HELLO: токен и имя (по имени регистрируемся заново, если токен не принят)
+OP_BYE = 0x17  # Игрок уходит сам: после закрытия соединения место не держать
+OP_PONG = 0x18  # Ответ на OP_PING
+
+BYE_COMMAND = "выход"  # Текстовые имена OP_BYE и OP_PONG для общего обработчика команд сервера
+PONG_COMMAND = "понг"
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+# --- Кадры и поля ---
+
+def encode_frame(opcode, payload=b""):
+    return _HEADER.pack(len(payload) + 1, opcode) + payload
+
+
+def pack_str(value):
+    data = value.encode()
+    return _U16.pack(len(data)) + data
+
+
+def unpack_str(payload, offset=0):
+    (length,) = _U16.unpack_from(payload, offset)
+    offset += _U16.size
+    return bytes(payload[offset:offset + length]).decode(), offset + length
+
+
+def pack_str_list(values):
+    return _U16.pack(len(values)) + b"".join(pack_str(value) for value in values)
+
+
+def unpack_str_list(payload, offset=0):
+    (count,) = _U16.unpack_from(payload, offset)
+    offset += _U16.size
+    values = []
+    for _ in range(count):
+        value, offset = unpack_str(payload, offset)
+        values.append(value)
+    return values, offset
+
+
+class FrameDecoder:
+    """Накопительный разборщик кадров: принимает байты кусками любого размера."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        offset = 0
+        buffer_length = len(self.buffer)
+        while buffer_length - offset >= _HEADER.size:
+            length, opcode = _HEADER.unpack_from(self.buffer, offset)
+            if length == 0 or length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"Недопустимая длина кадра: {length}")
+            end = offset + 4 + length
+            if end > buffer_length:
+                break
+            frames.append((opcode, bytes(self.buffer[offset + _HEADER.size:end])))
+            offset = end
+        if offset:
+            del self.buffer[:offset]  # Один сдвиг буфера на весь пакет кадров
+        return frames
+
+
+class LineDecoder:
+    """Накопительный разборщик текстового протокола: байты кусками любого размера -> строки.
+
+    Строки режутся по байту '\\n' до декодирования: в UTF-8 он не встречается внутри многобайтового
+    символа, поэтому буква, разорванная между двумя recv, декодируется целиком вместе со своей строкой.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scanned = 0  # До этого места в буфере перевода строки нет - повторно не ищем
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        lines = []
+        start = 0
+        newline = buffer.find(b"\n", self.scanned)
+        while newline != -1:
+            lines.append(buffer[start:newline].decode("utf-8", errors="replace"))
+            start = newline + 1
+            newline = buffer.find(b"\n", start)
+        if start:
+            del buffer[:start]  # Один сдвиг буфера на весь пакет строк
+        self.scanned = len(buffer)
+        return lines
+
+    def pending(self):
+        # Хвост без перевода строки (например, приглашение к ходу), еще не отданный feed()
+        return bytes(self.buffer)
+
+    def clear(self):
+        del self.buffer[:]
+        self.scanned = 0
+
+
+# --- Текст сообщений (общий для сервера и клиента) ---
+
+def shot_message_key(target, live):
+    # Четыре варианта выстрела - четыре шаблона в каталоге, без склейки строк
+    return ("shot_other" if target else "shot_self") + ("_live" if live else "_blank")
+
+
+def render_shot(shooter, target, live, catalog=None):
+    catalog = catalog or get_catalog()
+    return catalog.text(shot_message_key(target, live), shooter=shooter, target=target)
+
+
+def render_turn(name, catalog=None):
+    return (catalog or get_catalog()).text("turn", name=name)
+
+
+def render_players(names, current, targets, catalog=None):
+    # targets is None - список запросил не ходящий игрок, цели не показываем
+    catalog = catalog or get_catalog()
+    if names:
+        lines = [catalog.text("players_item_current" if index == current else "players_item", name=name)
+                 for index, name in enumerate(names)]
+        message = catalog.text("players_header") + "\n" + "\n".join(lines)
+    else:
+        message = catalog.text("players_none")
+
+    if targets is not None:
+        if targets:
+            message += (catalog.text("targets_header") + "\n" +
+                        "\n".join([catalog.text("players_item", name=name) for name in targets]))
+        elif len(names) > 1:
+            message += catalog.text("targets_unknown")
+        else:
+            message += catalog.text("targets_none")
+    return message
+
+
+def render_bullets(live, blank, total, catalog=None):
+    return (catalog or get_catalog()).text("bullets", live=live, blank=blank, total=total)
+
+
+def game_over_message(winner):
+    # Ключ и поля текста конца партии; пустой победитель - живых не осталось
+    if winner:
+        return "game_over", {"winner": winner}
+    return "game_over_no_alive", {}
+
+
+def render_game_over(winner, catalog=None):
+    key, fields = game_over_message(winner)
+    return (catalog or get_catalog()).text(key, **fields)
+
+
+# --- Кодеки сервера: как отправить сообщение конкретному клиенту ---
+
+class TextCodec:
+    """Старый текстовый протокол: байты те же, что сервер отправлял всегда."""
+    framed = False
+    events = False  # Типизированных событий и состава стола нет
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog or get_catalog()
+
+    def text(self, message):
+        return message.encode()
+
+    def line(self, message):
+        return f"{message}\n".encode()
+
+    def message(self, key, **fields):
+        # Сообщение из каталога: готовые байты без кодирования на каждую отправку
+        return self.catalog.encode(key, **fields)
+
+    def message_line(self, key, **fields):
+        return self.catalog.encode_line(key, **fields)
+
+    def shot(self, shooter, target, live):
+        return self.catalog.encode_line(shot_message_key(target, live), shooter=shooter, target=target)
+
+    def turn(self, name):
+        return self.catalog.encode_line("turn", name=name)
+
+    def your_turn(self):
+        return self.catalog.encode("your_turn")
+
+    def players(self, names, current, targets):
+        return self.text(render_players(names, current, targets, self.catalog))
+
+    def bullets(self, live, blank, total):
+        return self.catalog.encode("bullets", live=live, blank=blank, total=total)
+
+    def game_start(self, names):
+        return self.message_line("game_start")
+
+    def eliminated(self, name):
+        return self.message_line("eliminated", name=name)
+
+    def player_joined(self, name, count):
+        return self.message_line("player_joined", name=name, count=count)
+
+    def player_left(self, name):
+        return self.message_line("player_left", name=name)
+
+    def game_over(self, winner):
+        key, fields = game_over_message(winner)
+        return self.message_line(key, **fields)
+
+
+class FrameCodec:
+    """Кадровый протокол: у каждого сообщения есть границы и код операции.
+
+    events=False - для клиентов без типизированных событий: начало и конец партии
+    и выбывание уходят им текстом, как раньше.
+    """
+    framed = True
+
+    def __init__(self, catalog=None, events=False):
+        self.catalog = catalog or get_catalog()
+        self.events = events
+        # Статические сообщения каталога сразу упакованы в кадры OP_TEXT
+        self.static_frames = {key: encode_frame(OP_TEXT, data) for key, data in self.catalog.static.items()}
+
+    def text(self, message):
+        return encode_frame(OP_TEXT, message.encode())
+
+    def line(self, message):
+        return self.text(message)
+
+    def message(self, key, **fields):
+        frame = self.static_frames.get(key)
+        if frame is None:
+            frame = encode_frame(OP_TEXT, self.catalog.encode(key, **fields))
+        return frame
+
+    def message_line(self, key, **fields):
+        return self.message(key, **fields)
+
+    def shot(self, shooter, target, live):
+        return encode_frame(OP_SHOT, pack_str(shooter) + pack_str(target or "") + bytes((1 if live else 0,)))
+
+    def turn(self, name):
+        return encode_frame(OP_TURN, pack_str(name))
+
+    def your_turn(self):
+        return _YOUR_TURN_FRAME
+
+    def players(self, names, current, targets):
+        flags = 1 if targets is not None else 0
+        payload = _PLAYERS_HEAD.pack(flags, NO_CURRENT if current is None else current, len(names))
+        payload += b"".join(pack_str(name) for name in names)
+        if targets is not None:
+            payload += pack_str_list(targets)
+        return encode_frame(OP_PLAYERS, payload)
+
+    def bullets(self, live, blank, total):
+        return encode_frame(OP_BULLETS, _BULLETS.pack(live, blank, total))
+
+    def game_start(self, names):
+        return encode_frame(OP_GAME_START, pack_str_list(names)) if self.events else self.message("game_start")
+
+    def eliminated(self, name):
+        return encode_frame(OP_ELIM, pack_str(name)) if self.events else self.message("eliminated", name=name)
+
+    def player_joined(self, name, count):
+        if self.events:
+            return encode_frame(OP_JOIN, pack_str(name) + _U16.pack(count))
+        return self.message("player_joined", name=name, count=count)
+
+    def player_left(self, name):
+        return encode_frame(OP_LEAVE, pack_str(name)) if self.events else self.message("player_left", name=name)
+
+    def session_token(self, token, grace):
+        return encode_frame(OP_SESSION, pack_str(token) + _U16.pack(grace))
+
+    def ping(self):
+        return _PING_FRAME
+
+    def roster(self, you, table, alive, current):
+        # Только для events=True: остальные клиенты состав стола не ведут
+        return encode_frame(OP_ROSTER, pack_str(you) + pack_str_list(table) + pack_str_list(alive) +
+                            pack_str(current or ""))
+
+    def game_over(self, winner):
+        if self.events:
+            return encode_frame(OP_GAME_OVER, pack_str(winner))
+        key, fields = game_over_message(winner)
+        return self.message(key, **fields)
+
+
+_YOUR_TURN_FRAME = encode_frame(OP_YOUR_TURN)
+_PING_FRAME = encode_frame(OP_PING)
+TEXT_CODEC = TextCodec()
+FRAME_CODEC = FrameCodec()
+EVENT_CODEC = FrameCodec(events=True)
+
+
+# --- Разбор кадров на стороне клиента ---
+
+def decode_shot(payload):
+    shooter, offset = unpack_str(payload)
+    target, offset = unpack_str(payload, offset)
+    return shooter, target, bool(payload[offset])
+
+
+def decode_players(payload):
+    flags, current, count = _PLAYERS_HEAD.unpack_from(payload)
+    offset = _PLAYERS_HEAD.size
+    names = []
+    for _ in range(count):
+        name, offset = unpack_str(payload, offset)
+        names.append(name)
+    targets = None
+    if flags & 1:
+        targets, offset = unpack_str_list(payload, offset)
+    return names, None if current == NO_CURRENT else current, targets
+
+
+def decode_bullets(payload):
+    return _BULLETS.unpack(payload)
+
+
+def decode_join(payload):
+    name, offset = unpack_str(payload)
+    (count,) = _U16.unpack_from(payload, offset)
+    return name, count
+
+
+def decode_session(payload):
+    token, offset = unpack_str(payload)
+    (grace,) = _U16.unpack_from(payload, offset)
+    return token, grace
+
+
+def decode_resume(payload):
+    token, offset = unpack_str(payload)
+    name, offset = unpack_str(payload, offset)
+    return token, name
+
+
+def decode_roster(payload):
+    you, offset = unpack_str(payload)
+    table, offset = unpack_str_list(payload, offset)
+    alive, offset = unpack_str_list(payload, offset)
+    current, offset = unpack_str(payload, offset)
+    return you, table, alive, current or None
+
+
+def render_frame(opcode, payload):
+    # Человекочитаемый текст кадра для лога клиента
+    if opcode == OP_TEXT:
+        return payload.decode()
+    if opcode == OP_SHOT:
+        return render_shot(*decode_shot(payload))
+    if opcode == OP_TURN:
+        return render_turn(unpack_str(payload)[0])
+    if opcode == OP_YOUR_TURN:
+        return get_catalog().text("your_turn")
+    if opcode == OP_PLAYERS:
+        return render_players(*decode_players(payload))
+    if opcode == OP_BULLETS:
+        return render_bullets(*decode_bullets(payload))
+    if opcode == OP_GAME_START:
+        return get_catalog().text("game_start")
+    if opcode == OP_ELIM:
+        return get_catalog().text("eliminated", name=unpack_str(payload)[0])
+    if opcode == OP_GAME_OVER:
+        return render_game_over(unpack_str(payload)[0])
+    if opcode == OP_JOIN:
+        name, count = decode_join(payload)
+        return get_catalog().text("player_joined", name=name, count=count)
+    if opcode == OP_LEAVE:
+        return get_catalog().text("player_left", name=unpack_str(payload)[0])
+    return ""  # OP_ROSTER, OP_SESSION и неизвестные кадры в журнал не выводятся
+
+
+# --- Команды клиента ---
+
+def encode_hello(name, events=False):
+    # events=True - только если в приветствии сервера была метка EVENTS_TOKEN
+    return (EVENTS_MAGIC if events else FRAME_MAGIC) + encode_frame(OP_HELLO, name.encode())
+
+
+def encode_resume(token, name):
+    return EVENTS_MAGIC + encode_frame(OP_RESUME, pack_str(token) + pack_str(name))
+
+
+def encode_pong():
+    return encode_frame(OP_PONG)
+
+
+def encode_command(action):
+    if action == "я":
+        return encode_frame(OP_SHOOT_SELF)
+    if action.startswith("игрок "):
+        return encode_frame(OP_SHOOT_PLAYER, action[len("игрок "):].encode())
+    if action == "инфо":
+        return encode_frame(OP_INFO)
+    if action == "игроки":
+        return encode_frame(OP_LIST_PLAYERS)
+    if action == BYE_COMMAND:
+        return encode_frame(OP_BYE)
+    return encode_frame(OP_COMMAND, action.encode())
+
+
+def command_from_frame(opcode, payload):
+    # Обратное преобразование в текстовую команду: у сервера один обработчик команд
+    if opcode == OP_SHOOT_SELF:
+        return "я"
+    if opcode == OP_SHOOT_PLAYER:
+        return "игрок " + payload.decode()
+    if opcode == OP_INFO:
+        return "инфо"
+    if opcode == OP_LIST_PLAYERS:
+        return "игроки"
+    if opcode == OP_BYE:
+        return BYE_COMMAND
+    if opcode == OP_PONG:
+        return PONG_COMMAND
+    if opcode == OP_COMMAND:
+        return payload.decode()
+    raise ProtocolError(f"Неизвестная команда клиента: {opcode:#x}")
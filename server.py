@@ -1,70 +1,269 @@
+import argparse
+import codecs
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import signal
 import socket
 import threading
 import random
+import secrets
 import time
 import queue  # Для потокобезопасного обмена данными
-import tkinter.messagebox  # Для всплывающих окон с ошибками
 
-import customtkinter as ctk
+from event_queue import EventQueue
+from messages import get_catalog, LOCALES, DEFAULT_LOCALE
+from metrics import ServerMetrics, MetricsHTTPServer
+from protocol import (FRAME_TOKEN, FRAME_MAGIC, EVENTS_TOKEN, EVENTS_MAGIC, OP_HELLO, OP_RESUME, BYE_COMMAND,
+                      PONG_COMMAND, FrameDecoder, ProtocolError, TextCodec, FrameCodec, command_from_frame,
+                      decode_resume, render_shot, render_turn, render_game_over)
+from server_log import Logger, LogWriter, DEBUG, INFO, LEVELS, LOG_MAX_BYTES, LOG_BACKUPS
+from session import PlayerSession, GameState
+from timers import TimerScheduler
+from timing import Timings, timed
+from turn_ring import TurnRing
+from outbound import (SendPump, QueuedSocket, DetachedSocket, QueueClosedError, SEND_QUEUE_LIMIT, OVERFLOW_DROP, OVERFLOW_TIMEOUT,
+                      OVERFLOW_POLICIES)
+
+MAX_PLAYERS = 6  # Максимум игроков за одним столом
+MAX_ROOMS = 1000  # Максимум комнат (столов) в одном процессе
+LISTEN_BACKLOG = 128  # Очередь входящих подключений для listen()
+RECV_SIZE = 4096  # Сколько байт читать за раз в кадровом режиме
+MAX_NAME_BYTES = 1024  # Длиннее имя обрезается: столько давал текстовый recv(1024), а в кадрах у строк 2 байта длины
+COALESCE_EVENTS = {"players", "bullets"}  # Снимки состояния: при переполнении очереди достаточно последнего
+INBOX_BATCH = 64  # Сколько действий комнаты выполнить за один заход, прежде чем уступить поток пула
+RESUME_GRACE = 30.0  # Сколько секунд держать место за игроком, у которого оборвалась связь
+TURN_TIMEOUT = 60.0  # Секунд на ход; 0 - без ограничения
+TURN_TIMEOUT_PASS = "pass"  # Не успевший сходить пропускает ход
+TURN_TIMEOUT_SHOOT = "shoot"  # ... или стреляет в себя
+TURN_TIMEOUT_ACTIONS = (TURN_TIMEOUT_PASS, TURN_TIMEOUT_SHOOT)
+HANDSHAKE_TIMEOUT = 10.0  # Сколько секунд ждать имя от нового подключения
+KEEPALIVE_INTERVAL = 30.0  # После скольких секунд тишины проверять, жив ли клиент; 0 - не проверять
+STATS_INTERVAL = 5.0  # Как часто выводить сводку статистики без окна и из воркеров, секунд
+
+
+def enable_tcp_keepalive(sock, idle):
+    # Проверка связи силами ядра - для всех соединений, в том числе клиентов без OP_PING:
+    # полуоткрытое соединение (клиент пропал без FIN) закроется примерно через 2 * idle секунд
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(1, int(idle)))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(idle) // 3))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+    except OSError:
+        pass
 
 
 # --- Модифицированный класс RussianRouletteServer ---
 
 class RussianRouletteServer:
-    def __init__(self, host='localhost', port=12345, gui_queue=None):
+    def __init__(self, host='localhost', port=12345, gui_queue=None, room_size=MAX_PLAYERS, max_rooms=MAX_ROOMS,
+                 reuse_port=False, listen_socket=None, room_id_start=1, room_id_step=1,
+                 send_queue_limit=SEND_QUEUE_LIMIT, overflow_policy=OVERFLOW_DROP, overflow_timeout=OVERFLOW_TIMEOUT,
+                 locale=DEFAULT_LOCALE, room_workers=None, log_level=INFO, log_sinks=(),
+                 metrics_host='127.0.0.1', metrics_port=None, timings=False, resume_grace=RESUME_GRACE,
+                 turn_timeout=TURN_TIMEOUT, turn_timeout_action=TURN_TIMEOUT_PASS, handshake_timeout=HANDSHAKE_TIMEOUT,
+                 keepalive=KEEPALIVE_INTERVAL):
+        if turn_timeout_action not in TURN_TIMEOUT_ACTIONS:
+            raise ValueError(f"Неизвестное действие по истечении хода: {turn_timeout_action}")
         self.host = host
         self.port = port
         self.server_socket = None  # Инициализируем позже
-        self.clients = []  # Список сокетов всех подключенных клиентов
+        self.reuse_port = reuse_port  # SO_REUSEPORT: несколько процессов слушают один порт
+        self.listen_socket = listen_socket  # Готовый слушающий сокет, переданный родительским процессом
         self.client_threads = []  # Отслеживаем потоки клиентов
-        self.player_names = {}  # {socket: name}
-        self.name_to_socket = {}  # {name: socket}
-        self.bullets = 6  # Всего слотов в барабане по умолчанию
-        self.chamber = []  # Текущий барабан
-        self.current_player = 0  # Индекс текущего игрока в self.clients
-        self.game_started = False  # Флаг, идет ли игра
-        self.players_alive = []  # Список сокетов живых игроков
-        self.live_bullets = 0  # Количество боевых патронов
-        self.blank_bullets = 0  # Количество холостых патронов
+        self.room_size = room_size  # Мест за одним столом
+        self.max_rooms = max_rooms  # Максимум одновременных комнат в процессе
+        self.rooms = {}  # {room_id: Room}
+        self.open_rooms = {}  # {room_id: Room} - комнаты со свободными местами, в порядке создания
+        self.sessions = {}  # {socket: PlayerSession} - игроки, занявшие место за столом
+        self.resume_grace = resume_grace  # 0 - место после обрыва не держим
+        self.resume_tokens = {}  # {токен: PlayerSession} - выданные токены возобновления
+        self.held_seats = {}  # {токен: timers.Timer} - места, ждущие переподключения; таймер освобождает место
+        self.turn_timeout = turn_timeout  # 0 - ход не ограничен по времени
+        self.turn_timeout_action = turn_timeout_action
+        self.handshake_timeout = handshake_timeout  # 0 - имя ждем сколько угодно
+        self.keepalive = keepalive  # 0 - связь не проверяем
+        self.catalog = get_catalog(locale)  # Тексты сообщений клиентам, заранее закодированные
+        self.text_codec = TextCodec(self.catalog)
+        self.frame_codec = FrameCodec(self.catalog)
+        self.event_codec = FrameCodec(self.catalog, events=True)  # Для клиентов, понимающих OP_GAME_START и др.
+        self.welcome_bytes = f"{self.catalog.text('welcome')} {FRAME_TOKEN}{EVENTS_TOKEN}".encode()
+        self.next_room_id = room_id_start
+        self.room_id_step = room_id_step  # Шаг номеров комнат: у каждого воркера свое непересекающееся множество
+        self.rooms_lock = threading.Lock()  # Защищает только реестр комнат, не игровое состояние
+        self.games_running = 0  # Идущих партий во всех комнатах (см. count_games)
+        self.players_alive = 0  # Живых игроков в идущих партиях
+        self.counts_lock = threading.Lock()
+        self.send_queue_limit = send_queue_limit  # Байт в исходящей очереди одного клиента
+        self.overflow_policy = overflow_policy  # "drop", "coalesce" или "block" (см. outbound.py)
+        self.overflow_timeout = overflow_timeout
+        self.send_pump = None  # Поток, который дописывает исходящие очереди в сокеты
+        self.room_workers = room_workers  # Потоков игровой логики (None - по умолчанию ThreadPoolExecutor)
+        self.room_executor = None  # Пул, в котором комнаты разбирают свои входящие
         self.running = False  # Флаг для управления основным циклом сервера
         self.gui_queue = gui_queue  # Очередь для отправки сообщений в GUI
+        # Журнал: записи идут в окно/консоль и в дополнительные приемники (например, LogWriter в файл)
+        self.logger = Logger(level=log_level, sinks=[self._log_to_queue, *log_sinks])
+        self.metrics = ServerMetrics(self)  # Счетчики и гистограммы, см. metrics.py
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port  # None - метрики по HTTP не отдаются
+        self.metrics_server = None
+        self.timings = Timings(self.logger)  # Замеры времени в комнатах, включаются на ходу (см. timing.py)
+        self.timings_on_start = timings
+        # Все отложенные действия (дедлайны ходов, рукопожатия, проверки связи) - в одном потоке
+        self.timers = TimerScheduler(self.logger)
+
+    def _log_to_queue(self, record):
+        if self.gui_queue:
+            self.log("log", record.console_line())
 
     def log(self, message_type, data):
+        # События для окна и консоли: строки журнала и рассылки
         if self.gui_queue:
             try:
                 self.gui_queue.put((message_type, data), block=False)
             except queue.Full:
                 print("Внимание: Очередь GUI переполнена!")
 
-    def update_status(self):
-        current_turn_name = "N/A"
-        if self.game_started and self.clients and 0 <= self.current_player < len(self.clients):
-            current_socket = self.clients[self.current_player]
-            if current_socket in self.players_alive:  # Убедимся, что игрок еще жив
-                current_turn_name = self.player_names.get(current_socket, "ОшибкаИмени")
-            else:  # Если текущий игрок по индексу мертв, отобразим N/A
-                current_turn_name = "N/A (ожид. передачи)"
-
+    def _start_metrics(self):
+        if self.metrics_port is None:
+            return
+        try:
+            self.metrics_server = MetricsHTTPServer(self.metrics, self.metrics_host, self.metrics_port)
+        except OSError as e:
+            self.logger.error("Не удалось открыть порт метрик %s:%s: %s", self.metrics_host, self.metrics_port, e)
+            return
+        self.metrics_server.start()
+        self.logger.info("Метрики: http://%s:%s/metrics", self.metrics_host, self.metrics_server.port)
+
+    def _record_recv(self, session, started):
+        # Замер "recv": разбор полученного куска и постановка команд во входящие комнаты
+        room = session.room
+        self.timings.record(room.room_id if room is not None else 0, "recv", time.perf_counter() - started)
+
+    def _stop_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+    def count_games(self, games, alive):
+        # Комнаты сообщают изменения сами, поэтому снимок статуса не обходит комнаты
+        with self.counts_lock:
+            self.games_running += games
+            self.players_alive += alive
+
+    def status(self):
+        # Снимок для окна и сводок: потребитель забирает его сам по своему таймеру, комнаты ничего не шлют
+        with self.counts_lock:
+            games_running, alive = self.games_running, self.players_alive
+        rooms = list(self.rooms.values())
         status = {
-            "connected": len(self.clients),
-            "alive": len(self.players_alive) if self.game_started else 0,
-            "live_bullets": self.live_bullets if self.game_started else 0,
-            "blank_bullets": self.blank_bullets if self.game_started else 0,
-            "turn": current_turn_name,
-            "game_running": self.game_started
+            "connected": len(self.sessions),
+            "rooms": len(rooms),
+            "games_running": games_running,
+            "alive": alive,
+            "game_running": games_running > 0
         }
-        self.log("status_update", status)
+        depths = self.queue_depths()
+        status["send_queue_max_bytes"] = max((queued_bytes for _, queued_bytes in depths), default=0)
+        status["send_queue_messages"] = sum(messages for messages, _ in depths)
+        if len(rooms) == 1:  # Для единственной комнаты показываем подробности, как раньше
+            status.update(rooms[0].status())
+        return status
+
+    def queue_depths(self):
+        # [(сообщений в очереди, байт в очереди)] по всем клиентам; обходит всех игроков процесса,
+        # поэтому зовется только при запросе статуса или опросе метрик
+        depths = []
+        for session in list(self.sessions.values()):
+            outbound = getattr(session.socket, "queue", None)
+            if outbound is not None:
+                depths.append(outbound.depth())
+        return depths
+
+    def send_message(self, session, key, **fields):
+        session.socket.send(session.codec.message(key, **fields))
+
+    def schedule_room(self, room):
+        # Поставить разбор входящих комнаты в пул; вызывается, только когда комната еще не в очереди
+        executor = self.room_executor
+        if executor is not None:
+            try:
+                executor.submit(room.drain)
+                return
+            except RuntimeError:
+                pass  # Пул уже остановлен - доделываем в текущем потоке
+        room.drain()
+
+    def abort_connection(self, client):
+        # Разорвать соединение из любого потока (таймеры, комнаты); поток клиента увидит отключение
+        client.abort()
+
+    def has_free_seat(self):
+        return bool(self.open_rooms) or len(self.rooms) < self.max_rooms
+
+    def _assign_room(self, session):
+        # Сажаем игрока за первый стол со свободным местом или открываем новый
+        with self.rooms_lock:
+            room = next(iter(self.open_rooms.values()), None)
+            if room is None:
+                if len(self.rooms) >= self.max_rooms:
+                    return None
+                room = Room(self, self.next_room_id, max_players=self.room_size)
+                self.next_room_id += self.room_id_step
+                self.rooms[room.room_id] = room
+                self.open_rooms[room.room_id] = room
+                self.logger.info("Открыта комната %s.", room.room_id)
+            self.sessions[session.socket] = session
+            session.room = room
+            room.seats_taken += 1
+            if room.seats_taken >= room.max_players:
+                self.open_rooms.pop(room.room_id, None)
+            return room
+
+    def _release_seat(self, session):
+        # Освобождает место в реестре; пустая комната закрывается
+        with self.rooms_lock:
+            room = session.room
+            if room is None or self.sessions.pop(session.socket, None) is None:
+                return None
+            if session.token is not None:
+                self.resume_tokens.pop(session.token, None)
+            session.room = None
+            room.seats_taken -= 1
+            if room.seats_taken <= 0:
+                self.rooms.pop(room.room_id, None)
+                self.open_rooms.pop(room.room_id, None)
+                self.logger.info("Комната %s закрыта.", room.room_id)
+            else:
+                self.open_rooms.setdefault(room.room_id, room)
+            return room
 
     def start(self):
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            if self.listen_socket is not None:
+                self.server_socket = self.listen_socket
+            else:
+                self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.reuse_port:
+                    self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self.server_socket.bind((self.host, self.port))
+                self.server_socket.listen(LISTEN_BACKLOG)
             self.server_socket.settimeout(1.0)
+            self.send_pump = SendPump()
+            self.send_pump.start()
+            self.room_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.room_workers,
+                                                                       thread_name_prefix="room")
             self.running = True
-            self.log("log", f"Сервер запущен на {self.host}:{self.port}. Ожидание игроков...")
-            self.update_status()
+            self.timers.start()
+            self._start_metrics()
+            if self.timings_on_start:
+                self.timings.set_enabled(True)
+            self.logger.info("Сервер запущен на %s:%s. Ожидание игроков...", self.host, self.port)
 
             while self.running:
                 try:
@@ -73,17 +272,23 @@ class RussianRouletteServer:
                         client_socket.close()
                         break
 
-                    if len(self.clients) < 6:
-                        player_num_temp = len(self.clients) + 1  # Временный номер для лога
-                        self.log("log", f"Новое подключение от {addr}. Попытка регистрации игрока {player_num_temp}.")
+                    if self.has_free_seat():
+                        if self.keepalive > 0:
+                            enable_tcp_keepalive(client_socket, self.keepalive)
+                        client_socket = QueuedSocket(client_socket, self.send_pump, limit=self.send_queue_limit,
+                                                     policy=self.overflow_policy, timeout=self.overflow_timeout)
+                        self.metrics.accepted.inc()
+                        player_num_temp = len(self.sessions) + 1  # Временный номер для лога
+                        self.logger.info("Новое подключение от %s. Попытка регистрации игрока %s.", addr, player_num_temp)
                         thread = threading.Thread(target=self.handle_client, args=(client_socket, player_num_temp),
                                                   daemon=True)
                         self.client_threads.append(thread)
                         thread.start()
                     else:
-                        self.log("log", f"Отклонено подключение от {addr}: Сервер переполнен.")
+                        self.metrics.rejected.inc()
+                        self.logger.warning("Отклонено подключение от %s: Сервер переполнен.", addr)
                         try:
-                            client_socket.send("Сервер переполнен".encode())
+                            client_socket.send(self.catalog.encode("server_full"))
                         except Exception:
                             pass  # Клиент мог уже отключиться
                         client_socket.close()
@@ -91,24 +296,30 @@ class RussianRouletteServer:
                     continue
                 except Exception as e:
                     if self.running:
-                        self.log("log", f"Ошибка в главном цикле приема подключений: {e}")
+                        self.logger.error("Ошибка в главном цикле приема подключений: %s", e)
                     break
         except OSError as e:
-            self.log("log", f"Ошибка запуска сервера (возможно, порт {self.port} занят): {e}")
+            self.logger.error("Ошибка запуска сервера (возможно, порт %s занят): %s", self.port, e)
             if self.gui_queue:
                 self.gui_queue.put(("server_stopped", None), block=False)
         finally:
-            self.log("log", "Сервер останавливается...")
+            self.logger.info("Сервер останавливается...")
             self.running = False
             if self.server_socket:
                 self.server_socket.close()
                 self.server_socket = None
             self._cleanup_clients()
-            if self.game_started:
-                self.reset_game_state()
-
-            self.update_status()
-            self.log("log", "Сервер остановлен.")
+            self.timers.stop()
+            if self.room_executor:
+                self.room_executor.shutdown(wait=True)  # Комнаты дорабатывают входящие, в т.ч. удаление игроков
+                self.room_executor = None
+            if self.send_pump:
+                self.send_pump.stop()
+                self.send_pump = None
+            self._stop_metrics()
+            self.timings.close()
+
+            self.logger.info("Сервер остановлен.")
             if self.gui_queue:
                 try:
                     self.gui_queue.put(("server_stopped", None), block=False)
@@ -118,7 +329,7 @@ class RussianRouletteServer:
     def stop(self):
         if not self.running:
             return
-        self.log("log", "Получен сигнал остановки...")
+        self.logger.info("Получен сигнал остановки...")
         self.running = False
         try:
             with socket.create_connection((self.host, self.port), timeout=0.5) as sock:
@@ -127,242 +338,205 @@ class RussianRouletteServer:
             pass
 
     def _cleanup_clients(self):
-        self.log("log", "Закрытие клиентских соединений...")
-        clients_copy = self.clients[:]
-
-        for client_socket in clients_copy:
-            player_name = self.player_names.get(client_socket, "Неизвестный (уже удален?)")
-            self.log("log", f"Принудительное отключение клиента {player_name}...")
-            try:
-                client_socket.send("Сервер отключается.".encode())
-                client_socket.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
-            try:
-                client_socket.close()
-            except Exception as e:
-                self.log("log", f"Ошибка при закрытии сокета клиента {player_name}: {e}")
-            self._remove_client(client_socket, notify_others=False, reason="server_shutdown")
-
-        if self.game_started:
-            self.log("log", "Игра прервана из-за остановки сервера.")
-            self.reset_game_state()
-
-        self.log("log", "Все клиентские соединения обработаны для закрытия.")
-
-    def _remove_client(self, client_socket, notify_others=True, reason="disconnect"):
-        name = self.player_names.pop(client_socket, None)
-        player_log_name = name if name else "Неизвестный"
+        self.logger.info("Закрытие клиентских соединений...")
+        with self.rooms_lock:
+            timers = list(self.held_seats.values())
+            self.held_seats.clear()
+        for timer in timers:
+            timer.cancel()
+
+        for room in list(self.rooms.values()):
+            for session in list(room.players):
+                self.logger.info("Принудительное отключение клиента %s...", session.name)
+                try:
+                    self.send_message(session, "server_shutdown")
+                    session.socket.shutdown(socket.SHUT_RDWR)
+                except Exception:
+                    pass
+                try:
+                    session.socket.close()
+                except Exception as e:
+                    self.logger.error("Ошибка при закрытии сокета клиента %s: %s", session.name, e)
+                self._remove_client(session, notify_others=False, reason="server_shutdown")
 
-        player_socket_that_was_current = None
-        original_current_player_index = self.current_player
+            room.post(room.abort_game)
 
-        if self.game_started and self.clients and 0 <= self.current_player < len(self.clients):
-            player_socket_that_was_current = self.clients[self.current_player]
+        self.logger.info("Все клиентские соединения обработаны для закрытия.")
 
-        original_index_of_removed_player = -1
-        if client_socket in self.clients:
-            try:
-                original_index_of_removed_player = self.clients.index(client_socket)
-            except ValueError:
-                pass
-            self.clients.remove(client_socket)
-
-        if name:
-            self.name_to_socket.pop(name.lower(), None)
-            if notify_others:
-                self.log("log", f"Игрок {name} ({reason}) покинул игру.")
-                self.broadcast(f"{name} покинул игру.")
+    def _remove_client(self, session, notify_others=True, reason="disconnect"):
+        room = session.room
+        if room is None:
+            self.logger.info("Неименованный игрок (%s) отключился/удален.", reason)
+            return
+        if reason == "disconnect" and self._hold_seat(session):
+            return
+        room.post(room.remove_client, session, notify_others=notify_others, reason=reason)
+        self._release_seat(session)
+
+    def issue_resume_token(self, session):
+        token = secrets.token_urlsafe(16)
+        with self.rooms_lock:
+            self.resume_tokens[token] = session
+            session.token = token
+        return token
+
+    def _forget_token(self, session):
+        # Игрок уходит сам: после закрытия соединения место не держим
+        with self.rooms_lock:
+            if session.token is not None:
+                self.resume_tokens.pop(session.token, None)
+                session.token = None
+
+    def _hold_seat(self, session):
+        # Обрыв связи у игрока с токеном: партия его ждет, место держится resume_grace секунд
+        room = session.room
+        with self.rooms_lock:
+            if session.token is None or not self.running or self.resume_grace <= 0 \
+                    or self.sessions.pop(session.socket, None) is None:
+                return False
+            session.socket = DetachedSocket()
+            self.sessions[session.socket] = session
+        room.post(room.detach_player, session)  # До того, как место станет доступно для возврата
+        with self.rooms_lock:  # _expire_seat ждет эту блокировку, так что таймер не обгонит запись
+            self.held_seats[session.token] = self.timers.call_later(self.resume_grace, self._expire_seat, session)
+        return True
+
+    def _expire_seat(self, session):
+        with self.rooms_lock:
+            if self.held_seats.pop(session.token, None) is None:
+                return  # Игрок уже вернулся или сервер останавливается
+        self.logger.info("Игрок %s не вернулся за %s с, место освобождается.", session.name, self.resume_grace)
+        self._remove_client(session, notify_others=True, reason="resume_timeout")
+
+    def _start_handshake_timer(self, client, peer_address):
+        # Подключившийся, но не назвавшийся клиент не должен вечно держать поток или корутину в recv
+        if self.handshake_timeout <= 0:
+            return None
+        return self.timers.call_later(self.handshake_timeout, self._handshake_expired, client, peer_address)
+
+    def _handshake_expired(self, client, peer_address):
+        self.logger.warning("Клиент не представился за %s с, соединение закрывается.", self.handshake_timeout,
+                            peer=peer_address)
+        self.abort_connection(client)
+
+    def _watch_connection(self, session):
+        # Проверка связи нужна только клиентам, которые умеют отвечать на OP_PING
+        session.last_seen = time.monotonic()
+        if self.keepalive > 0 and session.codec.events:
+            self.timers.call_later(self.keepalive, self._check_alive, session, session.socket)
+
+    def _check_alive(self, session, client):
+        # Поток таймеров. Пока клиент что-то присылает, проверка только переносится на конец тишины
+        # (прием данных стоит одного присваивания last_seen); замолчавшему - OP_PING, не ответившему - разрыв
+        room = session.room
+        if not self.running or room is None or self.sessions.get(client) is not session:
+            return  # Игрок ушел или его соединение сменилось (обрыв, возврат): у нового своя проверка
+        idle = time.monotonic() - session.last_seen
+        if idle < self.keepalive:
+            self.timers.call_later(self.keepalive - idle, self._check_alive, session, client)
+        elif idle < 2 * self.keepalive:
+            room.post(room.send_ping, session)
+            self.timers.call_later(self.keepalive, self._check_alive, session, client)
         else:
-            self.log("log", f"Неименованный игрок ({reason}) отключился/удален.")
-
-        was_in_players_alive = client_socket in self.players_alive
-        if was_in_players_alive:
-            self.players_alive.remove(client_socket)
-
-        if self.game_started and was_in_players_alive:
-            if len(self.players_alive) <= 1 and reason != "server_shutdown":
-                winner_name = "Никто не"
-                if len(self.players_alive) == 1:
-                    winner_name = self.player_names.get(self.players_alive[0], "Неизвестный")
-                self.broadcast(f"\n=== ИГРА ОКОНЧЕНА ===\n{winner_name} побеждает!")
-                self.reset_game()
-
-            elif client_socket == player_socket_that_was_current:
-                self.log("log", f"Текущий игрок {player_log_name} отключился. Передача хода.")
-                if self.players_alive:
-                    if len(self.clients) > 0:
-                        self.current_player = (original_index_of_removed_player - 1 + len(self.clients)) % len(
-                            self.clients)
-                    else:
-                        self.current_player = 0
-                    self.pass_turn(notify=True)
-                else:
-                    if reason != "server_shutdown": self.reset_game()
-
-            elif player_socket_that_was_current and self.clients:
-                try:
-                    new_idx = self.clients.index(player_socket_that_was_current)
-                    self.current_player = new_idx
-                    self.log("log",
-                             f"Игрок {player_log_name} отключился. Ход остается у {self.player_names.get(player_socket_that_was_current, 'ТЕКУЩИЙ')}, новый индекс {self.current_player}.")
-                    if player_socket_that_was_current not in self.players_alive:
-                        self.log("log",
-                                 f"Ход был у {self.player_names.get(player_socket_that_was_current)}, но он выбыл. Передача хода.")
-                        self.pass_turn(notify=True)
-                except ValueError:
-                    self.log("log",
-                             f"КРИТИЧЕСКАЯ ОШИБКА: Ожидаемый текущий игрок {self.player_names.get(player_socket_that_was_current)} не найден после удаления {player_log_name}. Текущий индекс был {original_current_player_index}.")
-                    if self.players_alive:
-                        self.current_player = 0
-                        self.pass_turn(notify=True)
-                    elif reason != "server_shutdown":
-                        self.reset_game()
-            elif not self.players_alive and reason != "server_shutdown":
-                self.reset_game()
-
-        elif len(self.clients) < 2 and self.game_started and reason != "server_shutdown":
-            self.broadcast("Недостаточно игроков для продолжения.")
-            self.reset_game()
-
-        if reason != "server_shutdown":
-            self.update_status()
+            self.logger.info("%s не отвечает %d с, соединение закрывается.", session.name, idle)
+            self.abort_connection(client)
+
+    def _resume_client(self, session, token, peer_address):
+        # Возврат на удержанное место: старая сессия получает новое соединение.
+        # Возвращает (сессия, Future снимка партии) или None - тогда регистрируем как нового игрока
+        with self.rooms_lock:
+            timer = self.held_seats.pop(token, None)
+            if timer is None:
+                return None
+            timer.cancel()
+            held = self.resume_tokens[token]
+            self.sessions.pop(held.socket, None)
+            held.socket = session.socket
+            held.codec = session.codec
+            self.sessions[held.socket] = held
+        room = held.room
+        self.logger.info("Игрок %s вернулся на свое место.", held.name, room=room.room_id, peer=peer_address)
+        return held, room.submit(room.resume_player, held)
 
     def handle_client(self, client_socket, player_num_temp):
         name = None
         peer_address = None # Инициализируем здесь
+        session = PlayerSession(client_socket, self.text_codec)
+        handshake_timer = None
         try:
             peer_address = client_socket.getpeername()
-            self.log("log", f"DEBUG: Запрос имени у клиента {peer_address}")
-            client_socket.send(f"Добро пожаловать! Введите ваше имя:".encode())
+            self.logger.debug("Запрос имени у клиента", peer=peer_address)
+            handshake_timer = self._start_handshake_timer(client_socket, peer_address)
+            client_socket.send(self.welcome_bytes)
 
             name_bytes = client_socket.recv(1024)
-            self.log("log", f"DEBUG: От {peer_address} получено name_bytes: {name_bytes!r} (длина: {len(name_bytes)})")
-
-            if not name_bytes:
-                self.log("log", f"DEBUG: name_bytes от {peer_address} пусто. Клиент, вероятно, отключился.")
-                raise ConnectionResetError("Клиент отключился при запросе имени")
-
-            try:
-                name_input_decoded = name_bytes.decode('utf-8')
-                self.log("log",
-                         f"DEBUG: Для {peer_address} декодированное имя: '{name_input_decoded}' (длина: {len(name_input_decoded)})")
-            except UnicodeDecodeError as ude:
-                self.log("log",
-                         f"ОШИБКА: Для {peer_address} НЕ УДАЛОСЬ декодировать name_bytes: {name_bytes!r}. Ошибка: {ude}")
-                name = f"Игрок_{player_num_temp}_ОшибкаКодировки"
-                self.log("log", f"DEBUG: Присвоено имя по умолчанию '{name}' из-за ошибки декодирования.")
+            pending_frames = []
+            token = None
+            decoder = self._open_frames(session, name_bytes)
+            if decoder is not None:
+                frames = decoder.feed(name_bytes[len(FRAME_MAGIC):])
+                while not frames:
+                    chunk = client_socket.recv(RECV_SIZE)
+                    if not chunk:
+                        raise ConnectionResetError("Клиент отключился при запросе имени")
+                    frames = decoder.feed(chunk)
+                name_bytes, token, pending_frames = self._hello_from_frames(frames)
+            resumed = self._resume_client(session, token, peer_address) if token else None
+            if resumed is not None:
+                session, snapshot = resumed
+                snapshot.result()
+                name = session.name
             else:
-                name_input = name_input_decoded.strip()
-                self.log("log",
-                         f"DEBUG: Для {peer_address} имя после strip(): '{name_input}' (длина: {len(name_input)})")
-
-                if not name_input:
-                    self.log("log",
-                             f"DEBUG: Для {peer_address} имя name_input пустое после strip(). Используется имя по умолчанию.")
-                    name = f"Игрок_{player_num_temp}"
-                else:
-                    name = name_input
-
-            original_name = name
-            count = 1
-            # Преобразуем имя к нижнему регистру для проверки уникальности
-            while name.lower() in self.name_to_socket:
-                 name = f"{original_name}_{count}"
-                 count += 1
-                 if count > 10: # Предохранитель от бесконечного цикла
-                      name = f"Игрок_{random.randint(1000,9999)}" # Генерируем случайное имя
-                      break
-
-            self.clients.append(client_socket)
-            self.player_names[client_socket] = name
-            self.name_to_socket[name.lower()] = client_socket # Сохраняем в нижнем регистре для поиска
-
-            actual_player_num = self.clients.index(client_socket) + 1
-            self.log("log", f"Игрок '{name}' (№{actual_player_num}) успешно зарегистрирован.")
-            self.broadcast(f"{name} присоединился к игре! Всего игроков: {len(self.clients)}")
-            self.update_status()
-
-            if len(self.clients) >= 2 and not self.game_started:
-                self.start_game()
+                name = self._register_client(session, name_bytes, peer_address, player_num_temp).result()
+            if handshake_timer is not None:
+                handshake_timer.cancel()
+            self._watch_connection(session)
+            for data in self._commands_from_frames(pending_frames):
+                self._handle_command(session, data)
 
             while self.running:
                 try:
-                    data_bytes = client_socket.recv(1024)
+                    data_bytes = client_socket.recv(RECV_SIZE if decoder is not None else 1024)
+                    started = time.perf_counter() if self.timings.enabled else None
                     if not data_bytes:
-                        self.log("log", f"{name} отключился (пустые данные).")
+                        self.logger.info("%s отключился (пустые данные).", name)
                         break
-                    data = data_bytes.decode().strip().lower()
+                    session.last_seen = time.monotonic()
+                    if decoder is not None:
+                        commands = self._commands_from_frames(decoder.feed(data_bytes))
+                    else:
+                        commands = [data_bytes.decode().strip().lower()]
                 except ConnectionResetError:
-                    self.log("log", f"Соединение с {name} сброшено (ConnectionResetError).")
+                    self.logger.info("Соединение с %s сброшено (ConnectionResetError).", name)
                     break
                 except socket.error as e:
                     if not self.running and e.errno == 10004:
-                        self.log("log", f"Операция recv для {name} прервана (остановка сервера).")
+                        self.logger.info("Операция recv для %s прервана (остановка сервера).", name)
                     else:
-                        self.log("log", f"Ошибка сокета при получении данных от {name}: {e}")
+                        self.logger.error("Ошибка сокета при получении данных от %s: %s", name, e)
                     break
                 except Exception as e:
-                    self.log("log", f"Ошибка при получении данных от {name}: {e}")
+                    self.logger.error("Ошибка при получении данных от %s: %s", name, e)
                     break
 
-                if not self.game_started:
-                    client_socket.send("Игра еще не началась. Ожидание игроков...".encode())
-                    continue
-
-                if client_socket not in self.players_alive:
-                    client_socket.send("Вы выбыли из игры.".encode())
-                    continue
-
-                current_player_socket_check = None
-                if 0 <= self.current_player < len(self.clients):
-                    current_player_socket_check = self.clients[self.current_player]
-                else:
-                    self.log("log",
-                             f"ОШИБКА: self.current_player ({self.current_player}) вне диапазона self.clients ({len(self.clients)}) в handle_client для {name}.")
-                    if self.players_alive:
-                        self.pass_turn(notify=True)
-                        if 0 <= self.current_player < len(self.clients):
-                            current_player_socket_check = self.clients[self.current_player]
-                        else:
-                            client_socket.send(
-                                "Ошибка сервера: не удалось определить текущего игрока. Попробуйте позже.".encode())
-                            self.log("log", "КРИТИЧЕСКАЯ ОШИБКА: Не удалось восстановить current_player.")
-                            continue
-                    else:
-                        client_socket.send("Нет живых игроков для хода.".encode())
-                        if self.game_started: self.reset_game()
-                        continue
-
-                if data == "инфо":
-                    self.send_bullet_info(client_socket)
-                elif data == "игроки":
-                    self.send_player_list(client_socket)
-                elif current_player_socket_check == client_socket:
-                    if data == "я":
-                        self.process_shot(client_socket, target="self")
-                    elif data.startswith("игрок "):
-                        target_name_cmd = data[len("игрок "):].strip() # переименовал, чтобы не конфликтовать с переменной name
-                        self.process_player_target(client_socket, target_name_cmd)
-                    else:
-                        client_socket.send("Ваш ход. Используйте: 'я', 'игрок [имя]', 'инфо' или 'игроки'".encode())
-                else:
-                    current_turn_name = "???"
-                    if current_player_socket_check:
-                        current_turn_name = self.player_names.get(current_player_socket_check, "???")
-                    client_socket.send(f"Сейчас не ваш ход. Ходит {current_turn_name}.".encode())
+                for data in commands:  # В кадровом режиме за одно чтение может прийти несколько команд
+                    self._handle_command(session, data)
+                if started is not None:
+                    self._record_recv(session, started)
 
         except ConnectionResetError:
             log_name_cr = name if name else f"клиент ({peer_address})" if peer_address else "неименованный клиент"
-            self.log("log", f"Соединение с {log_name_cr} было сброшено.")
+            self.logger.info("Соединение с %s было сброшено.", log_name_cr)
         except Exception as e:
             log_name_ex = name if name else f"клиент ({peer_address})" if peer_address else "неименованный клиент"
             if self.running:
-                self.log("log", f"Непредвиденная ошибка в handle_client ({log_name_ex}): {e}")
+                self.logger.error("Непредвиденная ошибка в handle_client (%s): %s", log_name_ex, e)
         finally:
+            if handshake_timer is not None:
+                handshake_timer.cancel()
             log_name_final = name if name else f"клиент (сокет: {client_socket.fileno() if client_socket and client_socket.fileno() != -1 else 'N/A'}, адрес: {peer_address if peer_address else 'N/A'})"
-            self.log("log", f"Завершение обработки клиента {log_name_final}.")
-            self._remove_client(client_socket, notify_others=True)
+            self.logger.info("Завершение обработки клиента %s.", log_name_final)
+            self._remove_client(session, notify_others=True)
 
             if client_socket:
                 try:
@@ -370,492 +544,825 @@ class RussianRouletteServer:
                 except Exception:
                     pass
 
-    def process_player_target(self, shooter_socket, target_name):
-        shooter_name = self.player_names.get(shooter_socket, "Неизвестный")
-        if not target_name:
-            shooter_socket.send("Укажите имя игрока после 'игрок '".encode())
+    def _open_frames(self, session, name_bytes):
+        # Клиент начал ответ на приветствие с FRAME_MAGIC (или EVENTS_MAGIC) - дальше с ним говорим кадрами
+        if name_bytes.startswith(EVENTS_MAGIC):
+            session.codec = self.event_codec
+        elif name_bytes.startswith(FRAME_MAGIC):
+            session.codec = self.frame_codec
+        else:
+            return None
+        return FrameDecoder()
+
+    def _hello_from_frames(self, frames):
+        # (имя в байтах, токен возобновления или None, оставшиеся кадры)
+        opcode, payload = frames[0]
+        if opcode == OP_RESUME:
+            token, name = decode_resume(payload)
+            return name.encode(), token, frames[1:]
+        if opcode != OP_HELLO:
+            raise ProtocolError(f"Ожидался кадр HELLO, получен {opcode:#x}")
+        return payload, None, frames[1:]
+
+    def _commands_from_frames(self, frames):
+        return [command_from_frame(opcode, payload).strip().lower() for opcode, payload in frames]
+
+    def _register_client(self, session, name_bytes, peer_address, player_num_temp):
+        # Общая часть рукопожатия для всех движков: разбор имени и регистрация игрока.
+        # Возвращает Future с итоговым именем: игрока добавляет сама комната
+        logger = self.logger.bind(peer=peer_address)
+        logger.debug("Получено name_bytes: %r (длина: %d)", name_bytes, len(name_bytes))
+
+        if not name_bytes:
+            logger.debug("name_bytes пусто. Клиент, вероятно, отключился.")
+            raise ConnectionResetError("Клиент отключился при запросе имени")
+
+        truncated = len(name_bytes) > MAX_NAME_BYTES
+        if truncated:  # Кадр HELLO может нести до MAX_FRAME_SIZE байт
+            logger.warning("Имя длиной %d байт обрезано до %d.", len(name_bytes), MAX_NAME_BYTES)
+            name_bytes = name_bytes[:MAX_NAME_BYTES]
+
+        try:
+            if truncated:  # Разрезанный последним байтом символ отбрасываем, а не считаем ошибкой кодировки
+                name_input_decoded = codecs.getincrementaldecoder('utf-8')().decode(name_bytes)
+            else:
+                name_input_decoded = name_bytes.decode('utf-8')
+            logger.debug("Декодированное имя: '%s' (длина: %d)", name_input_decoded, len(name_input_decoded))
+        except UnicodeDecodeError as ude:
+            logger.error("Не удалось декодировать name_bytes: %r. Ошибка: %s", name_bytes, ude)
+            name = f"Игрок_{player_num_temp}_ОшибкаКодировки"
+            logger.debug("Присвоено имя по умолчанию '%s' из-за ошибки декодирования.", name)
+        else:
+            name_input = name_input_decoded.strip()
+            logger.debug("Имя после strip(): '%s' (длина: %d)", name_input, len(name_input))
+
+            if not name_input:
+                logger.debug("Имя пустое после strip(). Используется имя по умолчанию.")
+                name = f"Игрок_{player_num_temp}"
+            else:
+                name = name_input
+
+        room = self._assign_room(session)
+        if room is None:
+            self.send_message(session, "server_full")
+            raise ConnectionResetError("Нет свободных мест")
+        return room.submit(room.add_player, session, name)
+
+    def _handle_command(self, session, data):
+        if data == PONG_COMMAND:
+            return  # Ответ на OP_PING: достаточно того, что данные пришли
+        if data == BYE_COMMAND:
+            self._forget_token(session)
             return
+        room = session.room
+        if room is not None:
+            room.post(room.handle_command, session, data, time.perf_counter())
+
+
+# --- Игровая комната ---
+
+def command_kind(data):
+    # Тип команды для метрик: ограниченный набор значений, имя цели в метку не попадает
+    if data == "я":
+        return "shoot_self"
+    if data.startswith("игрок "):
+        return "shoot_player"
+    if data == "инфо":
+        return "info"
+    if data == "игроки":
+        return "players"
+    return "other"
+
+
+def batched(method):
+    # Все сообщения, отправленные внутри метода, уходят одним буфером на клиента
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.batch():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Room:
+    """Один стол: свой барабан, свои игроки и своя очередь ходов.
+
+    Вся игровая логика работает в пределах комнаты, поэтому один процесс сервера
+    может вести много партий одновременно.
+
+    Сетевые потоки не трогают состояние комнаты сами: они кладут действие во
+    входящие (post/submit), а выполняет их по очереди один исполнитель (drain).
+    Разные комнаты обрабатываются параллельно, одна комната - строго
+    последовательно, без блокировок в игровых методах.
+    """
+
+    def __init__(self, server, room_id, max_players=MAX_PLAYERS):
+        self.server = server
+        self.room_id = room_id
+        self.logger = server.logger.bind(room=room_id)  # Номер комнаты попадает в каждую запись журнала
+        self.max_players = max_players
+        self.seats_taken = 0  # Места, занятые через реестр сервера (включая еще регистрирующихся)
+        self.players = {}  # {PlayerSession: None} - игроки за столом в порядке мест; dict, чтобы удалять за O(1)
+        self.by_name = {}  # {name.casefold(): PlayerSession}
+        self.next_seat = 1
+        self.bullets = 6  # Всего слотов в барабане по умолчанию
+        self.game = GameState()
+        self.responses = {}  # {(вариант, кодек): байты} - готовые ответы на "инфо"/"игроки" для response_version
+        self.response_version = 0
+        self.batch_depth = 0  # Глубина вложенных batch()
+        self.pending = {}  # {PlayerSession: [(данные, ключ), ...]} - накопленное внутри batch()
+        self.inbox = collections.deque()  # (действие, args, kwargs, future) от сетевых потоков
+        self.inbox_lock = threading.Lock()
+        self.scheduled = False  # Разбор входящих уже поставлен в пул или выполняется
+        self.turn_timer = None  # Дедлайн текущего хода в server.timers
+        self.turn_serial = 0  # Номер хода: сработавший устаревший дедлайн с ним не совпадет
+
+    def state_changed(self):
+        # Ответы на "инфо" и "игроки", закодированные раньше, больше не годятся
+        self.game.version += 1
+
+    def cached_response(self, variant, codec):
+        if self.response_version != self.game.version:
+            self.responses.clear()
+            self.response_version = self.game.version
+            return None
+        return self.responses.get((variant, codec))
+
+    def cache_response(self, variant, codec, data):
+        self.responses[(variant, codec)] = data
+        return data
+
+    def post(self, action, *args, **kwargs):
+        # Выполнить действие в исполнителе комнаты, результат не нужен
+        self._enqueue((action, args, kwargs, None))
+
+    def submit(self, action, *args, **kwargs):
+        future = concurrent.futures.Future()
+        self._enqueue((action, args, kwargs, future))
+        return future
+
+    def _enqueue(self, item):
+        with self.inbox_lock:
+            self.inbox.append(item)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.server.schedule_room(self)
+
+    def drain(self):
+        # Пока scheduled, второй исполнитель для комнаты не запускается; все сообщения
+        # одного захода уходят клиентам одним буфером
+        with self.batch():
+            for _ in range(INBOX_BATCH):
+                with self.inbox_lock:
+                    if not self.inbox:
+                        break
+                    action, args, kwargs, future = self.inbox.popleft()
+                try:
+                    result = action(*args, **kwargs)
+                except Exception as e:
+                    self.logger.error("Ошибка при выполнении %s: %s", action.__name__, e)
+                    if future is not None:
+                        future.set_exception(e)
+                else:
+                    if future is not None:
+                        future.set_result(result)
+        with self.inbox_lock:
+            if not self.inbox:
+                self.scheduled = False
+                return
+        self.server.schedule_room(self)  # Остальное - следующим заходом, чтобы не занимать поток пула
+
+    def status(self):
+        # Вызывается и из исполнителей других комнат: читаем ссылки один раз
+        game = self.game
+        current = game.current
+        return {
+            "alive": len(game.alive) if game.started else 0,
+            "live_bullets": game.live_bullets if game.started else 0,
+            "blank_bullets": game.blank_bullets if game.started else 0,
+            "turn": current.name if game.started and current is not None else "N/A",
+        }
+
+    @batched
+    def add_player(self, session, name):
+        original_name = name
+        count = 1
+        # Уникальность имени проверяем без учета регистра
+        while name.casefold() in self.by_name:
+             name = f"{original_name}_{count}"
+             count += 1
+             if count > 10: # Предохранитель от бесконечного цикла
+                  name = f"Игрок_{random.randint(1000,9999)}" # Генерируем случайное имя
+                  break
+
+        session.set_name(name)
+        session.seat = self.next_seat
+        self.next_seat += 1
+        self.players[session] = None
+        self.by_name[session.key] = session
+        self.state_changed()
+
+        self.logger.info("Игрок '%s' (№%d) успешно зарегистрирован.", name, len(self.players))
+        self.broadcast_event(self.server.catalog.text("player_joined", name=name, count=len(self.players)),
+                             "player_joined", name, len(self.players))
+        if session.codec.events:
+            self.send_roster(session)
+            if self.server.resume_grace > 0:
+                self.send_event(session, "session_token", self.server.issue_resume_token(session),
+                                int(self.server.resume_grace))
+
+        if len(self.players) >= 2 and not self.game.started:
+            self.start_game()
 
-        if target_name.lower() == shooter_name.lower():
-            self.process_shot(shooter_socket, target="self")
+        return name
+
+    @batched
+    def remove_client(self, session, notify_others=True, reason="disconnect"):
+        if session not in self.players:
+            self.logger.info("Неименованный игрок (%s) отключился/удален.", reason)
+            return
+        del self.players[session]
+        self.by_name.pop(session.key, None)
+        self.state_changed()
+        if notify_others:
+            self.logger.info("Игрок %s (%s) покинул игру.", session.name, reason)
+            self.broadcast_event(self.server.catalog.text("player_left", name=session.name), "player_left",
+                                 session.name)
+
+        game = self.game
+        if game.started and session.alive:
+            was_current = session is game.current
+            self.eliminate(session)
+            if len(game.alive) <= 1 and reason != "server_shutdown":
+                self.finish_game()
+            elif was_current:
+                self.logger.info("Текущий игрок %s отключился. Передача хода.", session.name)
+                self.pass_turn(notify=True)
+
+        elif len(self.players) < 2 and game.started and reason != "server_shutdown":
+            self.broadcast("not_enough_players")
+            self.reset_game()
+
+    def detach_player(self, session):
+        # Связь с игроком оборвалась, но место и ход за ним сохраняются до возврата или истечения ожидания
+        if session not in self.players:
             return
+        self.logger.info("Игрок %s потерял связь, место держится %s с.", session.name, self.server.resume_grace)
+        self.broadcast("player_disconnected", name=session.name, seconds=int(self.server.resume_grace))
 
-        target_socket = self.name_to_socket.get(target_name.lower())
+    @batched
+    def resume_player(self, session):
+        # Снимок партии вернувшемуся игроку: все, что ему отправляли в отсутствие, выброшено
+        if session not in self.players:
+            return
+        self.broadcast("player_resumed", name=session.name)
+        self.send_roster(session)
+        game = self.game
+        if game.started and session.alive:
+            self.send_event(session, "bullets", game.live_bullets, game.blank_bullets, len(game.chamber))
+            if session is game.current:
+                self.send_event(session, "your_turn")
+
+    def abort_game(self):
+        if self.game.started:
+            self.logger.info("Игра прервана из-за остановки сервера.")
+            self.reset_game_state()
 
-        if target_socket:
-            if target_socket in self.players_alive:
-                self.process_shot(shooter_socket, target=target_socket)
+    @batched
+    def handle_command(self, session, data, received=None):
+        # received - perf_counter() в момент получения: задержка считается вместе с ожиданием во входящих
+        kind = command_kind(data)
+        metrics = self.server.metrics
+        metrics.commands.labels(kind).inc()
+        try:
+            self._run_command(session, data)
+        finally:
+            if received is not None:
+                metrics.command_seconds.labels(kind).observe(time.perf_counter() - received)
+
+    def _run_command(self, session, data):
+        # Обработка одной команды игрока; не зависит от того, как получены данные
+        game = self.game
+        if not game.started:
+            self.send(session, "waiting_for_players")
+            return
+
+        if not session.alive:
+            self.send(session, "you_are_out")
+            return
+
+        if game.current is None:
+            self.send(session, "turn_lookup_failed")
+            self.logger.error("Идет игра, но ход никому не назначен (команда от %s).", session.name)
+            return
+
+        if data == "инфо":
+            self.send_bullet_info(session)
+        elif data == "игроки":
+            self.send_player_list(session)
+        elif game.current is session:
+            if data == "я":
+                self.process_shot(session, session)
+            elif data.startswith("игрок "):
+                self.process_player_target(session, data[len("игрок "):].strip())
             else:
-                target_real_name = self.player_names.get(target_socket, target_name)
-                shooter_socket.send(f"Игрок {target_real_name} уже выбыл!".encode())
+                self.send(session, "turn_usage")
         else:
-            shooter_socket.send(
-                "Игрок с таким именем не найден или не в игре. Используйте 'игроки' чтобы увидеть список.".encode())
-
-    def send_player_list(self, client_socket):
-        alive_players_info = []
-        current_name_for_list = ""
-
-        if self.game_started and self.clients and self.players_alive:
-            if 0 <= self.current_player < len(self.clients):
-                current_socket_for_list = self.clients[self.current_player]
-                if current_socket_for_list in self.players_alive:
-                    current_name_for_list = self.player_names.get(current_socket_for_list, "??")
-
-        for p_socket in self.players_alive:
-            name = self.player_names.get(p_socket, "Неизвестный")
-            is_current_marker = " (ходит)" if name == current_name_for_list and name != "??" else ""
-            alive_players_info.append(f"- {name}{is_current_marker}")
-
-        if alive_players_info:
-            message = "Живые игроки:\n" + "\n".join(alive_players_info)
+            self.send(session, "not_your_turn", name=game.current.name)
+
+    def process_player_target(self, shooter, target_name):
+        if not target_name:
+            self.send(shooter, "target_missing")
+            return
+
+        target = self.by_name.get(target_name.casefold())
+        if target is None:
+            self.send(shooter, "target_not_found")
+        elif target is shooter or target.alive:
+            self.process_shot(shooter, target)
         else:
-            message = "Нет живых игроков."
-
-        is_requester_turn = False
-        if self.game_started and self.clients and 0 <= self.current_player < len(self.clients):
-            is_requester_turn = (client_socket == self.clients[self.current_player])
-
-        if is_requester_turn:
-            targets = [self.player_names.get(p) for p in self.players_alive if
-                       p != client_socket and p in self.player_names]
-            targets = [name for name in targets if name]
-            if targets:
-                message += "\n\nДоступные цели для 'игрок [имя]':\n" + "\n".join([f"- {name}" for name in targets])
-            elif len(self.players_alive) > 1:
-                message += "\n\nНе удалось определить доступные цели."
-            else:
-                message += "\n\nНет других игроков для выбора!"
+            self.send(shooter, "target_already_out", name=target.name)
+
+    @timed("send_player_list")
+    def send_player_list(self, session):
+        # Два варианта ответа на версию партии: ходящему - с целями, остальным - без
+        game = self.game
+        variant = "players_shooter" if session is game.current else "players"
+        data = self.cached_response(variant, session.codec)
+        if data is None:
+            names = []
+            current_index = None
+            for player in game.alive:
+                if player is game.current:
+                    current_index = len(names)
+                names.append(player.name)
+
+            targets = None  # Цели показываем только тому, кто сейчас ходит
+            if session is game.current:
+                targets = [player.name for player in game.alive if player is not session]
+            data = self.cache_response(variant, session.codec, session.codec.players(names, current_index, targets))
         try:
-            client_socket.send(message.encode())
+            self._deliver(session, data, "players")
         except Exception as e:
-            self.log("log", f"Ошибка отправки списка игроков клиенту: {e}")
+            self.logger.error("Ошибка отправки списка игроков клиенту: %s", e)
 
+    def send_roster(self, session):
+        # Снимок стола для клиента с типизированными событиями; дальше он ведет его сам по изменениям
+        game = self.game
+        alive = [player.name for player in game.alive] if game.started else []
+        current = game.current.name if game.started and game.current is not None else None
+        self.send_event(session, "roster", session.name, [player.name for player in self.players], alive, current)
+
+    @batched
     def start_game(self):
-        if len(self.clients) < 2:
-            self.broadcast("Нужно минимум 2 игрока для старта.")
-            self.game_started = False
-            self.update_status()
+        game = self.game
+        if len(self.players) < 2:
+            self.broadcast("need_two_players")
+            game.started = False
             return
 
-        self.game_started = True
-        self.players_alive = self.clients.copy()
+        game.started = True
+        game.alive = TurnRing(self.players)
+        self.server.count_games(1, len(game.alive))
+        for player in self.players:
+            player.alive = True
         self.load_chamber()
-        self.current_player = random.randrange(len(self.clients))
-
-        self.broadcast("\n=== ИГРА НАЧИНАЕТСЯ ===")
-        self.broadcast(f"Патроны в барабане: {self.live_bullets} боевых и {self.blank_bullets} холостых")
-        self.broadcast(
-            "Правила:\n"
-            "'я' - выстрелить в себя\n"
-            "'игрок [имя]' - выстрелить в другого игрока\n"
-            "'инфо' - информация о патронах\n"
-            "'игроки' - список живых игроков")
+        game.current = random.choice(list(self.players))
+        self.state_changed()
+
+        self.broadcast_event(self.server.catalog.text("game_start"), "game_start",
+                             [player.name for player in game.alive])
+        self.broadcast("chamber_loaded", live=game.live_bullets, blank=game.blank_bullets)
+        self.broadcast("rules")
         self.notify_turn()
 
     def load_chamber(self):
-        self.live_bullets = random.randint(1, 3)
-        self.blank_bullets = self.bullets - self.live_bullets
-        bullets_list = [True] * self.live_bullets + [False] * self.blank_bullets
+        game = self.game
+        game.live_bullets = random.randint(1, 3)
+        game.blank_bullets = self.bullets - game.live_bullets
+        bullets_list = [True] * game.live_bullets + [False] * game.blank_bullets
         random.shuffle(bullets_list)
-        self.chamber = bullets_list
-        self.log("log",
-                 f"Барабан заряжен: {self.live_bullets} боевых, {self.blank_bullets} холостых. Порядок: {''.join(['Б' if b else 'Х' for b in self.chamber])}")
-        self.update_status()
-
-    def process_shot(self, shooter_socket, target):
-        if not self.chamber:
-            self.broadcast("Ошибка: Барабан пуст! Перезарядка...")
+        game.chamber = bullets_list
+        self.state_changed()
+        self.logger.info("Барабан заряжен: %d боевых, %d холостых.", game.live_bullets, game.blank_bullets)
+        if self.logger.is_enabled(DEBUG):  # Порядок патронов собираем, только если его кто-то прочтет
+            self.logger.debug("Порядок патронов: %s", "".join("Б" if b else "Х" for b in game.chamber))
+
+    @timed("process_shot")
+    def process_shot(self, shooter, target):
+        game = self.game
+        if not game.chamber:
+            self.broadcast("chamber_empty_error")
             self.load_chamber()
-            if not self.chamber:
-                self.broadcast("Критическая ошибка: не удалось зарядить барабан.")
+            if not game.chamber:
+                self.broadcast("chamber_load_failed")
                 self.reset_game()
                 return
             self.notify_turn()
             return
 
-        shooter_name = self.player_names.get(shooter_socket, "Неизвестный")
-        is_self_shot = (target == "self" or target == shooter_socket)
-
-        target_socket = shooter_socket if is_self_shot else target
-        target_name = self.player_names.get(target_socket, "Неизвестный (цель)")
-        action_verb = "стреляет в себя" if is_self_shot else f"стреляет в {target_name}"
+        is_self_shot = target is shooter
+        shot_target_name = "" if is_self_shot else target.name  # Пустая цель - выстрел в себя
 
-        current_bullet = self.chamber.pop(0)
-        shot_type = "БОЕВОЙ" if current_bullet else "ХОЛОСТОЙ"
-        self.broadcast(f"\n{shooter_name} {action_verb}... {shot_type}!")
-
-        turn_passed_or_extra = False
+        current_bullet = game.chamber.pop(0)
+        self.state_changed()
+        shooter.shots += 1
+        self.server.metrics.shots.labels("live" if current_bullet else "blank").inc()
+        self.broadcast_event(render_shot(shooter.name, shot_target_name, current_bullet, self.server.catalog),
+                             "shot", shooter.name, shot_target_name, current_bullet)
 
         if current_bullet:
-            self.live_bullets -= 1
-            if target_socket in self.players_alive:
-                self.players_alive.remove(target_socket)
-                self.broadcast(f"{target_name} выбывает из игры!")
-                self.pass_turn(notify=False)
-                turn_passed_or_extra = True
+            game.live_bullets -= 1
+            shooter.hits += 1
+            if target.alive:
+                self.eliminate(target)
+                self.server.metrics.eliminations.inc()
+                self.broadcast_event(self.server.catalog.text("eliminated", name=target.name), "eliminated",
+                                     target.name)
             else:
-                self.broadcast(f"Хм, {target_name} уже был вне игры...")
-                self.pass_turn(notify=False)
-                turn_passed_or_extra = True
+                self.broadcast("already_out", name=target.name)
+            self.pass_turn(notify=False)
         else:
-            self.blank_bullets -= 1
-            self.broadcast(f"{shooter_name} в безопасности (пока что).")
+            game.blank_bullets -= 1
+            self.broadcast("safe", name=shooter.name)
             if is_self_shot:
-                self.broadcast(f"{shooter_name} получает дополнительный ход!")
-                turn_passed_or_extra = True
+                self.broadcast("extra_turn", name=shooter.name)
             else:
                 self.pass_turn(notify=False)
-                turn_passed_or_extra = True
-
-        self.update_status()
 
-        if len(self.players_alive) <= 1:
-            winner_name = "Никто не"
-            if len(self.players_alive) == 1:
-                winner_name = self.player_names.get(self.players_alive[0], "Неизвестный")
-            self.broadcast(f"\n=== ИГРА ОКОНЧЕНА ===\n{winner_name} побеждает!")
-            self.reset_game()
+        if len(game.alive) <= 1:
+            self.finish_game()
             return
 
-        if not self.chamber:
-            self.broadcast("\nБарабан пуст! Производится перезарядка...")
+        if not game.chamber:
+            self.broadcast("reloading")
             self.load_chamber()
-            self.broadcast(f"Новые патроны: {self.live_bullets} боевых и {self.blank_bullets} холостых")
-            self.notify_turn()
-            return
+            self.broadcast("new_bullets", live=game.live_bullets, blank=game.blank_bullets)
 
-        if turn_passed_or_extra:
-            self.notify_turn()
+        self.notify_turn()
 
+    def finish_game(self):
+        winner = self.game.alive.first()
+        if winner is not None:
+            winner.wins += 1
+        self.server.metrics.games_finished.inc()
+        winner_name = winner.name if winner is not None else ""
+        self.broadcast_event(render_game_over(winner_name, self.server.catalog), "game_over", winner_name)
+        self.reset_game()
+
+    def eliminate(self, session):
+        # Убрать игрока из круга; если ходил он, ход переходит к соседу слева,
+        # и следующий pass_turn отдаст его тому, кто сидел после выбывшего
+        game = self.game
+        session.alive = False
+        previous = game.alive.remove(session)
+        self.server.count_games(0, -1)
+        if session is game.current:
+            game.current = previous
+        self.state_changed()
+
+    @timed("pass_turn")
     def pass_turn(self, notify=True):
-        if not self.players_alive:
-            self.log("log", "pass_turn: нет живых игроков.")
-            if self.game_started:
-                self.broadcast("\n=== ИГРА ОКОНЧЕНА ===\nНе осталось живых игроков.")
+        game = self.game
+        if not game.alive:
+            self.logger.warning("pass_turn: нет живых игроков.")
+            if game.started:
+                self.broadcast_event(render_game_over("", self.server.catalog), "game_over", "")
                 self.reset_game()
             return
 
-        if not self.clients:
-            self.log("log", "pass_turn: нет подключенных клиентов.")
-            if self.game_started: self.reset_game()
-            return
-
-        num_total_clients = len(self.clients)
-        if num_total_clients == 0:
-            if self.game_started: self.reset_game()
-            return
-
-        start_search_idx = (self.current_player + 1) % num_total_clients
-
-        for i in range(num_total_clients):
-            check_idx = (start_search_idx + i) % num_total_clients
-            potential_next_socket = self.clients[check_idx]
-            if potential_next_socket in self.players_alive:
-                self.current_player = check_idx
-                if notify:
-                    self.notify_turn()
-                return
-
-        self.log("log", "Ошибка в pass_turn: не удалось найти следующего живого игрока обычным способом.")
-        if self.players_alive:
-            first_alive_socket = self.players_alive[0]
-            try:
-                self.current_player = self.clients.index(first_alive_socket)
-                self.log("log",
-                         f"Аварийное переключение хода на первого живого из списка players_alive: {self.player_names.get(first_alive_socket, '?')}")
-                if notify: self.notify_turn()
-            except ValueError:
-                self.log("log", "Критическая ошибка: Первый живой игрок из players_alive не найден в self.clients.")
-                self.reset_game()
-        else:
-            if self.game_started: self.reset_game()
+        if game.current is not None and game.current.alive:
+            game.current = game.alive.after(game.current)
+        else:  # Ход еще никому не назначен - начинаем с первого места
+            game.current = game.alive.first()
+        self.state_changed()
+        if notify:
+            self.notify_turn()
 
-    def send_bullet_info(self, client_socket):
-        if self.game_started:
-            message = f"Патроны: {self.live_bullets} боев., {self.blank_bullets} хол. (Всего в барабане: {len(self.chamber)})".encode()
-            try:
-                client_socket.send(message)
-            except Exception as e:
-                self.log("log", f"Ошибка отправки инфо о патронах: {e}")
-        else:
-            try:
-                client_socket.send("Игра еще не началась.".encode())
-            except Exception as e:
-                self.log("log", f"Ошибка отправки 'игра не началась': {e}")
+    def send_bullet_info(self, session):
+        game = self.game
+        try:
+            if game.started:
+                data = self.cached_response("bullets", session.codec)
+                if data is None:
+                    data = self.cache_response("bullets", session.codec, session.codec.bullets(
+                        game.live_bullets, game.blank_bullets, len(game.chamber)))
+                self._deliver(session, data, "bullets")
+            else:
+                self.send(session, "game_not_started")
+        except Exception as e:
+            self.logger.error("Ошибка отправки инфо о патронах: %s", e)
 
+    @timed("notify_turn")
     def notify_turn(self):
-        if not self.game_started or not self.players_alive or not self.clients:
-            self.update_status()
+        game = self.game
+        if not game.started or not game.alive:
             return
 
-        if not (0 <= self.current_player < len(self.clients)):
-            self.log("log",
-                     f"Ошибка notify_turn: неверный индекс current_player ({self.current_player}). Клиентов: {len(self.clients)}. Попытка передать ход.")
-            if self.players_alive:
-                self.pass_turn(notify=True)
-            else:
-                self.reset_game()
-            return
-
-        current_player_socket = self.clients[self.current_player]
-
-        if current_player_socket not in self.players_alive:
-            self.log("log",
-                     f"notify_turn: Игрок {self.player_names.get(current_player_socket, '??')} (индекс {self.current_player}) не найден в списке живых. Передаем ход.")
+        current = game.current
+        if current is None or not current.alive:
+            self.logger.warning("notify_turn: ходящий игрок не найден среди живых. Передаем ход.")
             self.pass_turn(notify=True)
             return
 
-        current_name = self.player_names.get(current_player_socket)
-        if current_name:
-            self.broadcast(f"\nХод игрока {current_name}")
-            try:
-                current_player_socket.send("Ваш ход! (я / игрок [имя] / инфо / игроки): ".encode())
-            except Exception as e:
-                self.log("log", f"Не удалось уведомить {current_name} о его ходе (возможно, отключился): {e}")
+        self.broadcast_event(render_turn(current.name, self.server.catalog), "turn", current.name)
+        try:
+            self.send_event(current, "your_turn")
+        except Exception as e:
+            self.logger.warning("Не удалось уведомить %s о его ходе (возможно, отключился): %s", current.name, e)
+        self.start_turn_timer(current)
+
+    def start_turn_timer(self, session):
+        # Дедлайн хода; таймер только кладет turn_expired во входящие комнаты
+        self.cancel_turn_timer()
+        timeout = self.server.turn_timeout
+        if timeout > 0:
+            self.turn_timer = self.server.timers.call_later(timeout, self.post, self.turn_expired, session,
+                                                            self.turn_serial)
+
+    def cancel_turn_timer(self):
+        self.turn_serial += 1
+        if self.turn_timer is not None:
+            self.turn_timer.cancel()
+            self.turn_timer = None
+
+    @batched
+    def turn_expired(self, session, serial):
+        game = self.game
+        if serial != self.turn_serial or not game.started or game.current is not session or not session.alive:
+            return  # Ход уже сделан или партия сменилась, пока действие ждало во входящих
+        self.turn_timer = None
+        self.server.metrics.turn_timeouts.inc()
+        self.logger.info("Игрок %s не сходил за %s с.", session.name, self.server.turn_timeout)
+        if self.server.turn_timeout_action == TURN_TIMEOUT_SHOOT:
+            self.broadcast("turn_timeout_shoot", name=session.name)
+            self.process_shot(session, session)
         else:
-            self.log("log",
-                     f"Ошибка notify_turn: Не удалось найти имя для сокета игрока с индексом {self.current_player}. Передача хода.")
+            self.broadcast("turn_timeout_pass", name=session.name)
             self.pass_turn(notify=True)
 
-        self.update_status()
+    def send_ping(self, session):
+        if session in self.players:
+            self.send_event(session, "ping")
 
     def reset_game_state(self):
-        self.chamber = []
-        self.current_player = 0
-        self.game_started = False
-        self.players_alive = []
-        self.live_bullets = 0
-        self.blank_bullets = 0
+        self.cancel_turn_timer()
+        if self.game.started:
+            self.server.count_games(-1, -len(self.game.alive))
+        for player in self.game.alive:
+            player.alive = False
+        self.game = GameState(self.game.version + 1)
 
     def reset_game(self):
-        if self.game_started:
-            self.log("log", "Игра сбрасывается.")
+        if self.game.started:
+            self.logger.info("Игра сбрасывается.")
 
         self.reset_game_state()
-        self.update_status()
 
-        if len(self.clients) >= 2:
-            self.log("log", "Достаточно игроков для новой игры. Запуск...")
+        if len(self.players) >= 2:
+            self.logger.info("Достаточно игроков для новой игры. Запуск...")
             self.start_game()
         else:
-            self.broadcast("\nОжидание новых игроков или начала новой игры... (нужно минимум 2)")
-            self.update_status()
+            self.broadcast("waiting_new_game")
 
-    def broadcast(self, message):
-        self.log("broadcast", message)
-        message_encoded = f"{message}\n".encode()
+    @contextlib.contextmanager
+    def batch(self):
+        """Собирает все сообщения одного игрового события и отправляет их в конце.
 
-        for client_socket in list(self.clients):
+        Выстрел рассылает до пяти сообщений (результат, выбывание, перезарядка,
+        новые патроны, смена хода); внутри batch() каждый клиент получает их
+        одним буфером, то есть одним системным вызовом вместо пяти.
+        """
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self._flush_batch()
+
+    @timed("send")
+    def _flush_batch(self):
+        pending, self.pending = self.pending, {}
+        for session, parts in pending.items():
             try:
-                client_socket.send(message_encoded)
+                if len(parts) == 1:
+                    self._send_now(session.socket, *parts[0])
+                else:
+                    session.socket.send(b"".join(data for data, _ in parts))
+            except QueueClosedError:
+                pass  # Клиент уже закрыт, его удаление ждет во входящих комнаты
             except Exception as e:
-                client_name = self.player_names.get(client_socket, 'Неизвестный')
-                self.log("log",
-                         f"Ошибка отправки broadcast сообщения игроку {client_name} (возможно, отключается): {e}.")
-
+                self.logger.warning("Ошибка отправки сообщений игроку %s (возможно, отключается): %s.",
+                                    session.name, e)
 
-# --- Класс GUI ---
-class RussianRouletteServerGUI(ctk.CTk):
-    def __init__(self, host='localhost', port=12345):
-        super().__init__()
+    def _deliver(self, session, data, key=None):
+        if self.batch_depth:
+            self.pending.setdefault(session, []).append((data, key))
+        else:
+            self._send_now(session.socket, data, key)
 
-        self.title("Сервер Русской Рулетки")
-        self.geometry("750x600")
-        ctk.set_appearance_mode("Light")
-        ctk.set_default_color_theme("blue")
+    def _send_now(self, client_socket, data, key):
+        if key is not None:
+            client_socket.send(data, key=key)
+        else:
+            client_socket.send(data)
+
+    def send(self, session, key, **fields):
+        # key - ключ сообщения в каталоге (messages.py), fields - значения для шаблона
+        self._deliver(session, session.codec.message(key, **fields))
+
+    def send_event(self, session, event, *fields):
+        # event - имя метода кодека: "shot", "turn", "your_turn", "players", "bullets",
+        # "game_start", "eliminated", "game_over", "player_joined", "player_left", "roster", "session_token", "ping"
+        data = getattr(session.codec, event)(*fields)
+        self._deliver(session, data, event if event in COALESCE_EVENTS else None)
+
+    def broadcast(self, key, **fields):
+        self._broadcast(self.server.catalog.text(key, **fields), lambda codec: codec.message_line(key, **fields))
+
+    def broadcast_event(self, message, event, *fields):
+        # message - текст для лога сервера; клиенты получают событие в формате своего протокола
+        self._broadcast(message, lambda codec: getattr(codec, event)(*fields))
+
+    @timed("broadcast")
+    def _broadcast(self, message, encode):
+        self.server.log("broadcast", message)
+        started = time.perf_counter()
+        encoded = {}  # Кодируем сообщение один раз на каждый протокол, а не на каждого клиента
+
+        for session in list(self.players):
+            message_encoded = encoded.get(session.codec)
+            if message_encoded is None:
+                message_encoded = encoded[session.codec] = encode(session.codec)
+            try:
+                self._deliver(session, message_encoded)
+            except Exception as e:
+                self.logger.warning("Ошибка отправки broadcast сообщения игроку %s (возможно, отключается): %s.",
+                                    session.name, e)
+        # Внутри batch() сюда входит только кодирование и раскладка по буферам, запись в сокеты - при сбросе
+        self.server.metrics.broadcast_seconds.observe(time.perf_counter() - started)
 
-        self.server_running = False
-        self.server_thread = None
-        self.gui_queue = queue.Queue()
-        self.server_instance = None
 
-        self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(2, weight=1)
+ENGINES = ("threading", "asyncio")
 
-        self.settings_frame = ctk.CTkFrame(self, fg_color="transparent")
-        self.settings_frame.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
 
-        self.ip_label = ctk.CTkLabel(self.settings_frame, text="IP Адрес:")
-        self.ip_label.grid(row=0, column=0, padx=(5, 2), pady=5, sticky="w")
-        self.ip_entry = ctk.CTkEntry(self.settings_frame, placeholder_text="localhost или 0.0.0.0")
-        self.ip_entry.grid(row=0, column=1, padx=(0, 10), pady=5, sticky="ew")
-        self.ip_entry.insert(0, host)
+def create_server(engine="threading", **kwargs):
+    # "threading" - поток на клиента, "asyncio" - все клиенты в одном цикле событий
+    if engine == "asyncio":
+        from async_server import AsyncRussianRouletteServer  # Импорт здесь, чтобы избежать цикла импортов
+        return AsyncRussianRouletteServer(**kwargs)
+    if engine == "threading":
+        return RussianRouletteServer(**kwargs)
+    raise ValueError(f"Неизвестный движок сервера: {engine}")
 
-        self.port_label = ctk.CTkLabel(self.settings_frame, text="Порт:")
-        self.port_label.grid(row=0, column=2, padx=(10, 2), pady=5, sticky="w")
-        self.port_entry = ctk.CTkEntry(self.settings_frame, width=70)
-        self.port_entry.grid(row=0, column=3, padx=(0, 10), pady=5, sticky="w")
-        self.port_entry.insert(0, str(port))
 
-        self.settings_frame.grid_columnconfigure(1, weight=1)
+def __getattr__(name):
+    # Окно подгружается только по требованию, чтобы сервер без GUI не импортировал Tk
+    if name == "RussianRouletteServerGUI":
+        from server_gui import RussianRouletteServerGUI
+        return RussianRouletteServerGUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        self.control_frame = ctk.CTkFrame(self, fg_color="transparent")
-        self.control_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
-        self.control_frame.grid_columnconfigure(3, weight=1)
 
-        self.start_button = ctk.CTkButton(self.control_frame, text="Запустить Сервер", command=self.start_server_thread)
-        self.start_button.grid(row=0, column=0, padx=5, pady=5)
+# --- Запуск без окна ---
 
-        self.stop_button = ctk.CTkButton(self.control_frame, text="Остановить Сервер", command=self.stop_server_thread,
-                                         state="disabled")
-        self.stop_button.grid(row=0, column=1, padx=5, pady=5)
+def format_status(status):
+    return (f"Подкл: {status.get('connected', 0)} | Комнат: {status.get('rooms', 0)} | "
+            f"Игр: {status.get('games_running', 0)} | Живых: {status.get('alive', 0)} | "
+            f"В очередях: {status.get('send_queue_messages', 0)} сообщ. "
+            f"(макс. {status.get('send_queue_max_bytes', 0)} Б)")
 
-        self.status_label = ctk.CTkLabel(self.control_frame, text="Статус: Остановлен", text_color="red", anchor="w")
-        self.status_label.grid(row=0, column=2, padx=(20, 5), pady=5, sticky="w")
 
-        self.info_label = ctk.CTkLabel(self.control_frame, text="", anchor="w")
-        self.info_label.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+def run_headless(server, stats_interval=STATS_INTERVAL):
+    """Запускает сервер в фоновом потоке и печатает его журнал, пока он не остановится.
 
-        self.log_textbox = ctk.CTkTextbox(self, wrap="word", state="disabled")
-        self.log_textbox.grid(row=2, column=0, padx=10, pady=(5, 10), sticky="nsew")
+    Сервер должен быть создан с gui_queue (EventQueue): вместо окна события разбирает этот цикл.
+    Файл журнала пишет LogWriter, переданный серверу в log_sinks.
+    """
+    def emit(line):
+        print(f"[{time.strftime('%H:%M:%S')}] {line}", flush=True)
 
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.check_queue()
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
 
-    def log_message(self, message):
+    next_report = time.monotonic() + stats_interval
+    stopped = False
+    while not stopped:
         try:
-            self.log_textbox.configure(state="normal")
-            timestamp = time.strftime("%H:%M:%S")
-            self.log_textbox.insert("end", f"[{timestamp}] {message}\n")
-            self.log_textbox.configure(state="disabled")
-            self.log_textbox.see("end")
-        except Exception as e:
-            print(f"Ошибка при логировании в GUI: {e}")
-
-    def update_status_display(self, status_data):
-        connected = status_data.get("connected", 0)
-        alive = status_data.get("alive", 0)
-        live = status_data.get("live_bullets", 0)
-        blank = status_data.get("blank_bullets", 0)
-        turn = status_data.get("turn", "N/A")
-        game_running = status_data.get("game_running", False)
-
-        game_state_str = "В игре" if game_running else "Ожидание"
-        turn_str = turn
-        if game_running and turn == "N/A" and alive > 0:
-            turn_str = "Передача хода..."
-        elif not game_running and alive == 0 and connected > 0:
-            pass
-
-        info_text = f"Подкл: {connected} | Живых: {alive} | {game_state_str} | Патроны: {live}б/{blank}х | Ход: {turn_str}"
-        self.info_label.configure(text=info_text)
-
-    def check_queue(self):
-        try:
-            while True:
-                message_type, data = self.gui_queue.get_nowait()
-
-                if message_type == "log":
-                    self.log_message(f"[Сервер] {data}")
-                elif message_type == "broadcast":
-                    self.log_message(f"[Всем] {data.strip()}")
-                elif message_type == "status_update":
-                    self.update_status_display(data)
-                elif message_type == "server_stopped":
-                    self.server_stopped_actions()
+            message_type, data = server.gui_queue.get(timeout=0.5)
+            if message_type == "log":
+                emit(f"[Сервер] {data}")
+            elif message_type == "broadcast":
+                emit(f"[Всем] {data.strip()}")
+            elif message_type == "server_stopped":
+                stopped = True
         except queue.Empty:
             pass
-        except Exception as e:
-            self.log_message(f"[GUI Ошибка] Ошибка обработки очереди: {e}")
-        self.after(100, self.check_queue)
-
-    def start_server_thread(self):
-        if self.server_running:
-            self.log_message("Сервер уже запущен.")
-            return
-
-        host = self.ip_entry.get().strip()
-        port_str = self.port_entry.get().strip()
-
+        except KeyboardInterrupt:
+            emit("[Сервер] Ctrl+C: остановка сервера...")
+            server.stop()
+
+        if time.monotonic() >= next_report or stopped:
+            dropped = getattr(server.gui_queue, "dropped", 0)
+            emit(f"[Сводка] {format_status(server.status())}" + (f" | Пропущено строк: {dropped}" if dropped else ""))
+            next_report = time.monotonic() + stats_interval
+    server_thread.join(timeout=5.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Сервер русской рулетки. Без команды открывается окно управления, "
+                    "'serve' запускает сервер без GUI (Tk не импортируется).")
+    commands = parser.add_subparsers(dest="command")
+
+    gui_parser = commands.add_parser("gui", help="окно управления (по умолчанию)")
+    gui_parser.add_argument("--host", default="localhost")
+    gui_parser.add_argument("--port", type=int, default=12345)
+    gui_parser.add_argument("--engine", choices=ENGINES, default="threading")
+
+    serve_parser = commands.add_parser("serve", help="сервер без окна, журнал в stdout")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=12345)
+    serve_parser.add_argument("--engine", choices=ENGINES, default="threading")
+    serve_parser.add_argument("--rooms", type=int, default=MAX_ROOMS, help="максимум комнат на процесс")
+    serve_parser.add_argument("--room-size", type=int, default=MAX_PLAYERS, help="мест за одним столом")
+    serve_parser.add_argument("--workers", type=int, default=1,
+                              help="процессов на одном порту; больше 1 - запуск через launcher.py")
+    serve_parser.add_argument("--locale", choices=sorted(LOCALES), default=DEFAULT_LOCALE,
+                              help="язык сообщений игрокам")
+    serve_parser.add_argument("--log-file", help="дописывать журнал еще и в этот файл (один процесс)")
+    serve_parser.add_argument("--log-level", choices=LEVELS, default="info",
+                              help="минимальный уровень журнала; debug - подробности рукопожатия")
+    serve_parser.add_argument("--log-max-bytes", type=int, default=LOG_MAX_BYTES,
+                              help="размер файла журнала, после которого он сжимается в .gz")
+    serve_parser.add_argument("--log-backups", type=int, default=LOG_BACKUPS, help="сколько сжатых файлов хранить")
+    serve_parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL)
+    serve_parser.add_argument("--metrics-port", type=int,
+                              help="отдавать метрики Prometheus на этом порту (у воркеров - порт + номер воркера)")
+    serve_parser.add_argument("--metrics-host", default="127.0.0.1", help="адрес HTTP-слушателя метрик")
+    serve_parser.add_argument("--timings", action="store_true",
+                              help="сразу включить замеры времени; на ходу переключаются сигналом SIGUSR1")
+    serve_parser.add_argument("--send-queue-limit", type=int, default=SEND_QUEUE_LIMIT,
+                              help="байт в исходящей очереди одного клиента")
+    serve_parser.add_argument("--overflow-policy", choices=OVERFLOW_POLICIES, default=OVERFLOW_DROP,
+                              help="что делать с клиентом, чья очередь переполнена")
+    serve_parser.add_argument("--overflow-timeout", type=float, default=OVERFLOW_TIMEOUT,
+                              help="сколько секунд ждать освобождения очереди при политике block")
+    serve_parser.add_argument("--resume-grace", type=float, default=RESUME_GRACE,
+                              help="сколько секунд держать место игрока после обрыва связи (0 - не держать)")
+    serve_parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT,
+                              help="секунд на ход (0 - без ограничения)")
+    serve_parser.add_argument("--turn-timeout-action", choices=TURN_TIMEOUT_ACTIONS, default=TURN_TIMEOUT_PASS,
+                              help="что делать с ходом, не сделанным вовремя: пропустить или выстрелить в себя")
+    serve_parser.add_argument("--handshake-timeout", type=float, default=HANDSHAKE_TIMEOUT,
+                              help="сколько секунд ждать имя от нового подключения (0 - без ограничения)")
+    serve_parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                              help="после скольких секунд тишины проверять связь с клиентом (0 - не проверять)")
+    args = parser.parse_args(argv)
+
+    if args.command != "serve":
+        from server_gui import RussianRouletteServerGUI
+        app = RussianRouletteServerGUI(host=getattr(args, "host", "localhost"), port=getattr(args, "port", 12345),
+                                       engine=getattr(args, "engine", "threading"))
+        app.mainloop()
+        return
+
+    options = dict(send_queue_limit=args.send_queue_limit, overflow_policy=args.overflow_policy,
+                   overflow_timeout=args.overflow_timeout, locale=args.locale, log_level=LEVELS[args.log_level],
+                   metrics_host=args.metrics_host, metrics_port=args.metrics_port,
+                   timings=args.timings, resume_grace=args.resume_grace, turn_timeout=args.turn_timeout,
+                   turn_timeout_action=args.turn_timeout_action, handshake_timeout=args.handshake_timeout,
+                   keepalive=args.keepalive)
+    if args.workers > 1:
+        from launcher import WorkerSupervisor
+        supervisor = WorkerSupervisor(host=args.host, port=args.port, workers=args.workers, engine=args.engine,
+                                      room_size=args.room_size, max_rooms=args.rooms,
+                                      stats_interval=args.stats_interval, **options)
+        signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: supervisor.toggle_timings())
         try:
-            port = int(port_str)
-            if not (1 <= port <= 65535):
-                tkinter.messagebox.showerror("Ошибка Ввода",
-                                             f"Неверный порт: {port}.\nПорт должен быть числом от 1 до 65535.")
-                return
-        except ValueError:
-            tkinter.messagebox.showerror("Ошибка Ввода",
-                                         f"Неверный формат порта: '{port_str}'.\nВведите число от 1 до 65535.")
-            return
-
-        if not host:
-            host = 'localhost'
-            self.ip_entry.delete(0, "end")
-            self.ip_entry.insert(0, host)
-            self.log_message("IP адрес не указан, используется 'localhost'.")
-
-        self.log_message(f"Запуск сервера на {host}:{port}...")
-        self.server_instance = RussianRouletteServer(host=host, port=port, gui_queue=self.gui_queue)
-        self.server_thread = threading.Thread(target=self.server_instance.start, daemon=True)
-        self.server_thread.start()
-
-        self.server_running = True
-        self.start_button.configure(state="disabled")
-        self.stop_button.configure(state="normal")
-        self.ip_entry.configure(state="disabled")
-        self.port_entry.configure(state="disabled")
-        self.status_label.configure(text="Статус: Запущен", text_color="green")
-
-    def stop_server_thread(self):
-        if self.server_running and self.server_instance:
-            self.log_message("Остановка сервера...")
-            self.server_instance.stop()
-            self.stop_button.configure(state="disabled")
-        elif not self.server_instance:
-            self.log_message("Сервер не был инициализирован.")
-        else:
-            self.log_message("Сервер не запущен.")
-
-    def server_stopped_actions(self):
-        if not self.server_running and not (self.server_thread and self.server_thread.is_alive()):
-            self.log_message("Сервер уже был отмечен как остановленный и поток завершен.")
-            self.start_button.configure(state="normal")
-            self.stop_button.configure(state="disabled")
-            self.ip_entry.configure(state="normal")
-            self.port_entry.configure(state="normal")
-            self.status_label.configure(text="Статус: Остановлен", text_color="red")
-            return
-
-        self.log_message("Сервер подтвердил остановку.")
-        self.server_running = False
-
-        if self.server_thread and self.server_thread.is_alive():
-            self.log_message("Ожидание завершения потока сервера...")
-            self.server_thread.join(timeout=1.0)
-            if self.server_thread.is_alive():
-                self.log_message("Поток сервера не завершился вовремя.")
-            else:
-                self.log_message("Поток сервера успешно завершен.")
-
-        self.server_thread = None
-        self.server_instance = None
-
-        self.start_button.configure(state="normal")
-        self.stop_button.configure(state="disabled")
-        self.ip_entry.configure(state="normal")
-        self.port_entry.configure(state="normal")
-        self.status_label.configure(text="Статус: Остановлен", text_color="red")
-
-    def on_closing(self):
-        if self.server_running:
-            if tkinter.messagebox.askyesno("Подтверждение", "Сервер запущен. Остановить сервер и закрыть окно?"):
-                self.log_message("Закрытие окна: Инициирована остановка сервера...")
-                self.stop_server_thread()
-                self.after(1500, self.destroy_window_force)
-            else:
-                return
-        else:
-            self.destroy()
-
-    def destroy_window_force(self):
-        if self.server_thread and self.server_thread.is_alive():
-            self.log_message("Принудительное закрытие окна, сервер мог не успеть полностью остановиться.")
-        self.destroy()
+            supervisor.start()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    log_writer = None
+    if args.log_file:
+        log_writer = LogWriter(args.log_file, max_bytes=args.log_max_bytes, backups=args.log_backups)
+    server = create_server(args.engine, host=args.host, port=args.port, gui_queue=EventQueue(),
+                           room_size=args.room_size, max_rooms=args.rooms,
+                           log_sinks=[log_writer] if log_writer else (), **options)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: server.timings.toggle())
+    try:
+        run_headless(server, stats_interval=args.stats_interval)
+    finally:
+        if log_writer:
+            log_writer.close()
 
 
 if __name__ == "__main__":
-    DEFAULT_HOST = 'localhost'
-    DEFAULT_PORT = 12345
-    app = RussianRouletteServerGUI(host=DEFAULT_HOST, port=DEFAULT_PORT)
-    app.mainloop()
\ No newline at end of file
+    main()
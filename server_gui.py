@@ -0,0 +1,256 @@
+"""Окно управления сервером (customtkinter).
+
+Отдельный модуль, чтобы сервер без окна (python server.py serve) не
+импортировал Tk: GUI подгружается, только когда его действительно запускают.
+"""
+import threading
+import time
+import tkinter.messagebox  # Для всплывающих окон с ошибками
+
+import customtkinter as ctk
+
+from event_queue import EventQueue
+from log_view import LogView
+from server import create_server, ENGINES
+
+GUI_POLL_MS = 100  # Как часто окно забирает события сервера
+STATUS_POLL_MS = 500  # Как часто окно запрашивает у сервера снимок статуса
+GUI_EVENTS_PER_TICK = 200  # Больше строк журнала за один тик не выводим - остальные ждут следующего
+
+
+# --- Класс GUI ---
+class RussianRouletteServerGUI(ctk.CTk):
+    def __init__(self, host='localhost', port=12345, engine="threading"):
+        super().__init__()
+
+        self.title("Сервер Русской Рулетки")
+        self.geometry("750x600")
+        ctk.set_appearance_mode("Light")
+        ctk.set_default_color_theme("blue")
+
+        self.server_running = False
+        self.server_thread = None
+        self.gui_queue = EventQueue()  # Ограниченная: при переполнении теряются строки журнала, а не ход сервера
+        self.reported_dropped = 0
+        self.next_status = 0.0  # Когда в следующий раз запросить снимок статуса (time.monotonic())
+        self.server_instance = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+
+        self.settings_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.settings_frame.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+
+        self.ip_label = ctk.CTkLabel(self.settings_frame, text="IP Адрес:")
+        self.ip_label.grid(row=0, column=0, padx=(5, 2), pady=5, sticky="w")
+        self.ip_entry = ctk.CTkEntry(self.settings_frame, placeholder_text="localhost или 0.0.0.0")
+        self.ip_entry.grid(row=0, column=1, padx=(0, 10), pady=5, sticky="ew")
+        self.ip_entry.insert(0, host)
+
+        self.port_label = ctk.CTkLabel(self.settings_frame, text="Порт:")
+        self.port_label.grid(row=0, column=2, padx=(10, 2), pady=5, sticky="w")
+        self.port_entry = ctk.CTkEntry(self.settings_frame, width=70)
+        self.port_entry.grid(row=0, column=3, padx=(0, 10), pady=5, sticky="w")
+        self.port_entry.insert(0, str(port))
+
+        self.engine_label = ctk.CTkLabel(self.settings_frame, text="Движок:")
+        self.engine_label.grid(row=0, column=4, padx=(10, 2), pady=5, sticky="w")
+        self.engine_var = ctk.StringVar(value=engine)
+        self.engine_menu = ctk.CTkOptionMenu(self.settings_frame, values=list(ENGINES), variable=self.engine_var,
+                                             width=110)
+        self.engine_menu.grid(row=0, column=5, padx=(0, 5), pady=5, sticky="w")
+
+        # Замеры времени в комнатах: можно включать и выключать, не останавливая сервер
+        self.timings_var = ctk.BooleanVar(value=False)
+        self.timings_switch = ctk.CTkSwitch(self.settings_frame, text="Замеры", variable=self.timings_var,
+                                            command=self.toggle_timings)
+        self.timings_switch.grid(row=0, column=6, padx=(10, 5), pady=5, sticky="w")
+
+        self.settings_frame.grid_columnconfigure(1, weight=1)
+
+        self.control_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.control_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.control_frame.grid_columnconfigure(3, weight=1)
+
+        self.start_button = ctk.CTkButton(self.control_frame, text="Запустить Сервер", command=self.start_server_thread)
+        self.start_button.grid(row=0, column=0, padx=5, pady=5)
+
+        self.stop_button = ctk.CTkButton(self.control_frame, text="Остановить Сервер", command=self.stop_server_thread,
+                                         state="disabled")
+        self.stop_button.grid(row=0, column=1, padx=5, pady=5)
+
+        self.status_label = ctk.CTkLabel(self.control_frame, text="Статус: Остановлен", text_color="red", anchor="w")
+        self.status_label.grid(row=0, column=2, padx=(20, 5), pady=5, sticky="w")
+
+        self.info_label = ctk.CTkLabel(self.control_frame, text="", anchor="w")
+        self.info_label.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+
+        self.log_textbox = ctk.CTkTextbox(self, wrap="word", state="disabled")
+        self.log_textbox.grid(row=2, column=0, padx=10, pady=(5, 10), sticky="nsew")
+        self.log_view = LogView(self.log_textbox)  # Строки выводятся пачкой раз в тик, старые обрезаются
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.check_queue()
+
+    def log_message(self, message):
+        timestamp = time.strftime("%H:%M:%S")
+        self.log_view.append(f"[{timestamp}] {message}")
+
+    def update_status_display(self, status_data):
+        connected = status_data.get("connected", 0)
+        rooms = status_data.get("rooms", 0)
+        games_running = status_data.get("games_running", 0)
+        alive = status_data.get("alive", 0)
+        game_running = status_data.get("game_running", False)
+
+        game_state_str = f"Игр: {games_running}" if game_running else "Ожидание"
+        info_text = f"Подкл: {connected} | Комнат: {rooms} | Живых: {alive} | {game_state_str}"
+        queue_max = status_data.get("send_queue_max_bytes", 0)
+        if queue_max:
+            info_text += f" | Макс. очередь: {queue_max // 1024} КБ"
+
+        if "turn" in status_data:  # Подробности есть, только когда комната одна
+            live = status_data.get("live_bullets", 0)
+            blank = status_data.get("blank_bullets", 0)
+            turn = status_data.get("turn", "N/A")
+            turn_str = turn
+            if game_running and turn == "N/A" and alive > 0:
+                turn_str = "Передача хода..."
+            info_text += f" | Патроны: {live}б/{blank}х | Ход: {turn_str}"
+
+        if self.gui_queue.dropped:
+            info_text += f" | Пропущено строк: {self.gui_queue.dropped}"
+
+        self.info_label.configure(text=info_text)
+
+    def check_queue(self):
+        try:
+            for message_type, data in self.gui_queue.drain(GUI_EVENTS_PER_TICK):
+                if message_type == "log":
+                    self.log_message(f"[Сервер] {data}")
+                elif message_type == "broadcast":
+                    self.log_message(f"[Всем] {data.strip()}")
+                elif message_type == "server_stopped":
+                    self.server_stopped_actions()
+            now = time.monotonic()
+            if self.server_instance is not None and now >= self.next_status:
+                self.update_status_display(self.server_instance.status())
+                self.next_status = now + STATUS_POLL_MS / 1000
+
+            dropped = self.gui_queue.dropped
+            if dropped != self.reported_dropped:
+                self.log_message(f"[GUI] Журнал не успевает за сервером: пропущено строк - "
+                                 f"{dropped - self.reported_dropped} (всего {dropped}).")
+                self.reported_dropped = dropped
+        except Exception as e:
+            self.log_message(f"[GUI Ошибка] Ошибка обработки очереди: {e}")
+        self.after(GUI_POLL_MS, self.check_queue)
+
+    def start_server_thread(self):
+        if self.server_running:
+            self.log_message("Сервер уже запущен.")
+            return
+
+        host = self.ip_entry.get().strip()
+        port_str = self.port_entry.get().strip()
+
+        try:
+            port = int(port_str)
+            if not (1 <= port <= 65535):
+                tkinter.messagebox.showerror("Ошибка Ввода",
+                                             f"Неверный порт: {port}.\nПорт должен быть числом от 1 до 65535.")
+                return
+        except ValueError:
+            tkinter.messagebox.showerror("Ошибка Ввода",
+                                         f"Неверный формат порта: '{port_str}'.\nВведите число от 1 до 65535.")
+            return
+
+        if not host:
+            host = 'localhost'
+            self.ip_entry.delete(0, "end")
+            self.ip_entry.insert(0, host)
+            self.log_message("IP адрес не указан, используется 'localhost'.")
+
+        engine = self.engine_var.get()
+        self.log_message(f"Запуск сервера на {host}:{port} (движок: {engine})...")
+        self.server_instance = create_server(engine, host=host, port=port, gui_queue=self.gui_queue,
+                                             timings=self.timings_var.get())
+        self.server_thread = threading.Thread(target=self.server_instance.start, daemon=True)
+        self.server_thread.start()
+
+        self.server_running = True
+        self.start_button.configure(state="disabled")
+        self.stop_button.configure(state="normal")
+        self.ip_entry.configure(state="disabled")
+        self.port_entry.configure(state="disabled")
+        self.engine_menu.configure(state="disabled")
+        self.status_label.configure(text="Статус: Запущен", text_color="green")
+
+    def toggle_timings(self):
+        if self.server_instance and self.server_running:
+            self.server_instance.timings.set_enabled(self.timings_var.get())
+
+    def stop_server_thread(self):
+        if self.server_running and self.server_instance:
+            self.log_message("Остановка сервера...")
+            self.server_instance.stop()
+            self.stop_button.configure(state="disabled")
+        elif not self.server_instance:
+            self.log_message("Сервер не был инициализирован.")
+        else:
+            self.log_message("Сервер не запущен.")
+
+    def server_stopped_actions(self):
+        if not self.server_running and not (self.server_thread and self.server_thread.is_alive()):
+            self.log_message("Сервер уже был отмечен как остановленный и поток завершен.")
+            self.start_button.configure(state="normal")
+            self.stop_button.configure(state="disabled")
+            self.ip_entry.configure(state="normal")
+            self.port_entry.configure(state="normal")
+            self.engine_menu.configure(state="normal")
+            self.status_label.configure(text="Статус: Остановлен", text_color="red")
+            return
+
+        self.log_message("Сервер подтвердил остановку.")
+        self.server_running = False
+
+        if self.server_thread and self.server_thread.is_alive():
+            self.log_message("Ожидание завершения потока сервера...")
+            self.server_thread.join(timeout=1.0)
+            if self.server_thread.is_alive():
+                self.log_message("Поток сервера не завершился вовремя.")
+            else:
+                self.log_message("Поток сервера успешно завершен.")
+
+        self.server_thread = None
+        self.server_instance = None
+
+        self.start_button.configure(state="normal")
+        self.stop_button.configure(state="disabled")
+        self.ip_entry.configure(state="normal")
+        self.port_entry.configure(state="normal")
+        self.engine_menu.configure(state="normal")
+        self.status_label.configure(text="Статус: Остановлен", text_color="red")
+
+    def on_closing(self):
+        if self.server_running:
+            if tkinter.messagebox.askyesno("Подтверждение", "Сервер запущен. Остановить сервер и закрыть окно?"):
+                self.log_message("Закрытие окна: Инициирована остановка сервера...")
+                self.stop_server_thread()
+                self.after(1500, self.destroy_window_force)
+            else:
+                return
+        else:
+            self.destroy()
+
+    def destroy_window_force(self):
+        if self.server_thread and self.server_thread.is_alive():
+            self.log_message("Принудительное закрытие окна, сервер мог не успеть полностью остановиться.")
+        self.destroy()
+
+
+if __name__ == "__main__":
+    DEFAULT_HOST = 'localhost'
+    DEFAULT_PORT = 12345
+    app = RussianRouletteServerGUI(host=DEFAULT_HOST, port=DEFAULT_PORT)
+    app.mainloop()
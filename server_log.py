@@ -0,0 +1,191 @@
+"""Журнал сервера: уровни, поля контекста, запись в файл фоновым потоком.
+
+Раньше все шло через server.log("log", f"...") одной строкой: отладочные
+сообщения рукопожатия форматировались всегда, даже когда их никто не читал.
+Теперь:
+  - Logger.debug/info/warning/error принимают шаблон и аргументы в стиле %,
+    строка собирается, только если уровень включен и запись кому-то нужна;
+    выключенный debug стоит одного сравнения;
+  - logger.bind(room=..., peer=...) дает журнал с полями контекста,
+    они попадают в каждую запись;
+  - LogWriter пишет записи в файл из своего потока пачками, по достижении
+    max_bytes переименовывает файл и сжимает его в .gz.
+"""
+import collections
+import gzip
+import os
+import shutil
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVEL_MARKS = {DEBUG: "DEBUG: ", WARNING: "ВНИМАНИЕ: ", ERROR: "ОШИБКА: "}  # Пометка уровня в строке для окна
+
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Размер файла журнала, после которого он сжимается и начинается новый
+LOG_BACKUPS = 5  # Сколько сжатых файлов хранить
+LOG_FLUSH_INTERVAL = 0.5  # Как часто писатель сбрасывает накопленное на диск, секунд
+LOG_QUEUE_SIZE = 100000  # Записей в очереди писателя, сверх этого - отбрасываются
+
+
+class LogRecord:
+    __slots__ = ("created", "level", "message", "args", "context")
+
+    def __init__(self, created, level, message, args, context):
+        self.created = created
+        self.level = level
+        self.message = message
+        self.args = args
+        self.context = context  # {поле: значение}, например room и peer
+
+    def text(self):
+        if not self.args:
+            return self.message
+        try:
+            return self.message % self.args
+        except (TypeError, ValueError):
+            return f"{self.message} {self.args!r}"
+
+    def console_line(self):
+        # Строка для окна и консоли, в прежнем виде: "[Комната 3] ОШИБКА: ...", прочие поля - в конце
+        context = self.context
+        room = context.get("room")
+        prefix = f"[Комната {room}] " if room is not None else ""
+        fields = "".join(f" {key}={_field(value)}" for key, value in context.items() if key != "room")
+        return f"{prefix}{LEVEL_MARKS.get(self.level, '')}{self.text()}{' |' + fields if fields else ''}"
+
+    def file_line(self):
+        # Одна строка на запись: время, уровень, поля key=value, текст
+        seconds = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+        fields = "".join(f" {key}={_field(value)}" for key, value in self.context.items())
+        return f"{seconds}.{int(self.created * 1000) % 1000:03d} {LEVEL_NAMES.get(self.level, self.level)}" \
+               f"{fields} {self.text()}\n"
+
+
+def _field(value):
+    value = value if isinstance(value, str) else str(value)
+    return repr(value) if not value or " " in value or "=" in value else value
+
+
+class Logger:
+    """Журнал с уровнем и полями контекста. bind() дает дочерний журнал с общими уровнем и приемниками."""
+
+    def __init__(self, level=INFO, sinks=(), context=None, root=None):
+        self.root = root or self
+        self.context = context or {}
+        if root is None:
+            self.level = level
+            self.sinks = list(sinks)  # Вызываемые объекты, получают LogRecord
+
+    def bind(self, **context):
+        return Logger(context={**self.context, **context}, root=self.root)
+
+    def set_level(self, level):
+        self.root.level = level
+
+    def is_enabled(self, level):
+        return level >= self.root.level
+
+    def log(self, level, message, *args, **fields):
+        root = self.root
+        if level < root.level or not root.sinks:
+            return
+        context = {**self.context, **fields} if fields else self.context
+        record = LogRecord(time.time(), level, message, args, context)
+        for sink in root.sinks:
+            sink(record)
+
+    def debug(self, message, *args, **fields):
+        if DEBUG >= self.root.level:
+            self.log(DEBUG, message, *args, **fields)
+
+    def info(self, message, *args, **fields):
+        self.log(INFO, message, *args, **fields)
+
+    def warning(self, message, *args, **fields):
+        self.log(WARNING, message, *args, **fields)
+
+    def error(self, message, *args, **fields):
+        self.log(ERROR, message, *args, **fields)
+
+
+class LogWriter:
+    """Приемник для Logger: копит записи и дописывает их в файл из отдельного потока."""
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS, flush_interval=LOG_FLUSH_INTERVAL,
+                 max_queue=LOG_QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.records = collections.deque()
+        self.dropped = 0  # Записей, не попавших в файл из-за переполнения очереди
+        self.cond = threading.Condition()
+        self.running = True
+        self.file = open(path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def __call__(self, record):
+        with self.cond:
+            if len(self.records) >= self.max_queue:
+                self.dropped += 1
+                return
+            self.records.append(record)
+            if len(self.records) == 1:
+                self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join()
+        self.file.close()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.records or not self.running)
+                running = self.running
+            if running:
+                time.sleep(self.flush_interval)  # Даем записям накопиться, чтобы писать крупными кусками
+            with self.cond:
+                records, self.records = self.records, collections.deque()
+                dropped, self.dropped = self.dropped, 0
+            lines = [record.file_line() for record in records]
+            if dropped:
+                lines.append(LogRecord(time.time(), WARNING, "Очередь журнала переполнена, пропущено записей: %d",
+                                       (dropped,), {}).file_line())
+            if lines:
+                self._write("".join(lines))
+            if not running:
+                return
+
+    def _write(self, text):
+        try:
+            self.file.write(text)
+            self.file.flush()
+            self.size += len(text.encode("utf-8"))
+            if self.size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"Ошибка записи журнала в {self.path}: {e}")
+
+    def _rotate(self):
+        # journal.log -> journal.log.1.gz, старые сдвигаются: .1.gz -> .2.gz ... лишние удаляются
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as source, gzip.open(f"{self.path}.1.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.size = 0
@@ -0,0 +1,45 @@
+"""Компактные записи игрока и партии.
+
+Данные игрока раньше лежали в параллельных словарях с сокетом в роли ключа
+(clients, player_names, name_to_socket, players_alive, client_rooms, codecs).
+Теперь на игрока приходится один PlayerSession со __slots__: обработчик
+команды получает его сразу и читает имя, кодек и комнату как атрибуты, без
+поисков по словарям. Состояние партии комнаты собрано в GameState.
+"""
+from turn_ring import TurnRing
+
+
+class PlayerSession:
+    __slots__ = ("socket", "codec", "room", "name", "key", "seat", "alive", "shots", "hits", "wins", "token",
+                 "last_seen")
+
+    def __init__(self, socket, codec):
+        self.socket = socket
+        self.codec = codec  # Кодек протокола, о котором договорились при рукопожатии
+        self.room = None  # Комната, за которой занято место
+        self.name = None
+        self.key = None  # name.casefold() - для поиска по имени без учета регистра
+        self.seat = 0  # Номер места за столом, по нему идет очередь ходов
+        self.alive = False  # В игре в текущей партии
+        self.shots = 0  # Выстрелов за все партии
+        self.hits = 0  # Из них боевых
+        self.wins = 0
+        self.token = None  # Токен возобновления после обрыва связи (только у клиентов с событиями)
+        self.last_seen = 0.0  # time.monotonic() последнего приема от клиента (для проверки связи)
+
+    def set_name(self, name):
+        self.name = name
+        self.key = name.casefold()
+
+
+class GameState:
+    __slots__ = ("started", "chamber", "live_bullets", "blank_bullets", "current", "alive", "version")
+
+    def __init__(self, version=0):
+        self.started = False
+        self.chamber = []  # Оставшиеся патроны, True - боевой
+        self.live_bullets = 0
+        self.blank_bullets = 0
+        self.current = None  # PlayerSession, чей сейчас ход
+        self.alive = TurnRing()  # Живые игроки по кругу в порядке мест
+        self.version = version  # Растет при каждом изменении партии; новая партия продолжает счет старой
@@ -0,0 +1,125 @@
+"""Общий планировщик отложенных действий сервера.
+
+Дедлайны ходов, ожидание имени при рукопожатии, проверки связи и удержание
+места после обрыва живут в одной куче и ждут в одном потоке - без потока или
+sleep на каждого игрока. Постановка - O(log n), отмена - O(1): запись только
+помечается и выбрасывается, когда дойдет до вершины кучи. Если отмененных
+набирается больше половины кучи, она пересобирается, так что частые отмены
+(каждый ход снимает дедлайн прошлого) не раздувают память.
+
+Колбэк выполняется в потоке планировщика и должен быть коротким: как правило,
+он только кладет действие во входящие комнаты (Room.post) или закрывает
+соединение. Игровое состояние из колбэка не трогают.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+COMPACT_MIN = 1024  # Меньшую кучу не пересобираем: отмененные и так скоро уйдут с вершины
+
+
+class Timer:
+    __slots__ = ("when", "callback", "args", "scheduler")
+
+    def __init__(self, when, callback, args, scheduler):
+        self.when = when  # time.monotonic(), когда сработать
+        self.callback = callback  # None - отменен или уже сработал
+        self.args = args
+        self.scheduler = scheduler
+
+    def cancel(self):
+        if self.callback is not None:
+            self.scheduler._cancel(self)
+
+
+class TimerScheduler:
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.heap = []  # (when, порядковый номер, Timer)
+        self.counter = itertools.count()  # При равном времени - в порядке постановки
+        self.cancelled = 0  # Отмененных записей, еще лежащих в куче
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def __len__(self):
+        return len(self.heap) - self.cancelled
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="timers", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.heap.clear()
+            self.cancelled = 0
+            self.cond.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+        self.thread = None
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer(time.monotonic() + delay, callback, args, self)
+        with self.cond:
+            heapq.heappush(self.heap, (timer.when, next(self.counter), timer))
+            if self.heap[0][2] is timer:
+                self.cond.notify()  # Новый таймер раньше всех - поток должен проснуться раньше
+        return timer
+
+    def _cancel(self, timer):
+        with self.cond:
+            if timer.callback is None:
+                return  # Уже сработал
+            timer.callback = None
+            timer.args = None
+            self.cancelled += 1
+            if self.cancelled > COMPACT_MIN and self.cancelled * 2 > len(self.heap):
+                self.heap = [entry for entry in self.heap if entry[2].callback is not None]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    def _take_due(self):
+        # Ждет, пока что-то созреет; возвращает [(колбэк, аргументы)] или None при остановке
+        with self.cond:
+            while self.running:
+                heap = self.heap
+                while heap and heap[0][2].callback is None:
+                    heapq.heappop(heap)
+                    self.cancelled -= 1
+                if not heap:
+                    self.cond.wait()
+                    continue
+                now = time.monotonic()
+                if heap[0][0] > now:
+                    self.cond.wait(heap[0][0] - now)
+                    continue
+                due = []
+                while heap and heap[0][0] <= now:
+                    timer = heapq.heappop(heap)[2]
+                    if timer.callback is None:
+                        self.cancelled -= 1
+                        continue
+                    due.append((timer.callback, timer.args))
+                    timer.callback = None
+                    timer.args = None
+                return due
+            return None
+
+    def _run(self):
+        while True:
+            due = self._take_due()
+            if due is None:
+                return
+            for callback, args in due:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    if self.logger is not None:
+                        self.logger.error("Ошибка в отложенном действии %s: %s",
+                                          getattr(callback, "__name__", callback), e)
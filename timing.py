@@ -0,0 +1,114 @@
+"""Замеры времени в горячих местах комнаты: выстрел, передача хода, рассылки, отправка.
+
+По умолчанию выключены: обернутый метод проверяет один флаг и вызывает
+оригинал. Включаются на ходу (переключатель в окне, --timings или SIGUSR1
+для serve). Пока включены, каждые interval секунд в журнал уходит сводка:
+число вызовов, среднее и максимальное время по каждой точке замера для
+самых загруженных комнат и итог по всем комнатам, после чего счетчики
+обнуляются. Время включает вложенные вызовы: process_shot содержит и
+рассылки, и pass_turn.
+"""
+import functools
+import threading
+import time
+
+TIMING_INTERVAL = 10.0  # Как часто выводить сводку замеров, секунд
+TIMING_TOP_ROOMS = 5  # Сколько самых загруженных комнат показывать в сводке отдельно
+
+
+def timed(hook):
+    """Декоратор метода Room: время вызова попадает в server.timings под именем hook."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            timings = self.server.timings
+            if not timings.enabled:
+                return method(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                timings.record(self.room_id, hook, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+class Timings:
+    def __init__(self, logger, interval=TIMING_INTERVAL, top_rooms=TIMING_TOP_ROOMS):
+        self.logger = logger
+        self.interval = interval
+        self.top_rooms = top_rooms
+        self.enabled = False
+        self.stats = {}  # {room_id: {точка замера: [вызовов, всего секунд, максимум]}}
+        self.window_started = time.monotonic()  # Начало периода, за который копится stats
+        self.lock = threading.Lock()
+        self.stop_event = None
+        self.reporter = None  # Поток, выводящий сводку, пока замеры включены
+
+    def set_enabled(self, enabled):
+        if not enabled and self.enabled:
+            self.report()  # Остаток за неполный интервал
+        with self.lock:
+            if enabled == self.enabled:
+                return
+            self.enabled = enabled
+            self.stats = {}
+            self.window_started = time.monotonic()
+            if enabled:
+                self.stop_event = threading.Event()
+                self.reporter = threading.Thread(target=self._run, args=(self.stop_event,), name="timings",
+                                                 daemon=True)
+                self.reporter.start()
+            else:
+                self.stop_event.set()
+                self.reporter = None
+        self.logger.info("Замеры времени %s.", "включены" if enabled else "выключены")
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+
+    def record(self, room_id, hook, elapsed):
+        with self.lock:
+            hooks = self.stats.get(room_id)
+            if hooks is None:
+                hooks = self.stats[room_id] = {}
+            entry = hooks.get(hook)
+            if entry is None:
+                hooks[hook] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+
+    def report(self):
+        now = time.monotonic()
+        with self.lock:
+            stats, self.stats = self.stats, {}
+            period, self.window_started = now - self.window_started, now
+        if not stats:
+            return
+        totals = {}
+        for hooks in stats.values():
+            for hook, (count, total, longest) in hooks.items():
+                entry = totals.setdefault(hook, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        busiest = sorted(stats, key=lambda room_id: sum(entry[1] for entry in stats[room_id].values()),
+                         reverse=True)[:self.top_rooms]
+        self.logger.info("Замеры за %.1f с, комнат: %d: %s", period, len(stats), _format_hooks(totals))
+        for room_id in busiest:
+            self.logger.info("Замеры: %s", _format_hooks(stats[room_id]), room=room_id)
+
+    def close(self):
+        self.set_enabled(False)
+
+    def _run(self, stop_event):
+        while not stop_event.wait(self.interval):
+            self.report()
+
+
+def _format_hooks(hooks):
+    return "; ".join(f"{hook} {count}x ср. {total / count * 1000:.3f} мс, макс. {longest * 1000:.3f} мс"
+                     for hook, (count, total, longest) in sorted(hooks.items()))
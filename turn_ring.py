@@ -0,0 +1,75 @@
+"""Очередность ходов: живые игроки по кругу в порядке мест за столом.
+
+Циклический двусвязный список и словарь {игрок: узел}. Следующий ход,
+выбывание и отключение - O(1) при любом числе мест, обход идет от первого
+по порядку места.
+"""
+
+
+class _Node:
+    __slots__ = ("key", "prev", "next")
+
+    def __init__(self, key):
+        self.key = key
+        self.prev = self
+        self.next = self
+
+
+class TurnRing:
+    def __init__(self, keys=()):
+        self.nodes = {}  # {игрок: узел}
+        self.head = None  # Первое по порядку место - с него начинается обход
+        for key in keys:
+            self.append(key)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, key):
+        return key in self.nodes
+
+    def __iter__(self):
+        node = self.head
+        for _ in range(len(self.nodes)):
+            yield node.key
+            node = node.next
+
+    def append(self, key):
+        # Новый игрок занимает место в конце круга, перед первым
+        if key in self.nodes:
+            raise ValueError("Игрок уже в кольце ходов")
+        node = _Node(key)
+        if self.head is None:
+            self.head = node
+        else:
+            tail = self.head.prev
+            node.prev = tail
+            node.next = self.head
+            tail.next = node
+            self.head.prev = node
+        self.nodes[key] = node
+
+    def remove(self, key):
+        # Возвращает предыдущего по кругу игрока (None, если кольцо опустело):
+        # от него ход и передается дальше, как если бы выбывший уже походил
+        node = self.nodes.pop(key)
+        if not self.nodes:
+            self.head = None
+            return None
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        if node is self.head:
+            self.head = node.next
+        previous = node.prev.key
+        node.prev = node.next = node
+        return previous
+
+    def after(self, key):
+        return self.nodes[key].next.key
+
+    def first(self):
+        return self.head.key if self.head is not None else None
+
+    def clear(self):
+        self.nodes.clear()
+        self.head = None